@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class DjangoSimpleForumConfig(AppConfig):
     name = 'django_simple_forum'
+
+    def ready(self):
+        # keeps the topic indexes of every process in step with topic changes, commands included
+        from . import autocomplete, facets, similar  # noqa
@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Topic, Comment, Vote, UserTopics, ArchivedTopic, rebuild_comment_paths, update_topic_comments
+
+COMMENT_FIELDS = ('id', 'parent_id', 'commented_by_id', 'comment', 'comment_html', 'excerpt', 'created_on',
+                  'updated_on')
+FOLLOWER_FIELDS = ('user_id', 'is_followed', 'followed_on', 'no_of_votes', 'no_of_down_votes', 'is_like')
+
+
+def get_archive_days():
+    return getattr(settings, 'FORUM_ARCHIVE_AFTER_DAYS', 365)
+
+
+def get_cold_topics(days=None):
+    """Topics neither saved nor commented on in the last ``days`` (default FORUM_ARCHIVE_AFTER_DAYS) days."""
+    cutoff = timezone.now() - timedelta(days=get_archive_days() if days is None else days)
+    recent_comments = Comment.objects.filter(topic=OuterRef('pk'), created_on__gte=cutoff)
+    return Topic.objects.filter(updated_on__lt=cutoff).annotate(
+        has_recent_comments=Exists(recent_comments)).filter(has_recent_comments=False)
+
+
+def get_thread_data(topic):
+    comments = list(Comment.objects.filter(topic=topic).order_by('id').values(*COMMENT_FIELDS))
+    mentioned = {}
+    for comment_id, user_id in Comment.mentioned.through.objects.filter(
+            comment__topic=topic).values_list('comment_id', 'user_id'):
+        mentioned.setdefault(comment_id, []).append(user_id)
+    for comment in comments:
+        comment['mentioned'] = mentioned.get(comment['id'], [])
+    comment_type = ContentType.objects.get_for_model(Comment)
+    votes = list(Vote.objects.filter(content_type=ContentType.objects.get_for_model(Topic), object_id=topic.id).values(
+        'user_id', 'type', 'created_on'))
+    for vote in votes:
+        vote['comment_id'] = None
+    for vote in Vote.objects.filter(content_type=comment_type, object_id__in=[c['id'] for c in comments]).values(
+            'user_id', 'type', 'created_on', 'object_id'):
+        vote['comment_id'] = vote.pop('object_id')
+        votes.append(vote)
+    return {
+        'description': topic.description,
+        'description_html': topic.description_html,
+        'excerpt': topic.excerpt,
+        'tags': list(topic.tags.values_list('id', flat=True)),
+        'comments': comments,
+        'votes': votes,
+        'followers': list(UserTopics.objects.filter(topic=topic).values(*FOLLOWER_FIELDS)),
+    }
+
+
+def archive_topic(topic_id):
+    """
+    Moves the topic, its comments, their votes and its followers into one ArchivedTopic row.
+    Timeline entries are kept; restore_topic brings the rows back under their old ids.
+    """
+    with transaction.atomic():
+        topic = Topic.objects.select_for_update().filter(id=topic_id).first()
+        if topic is None:
+            return None
+        data = get_thread_data(topic)
+        archived = ArchivedTopic(
+            topic_id=topic.id, title=topic.title, slug=topic.slug, created_by_id=topic.created_by_id,
+            status=topic.status, category_id=topic.category_id, created_on=topic.created_on,
+            updated_on=topic.updated_on, no_of_views=topic.no_of_views, no_of_likes=topic.no_of_likes,
+            no_of_comments=len(data['comments']))
+        archived.set_data(data)
+        archived.save()
+        # cascades to the comments, votes, followers and tag links
+        Topic.objects.filter(id=topic.id).delete()
+    return archived
+
+
+def archive_cold_topics(days=None, batch_size=100):
+    """Archives every cold topic, one transaction per topic; returns the number archived."""
+    count = 0
+    while True:
+        topic_ids = list(get_cold_topics(days).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not topic_ids:
+            return count
+        for topic_id in topic_ids:
+            if archive_topic(topic_id):
+                count += 1
+
+
+def restore_timestamps(model, rows, fields):
+    # bulk_create lets auto_now(_add) overwrite the archived timestamps
+    for row in rows:
+        model.objects.filter(id=row['id']).update(**{field: parse_datetime(row[field]) for field in fields})
+
+
+def restore_topic(archived):
+    """
+    Moves an archived topic back into Topic, Comment, Vote and UserTopics. The topic and its
+    comments keep their old ids; votes get new ones, dated now.
+    """
+    data = archived.get_data()
+    with transaction.atomic():
+        if Topic.objects.filter(slug=archived.slug).exists():
+            raise CommandError('A live topic already has the slug "%s"' % archived.slug)
+        topic = Topic(
+            id=archived.topic_id, title=archived.title, slug=archived.slug, created_by_id=archived.created_by_id,
+            status=archived.status, category_id=archived.category_id, no_of_views=archived.no_of_views,
+            no_of_likes=archived.no_of_likes, description=data['description'],
+            description_html=data['description_html'], excerpt=data['excerpt'])
+        topic.save(force_insert=True)
+        Topic.objects.filter(id=topic.id).update(created_on=archived.created_on, updated_on=archived.updated_on)
+        topic.tags.set(data['tags'])
+        # ordered by id, so parents are inserted before their replies
+        Comment.objects.bulk_create([
+            Comment(topic=topic, **{field: comment[field] for field in COMMENT_FIELDS})
+            for comment in data['comments']])
+        restore_timestamps(Comment, data['comments'], ('created_on', 'updated_on'))
+        rebuild_comment_paths(topic.id)
+        Comment.mentioned.through.objects.bulk_create([
+            Comment.mentioned.through(comment_id=comment['id'], user_id=user_id)
+            for comment in data['comments'] for user_id in comment['mentioned']])
+        topic_type = ContentType.objects.get_for_model(Topic)
+        comment_type = ContentType.objects.get_for_model(Comment)
+        Vote.objects.bulk_create([
+            Vote(user_id=vote['user_id'], type=vote['type'],
+                 content_type=topic_type if vote['comment_id'] is None else comment_type,
+                 object_id=topic.id if vote['comment_id'] is None else vote['comment_id'])
+            for vote in data['votes']])
+        UserTopics.objects.bulk_create([
+            UserTopics(topic=topic, **dict(follower, followed_on=parse_date(follower['followed_on'] or '')))
+            for follower in data['followers']])
+        # bulk_create sends no post_save, so the topic's comment and participant columns are recomputed here
+        update_topic_comments([topic.id])
+        archived.delete()
+    return topic
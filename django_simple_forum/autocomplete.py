@@ -0,0 +1,121 @@
+import heapq
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .indexes import VERSION_KEY, TopicIndex, get_cache, register
+from .models import Tags
+
+# sorts after every title starting with the prefix
+PREFIX_END = u'\uffff'
+# prefixes whose suggestions are kept between changes
+MAX_CACHED_PREFIXES = 1000
+
+
+def get_index_size():
+    """Tags beyond the most used this many are left out of the suggestions."""
+    return getattr(settings, 'FORUM_TAG_INDEX_SIZE', 10000)
+
+
+class TagIndex(TopicIndex):
+    """
+    The titles of the FORUM_TAG_INDEX_SIZE most used tags sorted case-insensitively, so the tags
+    starting with a prefix are one slice of them, and Tags.no_of_topics of each to rank the slice by.
+    """
+
+    def clear(self):
+        super(TagIndex, self).clear()
+        # tag id: number of published topics
+        self.weights = {}
+        self.titles = {}
+        self.keys = []
+        self.tag_ids = []
+        self.suggestions = {}
+
+    def insert(self, tag_id, title, weight=0):
+        """Adds a tag to the sorted titles, in place of the least used one when the index is full."""
+        with self.lock:
+            if tag_id in self.titles:
+                return
+            if len(self.titles) >= get_index_size():
+                self.discard(min(self.weights, key=lambda indexed_id: (self.weights[indexed_id], -indexed_id)))
+            key = title.lower()
+            position = bisect_left(self.keys, key)
+            self.keys.insert(position, key)
+            self.tag_ids.insert(position, tag_id)
+            self.titles[tag_id] = title
+            self.weights[tag_id] = weight
+            self.suggestions = {}
+
+    def discard(self, tag_id):
+        with self.lock:
+            position = bisect_left(self.keys, self.titles[tag_id].lower())
+            # titles differing only in case share a key
+            while self.tag_ids[position] != tag_id:
+                position += 1
+            del self.keys[position]
+            del self.tag_ids[position]
+            del self.titles[tag_id]
+            del self.weights[tag_id]
+            self.suggestions = {}
+
+    def load(self, topic_ids=None):
+        """[(tag id, title, number of published topics)] of the FORUM_TAG_INDEX_SIZE most used tags."""
+        return list(Tags.objects.order_by('-no_of_topics', 'id').values_list(
+            'id', 'title', 'no_of_topics')[:get_index_size()])
+
+    def fill(self, tags):
+        tags = sorted(tags, key=lambda tag: (tag[1].lower(), tag[0]))
+        with self.lock:
+            self.clear()
+            self.keys = [title.lower() for tag_id, title, weight in tags]
+            self.tag_ids = [tag_id for tag_id, title, weight in tags]
+            self.titles = {tag_id: title for tag_id, title, weight in tags}
+            self.weights = {tag_id: weight for tag_id, title, weight in tags}
+
+    def build(self):
+        version = get_cache().get_or_set(VERSION_KEY, 0, None)
+        tags = self.load()
+        with self.lock:
+            self.fill(tags)
+            self.version = version
+
+    def refresh(self, topic_ids):
+        # the changed topics moved the counts of their tags, old and new, and a tag may have become one
+        # of the most used; one read of the most used tags covers all of it
+        self.fill(self.load())
+
+    def suggest(self, prefix, limit=10):
+        """
+        [(tag id, title, number of published topics)] of the ``limit`` most used tags whose
+        titles start with the prefix, ignoring case. Answers are kept until the tags change.
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        self.catch_up()
+        with self.lock:
+            if (prefix, limit) in self.suggestions:
+                return self.suggestions[prefix, limit]
+            start = bisect_left(self.keys, prefix)
+            stop = bisect_left(self.keys, prefix + PREFIX_END, start)
+            tag_ids = heapq.nlargest(limit, self.tag_ids[start:stop],
+                                     key=lambda tag_id: (self.weights.get(tag_id, 0), -tag_id))
+            suggestions = [(tag_id, self.titles[tag_id], self.weights.get(tag_id, 0)) for tag_id in tag_ids]
+            if len(self.suggestions) >= MAX_CACHED_PREFIXES:
+                self.suggestions = {}
+            self.suggestions[prefix, limit] = suggestions
+            return suggestions
+
+
+index = register(TagIndex())
+
+
+@receiver(post_save, sender=Tags, dispatch_uid='django_simple_forum.autocomplete.tag_created')
+def tag_created(sender, instance, created, **kwargs):
+    # other processes index a new tag once a published topic has it
+    if created and index.version is not None:
+        transaction.on_commit(lambda: index.insert(instance.id, instance.title))
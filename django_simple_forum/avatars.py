@@ -0,0 +1,108 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.urls import reverse
+
+from .models import UserProfile
+
+try:
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+except ImportError:
+    from django.contrib.auth.models import User
+
+DEFAULT_AVATAR_URL = '//d2pt99vxm3n8bc.cloudfront.net/static/dummy.jpg'
+AVATAR_SIZE = '100x100'
+
+
+def get_cache():
+    return caches[getattr(settings, 'FORUM_AUTHOR_CARD_CACHE', 'default')]
+
+
+def get_card_seconds():
+    return getattr(settings, 'FORUM_AUTHOR_CARD_SECONDS', 60 * 60)
+
+
+def card_cache_key(user_id):
+    return 'forum-author-card:%s' % user_id
+
+
+def build_cards(user_ids):
+    avatars = dict(UserProfile.objects.filter(user_id__in=user_ids).exclude(
+        avatar_url='').values_list('user_id', 'avatar_url'))
+    cards = {}
+    for user_id, username in User.objects.filter(id__in=user_ids).values_list('id', 'username'):
+        cards[user_id] = {
+            'id': user_id,
+            'username': username,
+            'profile_url': reverse('django_simple_forum:user_details', kwargs={'user_name': username}),
+            'avatar_url': avatars.get(user_id, DEFAULT_AVATAR_URL),
+        }
+    return cards
+
+
+def get_author_cards(user_ids):
+    """
+    Returns {user id: card} for the given users, where a card holds the username, profile
+    URL and avatar URL. Cards come from the cache; the missing ones are built with two queries.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return {}
+    cache = get_cache()
+    cached = cache.get_many([card_cache_key(user_id) for user_id in user_ids])
+    cards = {card['id']: card for card in cached.values()}
+    missing = user_ids - set(cards)
+    if missing:
+        built = build_cards(missing)
+        cache.set_many({card_cache_key(user_id): card for user_id, card in built.items()}, get_card_seconds())
+        cards.update(built)
+    return cards
+
+
+def get_author_card(user_id):
+    return get_author_cards([user_id]).get(user_id)
+
+
+def invalidate_author_card(user_id):
+    get_cache().delete(card_cache_key(user_id))
+
+
+def generate_avatar(profile_id):
+    """Renders the avatar thumbnail of the profile's picture and stores its URL on the profile."""
+    from sorl.thumbnail import get_thumbnail
+
+    profile = UserProfile.objects.filter(id=profile_id).first()
+    if profile is None:
+        return
+    avatar_url = ''
+    if profile.profile_pic:
+        avatar_url = get_thumbnail(profile.profile_pic, AVATAR_SIZE, upscale=True, padding=True).url
+    UserProfile.objects.filter(id=profile_id).update(avatar_url=avatar_url)
+    invalidate_author_card(profile.user_id)
+
+
+def _generate_avatar_in_thread(profile_id):
+    try:
+        generate_avatar(profile_id)
+    finally:
+        connection.close()
+
+
+def schedule_avatar(profile_id):
+    """Generates the avatar in a background thread once the upload is committed."""
+    def start():
+        threading.Thread(target=_generate_avatar_in_thread, args=(profile_id,)).start()
+
+    transaction.on_commit(start)
+
+
+@receiver(post_save, sender=User, dispatch_uid='django_simple_forum.avatars.user_saved')
+def user_saved(sender, instance, **kwargs):
+    # the card holds the username
+    invalidate_author_card(instance.pk)
@@ -0,0 +1,200 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ForumCategory, Topic, UserTopics, Comment, Vote, Timeline, UserProfile, DailyActivity, \
+    DailyActiveUser, DeletionJob, TimelineSummary, PendingNotification, Subscription, batch_topic_updates, \
+    get_category_ids, update_topic_tag_counts
+from .indexes import log_change_on_commit
+
+try:
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+except ImportError:
+    from django.contrib.auth.models import User
+
+logger = logging.getLogger(__name__)
+
+
+def get_batch_size():
+    return getattr(settings, 'FORUM_DELETION_BATCH_SIZE', 500)
+
+
+def get_lease_seconds():
+    """A running job is given up as interrupted when it has not finished a batch for this long."""
+    return getattr(settings, 'FORUM_DELETION_LEASE_SECONDS', 300)
+
+
+def hide_topic(topic_id):
+    Topic.objects.filter(id=topic_id).update(status='Disabled')
+    update_topic_tag_counts([topic_id])
+    log_change_on_commit([topic_id])
+
+
+# 'raw_delete' steps are for rows nothing refers to and no signal receiver listens for, deleted with a
+# single DELETE per batch; 'delete' steps go through the collector so their signals and cascades run
+def topic_steps(topic_id):
+    comment_type = ContentType.objects.get_for_model(Comment)
+    topic_type = ContentType.objects.get_for_model(Topic)
+    comment_ids = Comment.objects.filter(topic_id=topic_id).values('id')
+    return [
+        ('raw_delete', Timeline.objects.filter(content_type=comment_type, object_id__in=comment_ids)),
+        ('raw_delete', Vote.objects.filter(content_type=comment_type, object_id__in=comment_ids)),
+        ('raw_delete', PendingNotification.objects.filter(comment__topic_id=topic_id)),
+        # replies before the comments they answer
+        ('delete', Comment.objects.filter(topic_id=topic_id).order_by('-id')),
+        ('raw_delete', Timeline.objects.filter(content_type=topic_type, object_id=topic_id)),
+        ('raw_delete', Vote.objects.filter(content_type=topic_type, object_id=topic_id)),
+        ('delete', UserTopics.objects.filter(topic_id=topic_id)),
+        ('delete', Topic.objects.filter(id=topic_id)),
+    ]
+
+
+def hide_user(user_id):
+    User.objects.filter(id=user_id).update(is_active=False)
+
+
+def user_steps(user_id):
+    # the user's topics, comments and categories stay, like the SET_NULL foreign keys say
+    return [
+        ('update', Topic.objects.filter(created_by_id=user_id), {'created_by': None}),
+        ('update', Comment.objects.filter(commented_by_id=user_id), {'commented_by': None}),
+        ('update', ForumCategory.objects.filter(created_by_id=user_id), {'created_by': None}),
+        ('raw_delete', Timeline.objects.filter(user_id=user_id)),
+        ('raw_delete', TimelineSummary.objects.filter(user_id=user_id)),
+        ('raw_delete', Vote.objects.filter(user_id=user_id)),
+        # keeps the participant counts of the user's topics
+        ('delete', UserTopics.objects.filter(user_id=user_id)),
+        ('raw_delete', Comment.mentioned.through.objects.filter(user_id=user_id)),
+        ('raw_delete', PendingNotification.objects.filter(user_id=user_id)),
+        ('raw_delete', Subscription.objects.filter(user_id=user_id)),
+        ('raw_delete', DailyActiveUser.objects.filter(user_id=user_id)),
+        ('delete', UserProfile.objects.filter(user_id=user_id)),
+        ('delete', User.objects.filter(id=user_id)),
+    ]
+
+
+def hide_category(category_id):
+    ForumCategory.objects.filter(id__in=get_category_ids(category_id)).update(is_active=False)
+
+
+def category_steps(category_id):
+    category_ids = get_category_ids(category_id)
+    return [
+        ('update', Topic.objects.filter(category_id__in=category_ids), {'category': None}),
+        ('raw_delete', DailyActiveUser.objects.filter(category_id__in=category_ids)),
+        ('raw_delete', DailyActivity.objects.filter(category_id__in=category_ids)),
+        ('raw_delete', Subscription.objects.filter(category_id__in=category_ids)),
+        # subcategories before their parents
+        ('delete', ForumCategory.objects.filter(id__in=category_ids).order_by('-id')),
+    ]
+
+
+PLANS = {
+    Topic: (hide_topic, topic_steps),
+    User: (hide_user, user_steps),
+    ForumCategory: (hide_category, category_steps),
+}
+
+
+def queue_deletion(obj, user=None):
+    """
+    Hides ``obj`` right away and queues a DeletionJob that deletes it and its dependents in
+    batches of FORUM_DELETION_BATCH_SIZE rows, in a background thread once this transaction commits.
+    """
+    return queue_deletions([obj], user)[0]
+
+
+def queue_deletions(objects, user=None):
+    """
+    queue_deletion for several objects; their jobs run one after another in a single background
+    thread. Returns the job of each object, reusing the ones already pending.
+    """
+    jobs, job_ids = [], []
+    for obj in objects:
+        content_type = ContentType.objects.get_for_model(obj)
+        job = DeletionJob.objects.filter(
+            content_type=content_type, object_id=obj.pk, status__in=('Queued', 'Running')).first()
+        if job is None:
+            # hides the object
+            PLANS[type(obj)][0](obj.pk)
+            job = DeletionJob.objects.create(
+                content_type=content_type, object_id=obj.pk, label=str(obj)[:250],
+                created_by=user if user is not None and user.is_authenticated() else None)
+            job_ids.append(job.id)
+        jobs.append(job)
+    if job_ids:
+        transaction.on_commit(lambda: threading.Thread(target=_run_jobs_in_thread, args=(job_ids,)).start())
+    return jobs
+
+
+def _run_jobs_in_thread(job_ids):
+    try:
+        for job_id in job_ids:
+            try:
+                run_job(job_id)
+            except Exception:
+                # recorded on the job; the next ones still run
+                logger.exception('Deletion job %s failed', job_id)
+    finally:
+        connection.close()
+
+
+def claim_job(job_id):
+    """
+    Claims a pending job for get_lease_seconds(), unless another thread or process holds it;
+    a job whose claim ran out was interrupted and can be claimed again.
+    """
+    now = timezone.now()
+    return DeletionJob.objects.filter(
+        Q(claimed_until=None) | Q(claimed_until__lt=now), id=job_id, status__in=('Queued', 'Running')
+    ).update(claimed_until=now + timedelta(seconds=get_lease_seconds())) == 1
+
+
+def run_job(job_id):
+    """
+    Works through the job's steps one batch per transaction. Every step selects what is left
+    to do, so a job interrupted at any point can simply be run again.
+    """
+    job = DeletionJob.objects.get(id=job_id)
+    if job.status in ('Done', 'Failed') or not claim_job(job.id):
+        return job
+    steps = PLANS[job.content_type.model_class()][1](job.object_id)
+    if job.status == 'Queued':
+        job.total_rows = sum(step[1].count() for step in steps)
+        job.status = 'Running'
+        job.save(update_fields=['total_rows', 'status'])
+    try:
+        for step in steps:
+            action, queryset = step[:2]
+            if not queryset.query.order_by:
+                queryset = queryset.order_by('pk')
+            while True:
+                # the comments and followers of a batch update each of their topics once
+                with transaction.atomic(), batch_topic_updates():
+                    pks = list(queryset.values_list('pk', flat=True)[:get_batch_size()])
+                    if not pks:
+                        break
+                    batch = queryset.model.objects.filter(pk__in=pks)
+                    if action == 'raw_delete':
+                        batch._raw_delete(batch.db)
+                    elif action == 'delete':
+                        batch.delete()
+                    else:
+                        batch.update(**step[2])
+                    DeletionJob.objects.filter(id=job.id).update(
+                        processed_rows=F('processed_rows') + len(pks),
+                        claimed_until=timezone.now() + timedelta(seconds=get_lease_seconds()))
+    except Exception as e:
+        DeletionJob.objects.filter(id=job.id).update(status='Failed', error=str(e), finished_on=timezone.now())
+        raise
+    DeletionJob.objects.filter(id=job.id).update(status='Done', finished_on=timezone.now())
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,145 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.template import loader
+from django.urls import reverse
+
+from .models import Comment
+
+try:
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+except ImportError:
+    from django.contrib.auth.models import User
+
+logger = logging.getLogger(__name__)
+
+# the comment email of participants and of mentioned users
+COMMENT_TEMPLATES = {False: 'emails/comment_add.html', True: 'emails/comment_mentioned.html'}
+
+_templates = {}
+
+
+def get_batch_size():
+    return getattr(settings, 'FORUM_EMAIL_BATCH_SIZE', 100)
+
+
+def get_thread_count():
+    return getattr(settings, 'FORUM_EMAIL_THREADS', 4)
+
+
+def get_email_template(name):
+    """Email templates are loaded and compiled once per process."""
+    if name not in _templates:
+        _templates[name] = loader.get_template(name)
+    return _templates[name]
+
+
+def html_message(subject, body, to):
+    message = EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, to)
+    message.content_subtype = 'html'
+    return message
+
+
+class DeliveryError(Exception):
+    """Raised by send_messages once every batch was tried, when some of the batches could not be sent."""
+
+    def __init__(self, sent, errors):
+        super(DeliveryError, self).__init__('%d email batches failed, the first with: %r' % (len(errors), errors[0]))
+        # the messages of the batches that went out
+        self.sent = sent
+        self.errors = errors
+
+
+def send_batches(batches):
+    """
+    Sends the batches over one connection. Returns the messages of the batches that went out and
+    the exceptions of the ones that did not; a failed batch does not stop the ones after it.
+    """
+    sent, errors = [], []
+    try:
+        with get_connection() as connection:
+            for batch in batches:
+                try:
+                    connection.send_messages(batch)
+                except Exception as e:
+                    errors.append(e)
+                else:
+                    sent.extend(batch)
+    except Exception as e:
+        # opening or closing the connection
+        errors.append(e)
+    return sent, errors
+
+
+def send_messages(messages):
+    """
+    Sends the messages FORUM_EMAIL_BATCH_SIZE at a time over one connection. With more than one
+    batch they are shared out between up to FORUM_EMAIL_THREADS threads, one connection each.
+    Returns the number of messages sent, or raises DeliveryError listing the messages that were
+    sent if any batch failed.
+    """
+    size = get_batch_size()
+    batches = [messages[start:start + size] for start in range(0, len(messages), size)]
+    workers = min(get_thread_count(), len(batches))
+    if workers <= 1:
+        sent, errors = send_batches(batches)
+    else:
+        results = []
+
+        def work(batches):
+            results.append(send_batches(batches))
+
+        threads = [threading.Thread(target=work, args=(batches[index::workers],)) for index in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sent = [message for thread_sent, thread_errors in results for message in thread_sent]
+        errors = [error for thread_sent, thread_errors in results for error in thread_errors]
+    if errors:
+        raise DeliveryError(sent, errors)
+    return len(sent)
+
+
+def send_comment_emails(comment, recipients):
+    """
+    Emails a comment to {user id: mentioned} recipients. The email is rendered once for the
+    participants and once for the mentioned users; only the address differs between recipients.
+    """
+    context = {
+        'comment': comment,
+        'topic_url': settings.HOST_URL + reverse('django_simple_forum:view_topic', kwargs={'slug': comment.topic.slug}),
+        'HOST_URL': settings.HOST_URL,
+    }
+    subject = "New Comment For The Topic " + comment.topic.title
+    rendered = {}
+    messages = []
+    for user_id, email in User.objects.filter(id__in=recipients).values_list('id', 'email'):
+        mentioned = recipients[user_id]
+        if mentioned not in rendered:
+            rendered[mentioned] = get_email_template(COMMENT_TEMPLATES[mentioned]).render(context)
+        messages.append(html_message(subject, rendered[mentioned], [email]))
+    return send_messages(messages)
+
+
+def _send_comment_emails_in_thread(comment_id, recipients):
+    try:
+        send_comment_emails(Comment.objects.select_related('topic').get(id=comment_id), recipients)
+    except Exception:
+        # the comment is saved either way; a mail server outage must not fail it
+        logger.exception('Could not email comment %s', comment_id)
+    finally:
+        connection.close()
+
+
+def schedule_comment_emails(comment, recipients):
+    """Emails the comment in a background thread once it is committed, logging delivery errors."""
+    def start():
+        threading.Thread(target=_send_comment_emails_in_thread, args=(comment.id, recipients)).start()
+
+    transaction.on_commit(start)
@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = 'django_simple_forum.events.InMemoryBackend'
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_buffer_size():
+    return getattr(settings, 'FORUM_EVENTS_BUFFER', 50)
+
+
+def get_max_topics():
+    return getattr(settings, 'FORUM_EVENTS_MAX_TOPICS', 1000)
+
+
+def get_stream_seconds():
+    return getattr(settings, 'FORUM_EVENTS_STREAM_SECONDS', 30)
+
+
+def get_keepalive_seconds():
+    return getattr(settings, 'FORUM_EVENTS_KEEPALIVE_SECONDS', 15)
+
+
+class InMemoryBackend(object):
+    """
+    Keeps the last FORUM_EVENTS_BUFFER events of the FORUM_EVENTS_MAX_TOPICS most recently
+    active topics in process memory. Only listeners served by the same process see the
+    events, so multi-process deployments should plug in a shared backend.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.channels = OrderedDict()
+        self.last_id = 0
+
+    def publish(self, topic_id, event, data):
+        with self.condition:
+            self.last_id += 1
+            channel = self.channels.pop(topic_id, None)
+            if channel is None:
+                channel = deque(maxlen=get_buffer_size())
+                while len(self.channels) >= get_max_topics():
+                    self.channels.popitem(last=False)
+            channel.append((self.last_id, event, data))
+            self.channels[topic_id] = channel
+            self.condition.notify_all()
+            return self.last_id
+
+    def read(self, topic_id, last_id, timeout):
+        """Returns the events of the topic newer than ``last_id``, waiting up to ``timeout`` seconds for one."""
+        deadline = time.time() + timeout
+        with self.condition:
+            # ids from before a restart would hide every new event
+            last_id = min(last_id, self.last_id)
+            while True:
+                events = [item for item in self.channels.get(topic_id, ()) if item[0] > last_id]
+                remaining = deadline - time.time()
+                if events or remaining <= 0:
+                    return events
+                self.condition.wait(remaining)
+
+    def get_last_id(self):
+        return self.last_id
+
+
+def get_backend():
+    path = getattr(settings, 'FORUM_EVENTS_BACKEND', DEFAULT_BACKEND)
+    with _backends_lock:
+        if path not in _backends:
+            _backends[path] = import_string(path)()
+        return _backends[path]
+
+
+def publish(topic_id, event, data):
+    """Publishes ``event`` to the listeners of the topic once the current transaction commits."""
+    transaction.on_commit(lambda: get_backend().publish(topic_id, event, data))
+
+
+def format_event(event_id, event, data):
+    return 'id: %s\nevent: %s\ndata: %s\n\n' % (event_id, event, json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def stream(topic_id, last_id=None):
+    """
+    Yields the topic's events in server-sent-events format for FORUM_EVENTS_STREAM_SECONDS,
+    then ends so the browser reconnects with Last-Event-ID.
+    """
+    backend = get_backend()
+    if last_id is None:
+        last_id = backend.get_last_id()
+    yield 'retry: 3000\n\n'
+    deadline = time.time() + get_stream_seconds()
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return
+        events = backend.read(topic_id, last_id, min(remaining, get_keepalive_seconds()))
+        if not events:
+            yield ': keepalive\n\n'
+        for event_id, event, data in events:
+            last_id = event_id
+            yield format_event(event_id, event, data)
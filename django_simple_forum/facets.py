@@ -0,0 +1,187 @@
+from itertools import islice
+
+from .indexes import TopicIndex, register
+from .models import Topic
+
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+FACETS = ('category', 'tag', 'status')
+
+
+class Bitmap(object):
+    """
+    A set of ids stored as one int bitmap per chunk of 65536 ids, so a tag on a few topics
+    stays a few words however high the topic ids go.
+    """
+    __slots__ = ('chunks',)
+
+    def __init__(self, ids=()):
+        self.chunks = {}
+        for value in ids:
+            self.add(value)
+
+    def add(self, value):
+        key = value >> CHUNK_BITS
+        self.chunks[key] = self.chunks.get(key, 0) | (1 << (value & CHUNK_MASK))
+
+    def discard(self, value):
+        key = value >> CHUNK_BITS
+        bits = self.chunks.get(key, 0) & ~(1 << (value & CHUNK_MASK))
+        if bits:
+            self.chunks[key] = bits
+        else:
+            self.chunks.pop(key, None)
+
+    def __contains__(self, value):
+        return bool(self.chunks.get(value >> CHUNK_BITS, 0) >> (value & CHUNK_MASK) & 1)
+
+    def __and__(self, other):
+        small, large = sorted((self.chunks, other.chunks), key=len)
+        result = Bitmap()
+        for key, bits in small.items():
+            bits &= large.get(key, 0)
+            if bits:
+                result.chunks[key] = bits
+        return result
+
+    def __or__(self, other):
+        result = Bitmap()
+        result.chunks = dict(self.chunks)
+        for key, bits in other.chunks.items():
+            result.chunks[key] = result.chunks.get(key, 0) | bits
+        return result
+
+    def __len__(self):
+        return sum(bin(bits).count('1') for bits in self.chunks.values())
+
+    def __bool__(self):
+        return bool(self.chunks)
+
+    __nonzero__ = __bool__
+
+    def count_from(self, value):
+        """The number of ids not lower than ``value``."""
+        key = value >> CHUNK_BITS
+        count = sum(bin(bits).count('1') for chunk, bits in self.chunks.items() if chunk > key)
+        return count + bin(self.chunks.get(key, 0) >> (value & CHUNK_MASK)).count('1')
+
+    def descending(self, below=None):
+        """The ids, highest first; only those lower than ``below`` if given."""
+        for key in sorted(self.chunks, reverse=True):
+            bits = self.chunks[key]
+            if below is not None:
+                if key > below >> CHUNK_BITS:
+                    continue
+                if key == below >> CHUNK_BITS:
+                    bits &= (1 << (below & CHUNK_MASK)) - 1
+            while bits:
+                bit = bits.bit_length() - 1
+                yield (key << CHUNK_BITS) | bit
+                bits ^= 1 << bit
+
+
+class FacetIndex(TopicIndex):
+    """Bitmaps of the topic ids of every category, tag and status."""
+
+    def clear(self):
+        super(FacetIndex, self).clear()
+        self.facets = {facet: {} for facet in FACETS}
+        self.all = Bitmap()
+
+    def get_values(self, row):
+        category_id, status, tag_ids = row
+        return (('category', [category_id]), ('status', [status]), ('tag', tag_ids))
+
+    def add(self, topic_id, row):
+        super(FacetIndex, self).add(topic_id, row)
+        self.all.add(topic_id)
+        for facet, values in self.get_values(row):
+            for value in values:
+                if value is not None:
+                    self.facets[facet].setdefault(value, Bitmap()).add(topic_id)
+
+    def remove(self, topic_id):
+        row = super(FacetIndex, self).remove(topic_id)
+        if row is None:
+            return
+        self.all.discard(topic_id)
+        for facet, values in self.get_values(row):
+            for value in values:
+                bitmap = self.facets[facet].get(value)
+                if bitmap is not None:
+                    bitmap.discard(topic_id)
+                    if not bitmap:
+                        del self.facets[facet][value]
+
+    def load(self, topic_ids=None):
+        """(category id, status, tag ids) of the topics, in one pass over Topic and the topic tags table."""
+        topics = Topic.objects.all()
+        links = Topic.tags.through.objects.all()
+        if topic_ids is not None:
+            topics = topics.filter(id__in=topic_ids)
+            links = links.filter(topic_id__in=topic_ids)
+        rows = {topic_id: (category_id, status, set())
+                for topic_id, category_id, status in topics.values_list('id', 'category_id', 'status').iterator()}
+        for topic_id, tag_id in links.values_list('topic_id', 'tags_id').iterator():
+            if topic_id in rows:
+                rows[topic_id][2].add(tag_id)
+        return rows
+
+    def filter(self, category_id=None, tag_ids=(), status=None):
+        """Bitmap of the topics in the category, with every one of the tags and in the status."""
+        self.catch_up()
+        with self.lock:
+            bitmaps = [self.all]
+            if category_id is not None:
+                bitmaps.append(self.facets['category'].get(category_id, Bitmap()))
+            if status is not None:
+                bitmaps.append(self.facets['status'].get(status, Bitmap()))
+            bitmaps.extend(self.facets['tag'].get(tag_id, Bitmap()) for tag_id in tag_ids)
+            bitmaps.sort(key=lambda bitmap: len(bitmap.chunks))
+            # a copy, so the caller can walk it outside the lock while changes are applied to the index
+            result = bitmaps[0] | Bitmap()
+            for bitmap in bitmaps[1:]:
+                result = result & bitmap
+            return result
+
+    def any_of(self, category_ids=(), tag_ids=(), status=None):
+        """Bitmap of the topics in any of the categories or with any of the tags, and in the status."""
+        self.catch_up()
+        with self.lock:
+            result = Bitmap()
+            for facet, values in (('category', category_ids), ('tag', tag_ids)):
+                for value in values:
+                    result = result | self.facets[facet].get(value, Bitmap())
+            if status is not None:
+                result = result & self.facets['status'].get(status, Bitmap())
+            return result
+
+    def counts(self, facet, bitmap):
+        """{value: number of the ``bitmap`` topics with it} for every value of the facet they have."""
+        with self.lock:
+            counts = {value: len(bitmap & members) for value, members in self.facets[facet].items()}
+        return {value: count for value, count in counts.items() if count}
+
+
+index = register(FacetIndex())
+
+
+class FacetResults(object):
+    """The topics of a bitmap, newest first; slicing it loads just the topics of the slice."""
+
+    def __init__(self, bitmap, queryset):
+        self.bitmap = bitmap
+        self.queryset = queryset
+
+    def __len__(self):
+        return len(self.bitmap)
+
+    def count(self):
+        return len(self)
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        ids = list(islice(self.bitmap.descending(), item.start, item.stop))
+        topics = self.queryset.in_bulk(ids)
+        return [topics[topic_id] for topic_id in ids if topic_id in topics]
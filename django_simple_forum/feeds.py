@@ -0,0 +1,53 @@
+from itertools import islice
+
+from django.conf import settings
+
+from .facets import Bitmap, index as facet_index
+from .models import Subscription, Topic, get_category_ids
+
+
+def get_feed_size():
+    """A user's feed holds at most this many of the newest topics of their subscriptions."""
+    return getattr(settings, 'FORUM_FEED_SIZE', 500)
+
+
+def get_subscriptions(user_id):
+    """(category ids, tag ids) of a user's subscriptions; a category brings all its sub categories along."""
+    category_ids, tag_ids = set(), set()
+    for category_id, tag_id in Subscription.objects.filter(user_id=user_id).values_list('category_id', 'tag_id'):
+        if category_id is not None and category_id not in category_ids:
+            category_ids.update(get_category_ids(category_id))
+        if tag_id is not None:
+            tag_ids.add(tag_id)
+    return category_ids, tag_ids
+
+
+def get_feed_bitmap(user_id):
+    """Bitmap of the published topics in the user's categories or with their tags, from the facet index."""
+    category_ids, tag_ids = get_subscriptions(user_id)
+    if not category_ids and not tag_ids:
+        return Bitmap()
+    return facet_index.any_of(category_ids, tag_ids, 'Published')
+
+
+def get_feed(user_id):
+    """Ids of the newest FORUM_FEED_SIZE topics of the user's feed, newest first."""
+    return list(islice(get_feed_bitmap(user_id).descending(), get_feed_size()))
+
+
+def get_feed_page(user_id, before=None, size=20):
+    """
+    The feed topics older than the ``before`` topic id, or the newest ones, and the cursor of the
+    next page; None when the page is the last. Only the ids of the page are walked and read.
+    """
+    feed = get_feed_bitmap(user_id)
+    # the topics newer than the cursor were on the previous pages; the feed ends after FORUM_FEED_SIZE
+    remaining = get_feed_size() - (feed.count_from(before) if before is not None else 0)
+    page_size = max(min(size, remaining), 0)
+    topic_ids = list(islice(feed.descending(below=before), page_size + 1))
+    next_before = topic_ids[page_size - 1] if len(topic_ids) > page_size and page_size < remaining else None
+    topic_ids = topic_ids[:page_size]
+    # the index may not have caught up with a topic that was unpublished
+    topics = Topic.objects.filter(status='Published').select_related('category', 'last_comment_by').in_bulk(
+        topic_ids)
+    return [topics[topic_id] for topic_id in topic_ids if topic_id in topics], next_before
@@ -1,4 +1,9 @@
+import os
+from io import BytesIO
+
 from django.contrib.auth.forms import AuthenticationForm
+from django.core.files.base import ContentFile
+from PIL import Image
 
 try:
     from django.contrib.auth import get_user_model
@@ -7,7 +12,8 @@ try:
 except ImportError:
     from django.contrib.auth.models import User
 from django import forms
-from .models import ForumCategory, Badge, Topic, Comment, UserProfile
+from .models import ForumCategory, Badge, Topic, Comment, UserProfile, ArchivedTopic
+from .rendering import render_body
 from django.template.defaultfilters import slugify
 
 
@@ -67,7 +73,7 @@ class CategoryForm(forms.ModelForm):
 class BadgeForm(forms.ModelForm):
     class Meta:
         model = Badge
-        exclude = ('slug',)
+        exclude = ('slug', 'no_of_users')
 
     def clean_title(self):
         if Badge.objects.filter(slug=slugify(self.cleaned_data['title'])).exclude(id=self.instance.id):
@@ -105,7 +111,11 @@ class TopicForm(forms.ModelForm):
         fields = ("title", "category", "description", "tags")
 
     def clean_title(self):
-        if Topic.objects.filter(slug=slugify(self.cleaned_data['title'])).exclude(id=self.instance.id):
+        slug = slugify(self.cleaned_data['title'])
+        if Topic.objects.filter(slug=slug).exclude(id=self.instance.id):
+            raise forms.ValidationError('Topic with this Name already exists.')
+        # archived topics keep their URL, so a new topic may not take their slug
+        if not self.instance.id and ArchivedTopic.objects.filter(slug=slug).exists():
             raise forms.ValidationError('Topic with this Name already exists.')
 
         return self.cleaned_data['title']
@@ -114,6 +124,7 @@ class TopicForm(forms.ModelForm):
         instance = super(TopicForm, self).save(commit=False)
         instance.title = self.cleaned_data['title']
         instance.description = self.cleaned_data['description']
+        instance.description_html, instance.excerpt = render_body(instance.description)
         instance.category = self.cleaned_data['category']
         if not self.instance.id:
             instance.slug = slugify(self.cleaned_data['title'])
@@ -141,6 +152,7 @@ class CommentForm(forms.ModelForm):
     def save(self, commit=True):
         instance = super(CommentForm, self).save(commit=False)
         instance.comment = self.cleaned_data['comment']
+        instance.comment_html, instance.excerpt = render_body(instance.comment)
         instance.topic = self.cleaned_data['topic']
         if not self.instance.id:
             instance.commented_by = self.user
@@ -156,3 +168,29 @@ class UserProfileForm(forms.ModelForm):
         model = UserProfile
         fields = ['badges']
 
+
+class ProfilePicForm(forms.Form):
+    profile_pic = forms.ImageField(error_messages={'invalid_image': 'Please upload an image'})
+
+    def clean_profile_pic(self):
+        """
+        The picture decoded and encoded again as PNG or JPEG, so markup or script smuggled into
+        the upload never reaches the media storage, whatever the client said its type was.
+        """
+        upload = self.cleaned_data['profile_pic']
+        upload.seek(0)
+        try:
+            image = Image.open(upload)
+            image.load()
+        except Exception:
+            raise forms.ValidationError('Please upload an image')
+        if image.format == 'JPEG':
+            image_format, extension = 'JPEG', '.jpg'
+            image = image.convert('RGB')
+        else:
+            image_format, extension = 'PNG', '.png'
+            image = image.convert('RGBA')
+        output = BytesIO()
+        image.save(output, image_format)
+        name = os.path.splitext(os.path.basename(upload.name))[0] or 'profile'
+        return ContentFile(output.getvalue(), name=name + extension)
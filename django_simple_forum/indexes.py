@@ -0,0 +1,150 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Topic, Tags
+
+VERSION_KEY = 'django_simple_forum.indexes.version'
+CHANGE_KEY = 'django_simple_forum.indexes.change.%d'
+
+indexes = []
+
+
+def get_cache():
+    return caches[getattr(settings, 'FORUM_TOPIC_INDEX_CACHE', 'default')]
+
+
+def get_change_seconds():
+    return getattr(settings, 'FORUM_TOPIC_INDEX_CHANGE_SECONDS', 24 * 60 * 60)
+
+
+def get_max_replay():
+    """More changes than this made by other processes are caught up on by a rebuild."""
+    return getattr(settings, 'FORUM_TOPIC_INDEX_MAX_REPLAY', 1000)
+
+
+class TopicIndex(object):
+    """
+    Base of the in-memory topic indexes. Each process builds its own on first use and, before
+    answering, replays the topic changes other processes logged in the cache, see catch_up.
+    Subclasses keep their data in ``clear``, read topics in ``load`` and index one in ``add``.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.clear()
+
+    def clear(self):
+        # topic id: the row add was given, for remove
+        self.topics = {}
+
+    def load(self, topic_ids=None):
+        """{topic id: row} of all the topics or of the given ones; a topic missing from it is dropped."""
+        raise NotImplementedError
+
+    def add(self, topic_id, row):
+        self.topics[topic_id] = row
+
+    def remove(self, topic_id):
+        return self.topics.pop(topic_id, None)
+
+    def build(self):
+        version = get_cache().get_or_set(VERSION_KEY, 0, None)
+        rows = self.load()
+        with self.lock:
+            self.clear()
+            for topic_id, row in rows.items():
+                self.add(topic_id, row)
+            self.version = version
+
+    def refresh(self, topic_ids):
+        rows = self.load(topic_ids)
+        with self.lock:
+            for topic_id in topic_ids:
+                self.remove(topic_id)
+                if topic_id in rows:
+                    self.add(topic_id, rows[topic_id])
+
+    def catch_up(self):
+        """Builds the index, or applies the changes logged since it was last current."""
+        version = get_cache().get(VERSION_KEY)
+        if self.version is not None and version == self.version:
+            return
+        if self.version is None or version is None or not 0 < version - self.version <= get_max_replay():
+            self.build()
+            return
+        changes = get_cache().get_many([CHANGE_KEY % number for number in range(self.version + 1, version + 1)])
+        topic_ids = set()
+        for number in range(self.version + 1, version + 1):
+            # expired, or a change that needs a rebuild
+            if changes.get(CHANGE_KEY % number) is None:
+                self.build()
+                return
+            topic_ids.update(changes[CHANGE_KEY % number])
+        self.refresh(topic_ids)
+        self.version = version
+
+    def apply(self, version, topic_ids):
+        """Applies a change this process logged as ``version``."""
+        if self.version is None:
+            return
+        if topic_ids is None:
+            self.version = None
+            return
+        if version != self.version + 1:
+            # other processes changed topics too; the next read replays their changes and this one
+            return
+        self.refresh(topic_ids)
+        self.version = version
+
+
+def register(index):
+    indexes.append(index)
+    return index
+
+
+def log_change(topic_ids):
+    """
+    Logs a committed change to the topics for the other processes and applies it to this
+    process's indexes; None as ``topic_ids`` makes every process rebuild them.
+    """
+    cache = get_cache()
+    cache.get_or_set(VERSION_KEY, 0, None)
+    version = cache.incr(VERSION_KEY)
+    cache.set(CHANGE_KEY % version, None if topic_ids is None else list(topic_ids), get_change_seconds())
+    for index in indexes:
+        index.apply(version, topic_ids)
+
+
+def log_change_on_commit(topic_ids):
+    transaction.on_commit(lambda: log_change(topic_ids))
+
+
+@receiver(post_save, sender=Topic, dispatch_uid='django_simple_forum.indexes.topic_saved')
+@receiver(post_delete, sender=Topic, dispatch_uid='django_simple_forum.indexes.topic_deleted')
+def topic_changed(sender, instance, **kwargs):
+    log_change_on_commit([instance.id])
+
+
+@receiver(m2m_changed, sender=Topic.tags.through, dispatch_uid='django_simple_forum.indexes.topic_tags_changed')
+def topic_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        log_change_on_commit([instance.id])
+    else:
+        # pk_set holds topic ids; a tag's topics cleared is not worth tracking
+        log_change_on_commit(pk_set if action != 'post_clear' else None)
+
+
+@receiver(post_save, sender=Tags, dispatch_uid='django_simple_forum.indexes.tag_saved')
+@receiver(post_delete, sender=Tags, dispatch_uid='django_simple_forum.indexes.tag_deleted')
+def tag_changed(sender, instance, created=False, **kwargs):
+    # a new tag is on no topic yet; renames and deletions are rare enough to rebuild for
+    if not created:
+        log_change_on_commit(None)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_simple_forum.archive import archive_cold_topics, restore_topic
+from django_simple_forum.models import ArchivedTopic
+
+
+class Command(BaseCommand):
+    help = 'Moves topics inactive for --days days into the archive, or restores an archived topic.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Inactivity threshold, defaults to FORUM_ARCHIVE_AFTER_DAYS.')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--restore', metavar='SLUG', help='Restores the archived topic with this slug.')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            archived = ArchivedTopic.objects.filter(slug=options['restore']).first()
+            if archived is None:
+                raise CommandError('No archived topic "%s"' % options['restore'])
+            restore_topic(archived)
+            self.stdout.write('Restored %s' % archived.title)
+            return
+        count = archive_cold_topics(options['days'], options['batch_size'])
+        self.stdout.write('Archived %d topics' % count)
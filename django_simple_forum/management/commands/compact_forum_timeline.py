@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from django_simple_forum.retention import compact_timeline
+
+
+class Command(BaseCommand):
+    help = 'Summarizes and deletes timeline rows older than FORUM_TIMELINE_RETENTION_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--no-summary', action='store_true', help='Delete the rows without summarizing them.')
+
+    def handle(self, *args, **options):
+        deleted = compact_timeline(options['batch_size'], summary=not options['no_summary'])
+        self.stdout.write('Deleted %d timeline rows' % deleted)
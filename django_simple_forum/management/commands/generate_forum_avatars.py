@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from django_simple_forum.avatars import generate_avatar
+from django_simple_forum.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Generates the avatar thumbnails missing for uploaded profile pictures.'
+
+    def handle(self, *args, **options):
+        profile_ids = list(UserProfile.objects.exclude(profile_pic='').exclude(profile_pic=None).filter(
+            avatar_url='').values_list('id', flat=True))
+        for profile_id in profile_ids:
+            generate_avatar(profile_id)
+        self.stdout.write('Generated %d avatars' % len(profile_ids))
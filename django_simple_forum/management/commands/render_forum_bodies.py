@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from django_simple_forum.models import Topic, Comment
+from django_simple_forum.rendering import render_body
+
+
+class Command(BaseCommand):
+    help = 'Renders the stored HTML and excerpt of topics and comments, in batches of primary keys.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', dest='all',
+                            help='Re-render rows that already have stored HTML.')
+
+    def handle(self, *args, **options):
+        for model, source_field, html_field in ((Topic, 'description', 'description_html'),
+                                                (Comment, 'comment', 'comment_html')):
+            queryset = model.objects.all()
+            if not options['all']:
+                queryset = queryset.filter(**{html_field: ''})
+            rendered = 0
+            last_id = 0
+            while True:
+                rows = list(queryset.filter(id__gt=last_id).order_by('id').values_list(
+                    'id', source_field)[:options['batch_size']])
+                if not rows:
+                    break
+                with transaction.atomic():
+                    for pk, source in rows:
+                        html, excerpt = render_body(source)
+                        # update() leaves the auto_now timestamps alone
+                        model.objects.filter(id=pk).update(**{html_field: html, 'excerpt': excerpt})
+                rendered += len(rows)
+                last_id = rows[-1][0]
+            self.stdout.write('Rendered %d %s rows' % (rendered, model._meta.model_name))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from django_simple_forum.rollups import rollup
+
+
+class Command(BaseCommand):
+    help = 'Adds the topics, comments, votes, likes and follows created since the last run to the daily rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for source, count in rollup(options['batch_size']).items():
+            self.stdout.write('Rolled up %d %s rows' % (count, source))
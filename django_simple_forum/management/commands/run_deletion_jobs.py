@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from django_simple_forum.deletion import run_job
+from django_simple_forum.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = 'Runs the queued deletion jobs and resumes the ones a restart interrupted.'
+
+    def handle(self, *args, **options):
+        for job_id in DeletionJob.objects.filter(status__in=('Queued', 'Running')).order_by('id').values_list(
+                'id', flat=True):
+            job = run_job(job_id)
+            self.stdout.write('%s: %s, %d rows' % (job.label, job.status, job.processed_rows))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from django_simple_forum.notifications import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Emails the due notification digests, at most one per user every FORUM_NOTIFICATION_DIGEST_MINUTES.'
+
+    def handle(self, *args, **options):
+        sent = send_digests()
+        self.stdout.write('Sent %d digests' % sent)
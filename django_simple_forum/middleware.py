@@ -0,0 +1,22 @@
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:
+    MiddlewareMixin = object
+
+from . import routers
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """
+    Keeps a user on the primary database for a short window after any request that wrote,
+    so they read their own writes. Put it first in MIDDLEWARE so session writes are seen.
+    """
+
+    def process_request(self, request):
+        routers.set_pinned(routers.PIN_COOKIE_NAME in request.COOKIES)
+
+    def process_response(self, request, response):
+        if routers.has_written():
+            response.set_cookie(routers.PIN_COOKIE_NAME, '1', max_age=routers.get_pin_seconds(), httponly=True)
+        routers.set_pinned(False)
+        return response
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('django_simple_forum', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='content_type',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='content_type_votes', to='contenttypes.ContentType'),
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='object_id',
+            field=models.PositiveIntegerField(null=True),
+        ),
+    ]
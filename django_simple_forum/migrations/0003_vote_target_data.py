@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def forwards(apps, schema_editor):
+    """
+    Points every vote at the topic or comment it was attached to through the old M2M
+    tables, keeps only the latest vote per (user, target) and drops votes with no target.
+    """
+    db_alias = schema_editor.connection.alias
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Vote = apps.get_model('django_simple_forum', 'Vote')
+    votes = Vote.objects.using(db_alias)
+    for model_name, field_name in (('topic', 'topic_id'), ('comment', 'comment_id')):
+        model = apps.get_model('django_simple_forum', model_name)
+        content_type, _ = ContentType.objects.using(db_alias).get_or_create(
+            app_label='django_simple_forum', model=model_name)
+        links = model.votes.through.objects.using(db_alias).values_list('vote_id', field_name).order_by('vote_id')
+        for vote_id, object_id in links.iterator():
+            votes.filter(id=vote_id, content_type=None).update(content_type=content_type, object_id=object_id)
+
+    duplicates = votes.exclude(content_type=None).values('user', 'content_type', 'object_id').annotate(
+        no_of_votes=Count('id'), last_vote=Max('id')).filter(no_of_votes__gt=1)
+    for duplicate in duplicates.iterator():
+        votes.filter(
+            user=duplicate['user'], content_type=duplicate['content_type'], object_id=duplicate['object_id']
+        ).exclude(id=duplicate['last_vote']).delete()
+    votes.filter(content_type=None).delete()
+
+
+def backwards(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Vote = apps.get_model('django_simple_forum', 'Vote')
+    for model_name, field_name in (('topic', 'topic_id'), ('comment', 'comment_id')):
+        model = apps.get_model('django_simple_forum', model_name)
+        votes = Vote.objects.using(db_alias).filter(
+            content_type__app_label='django_simple_forum', content_type__model=model_name)
+        model.votes.through.objects.using(db_alias).bulk_create([
+            model.votes.through(vote_id=vote_id, **{field_name: object_id})
+            for vote_id, object_id in votes.values_list('id', 'object_id').iterator()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_simple_forum', '0002_vote_target'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
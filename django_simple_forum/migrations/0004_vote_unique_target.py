@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('django_simple_forum', '0003_vote_target_data'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='comment',
+            name='votes',
+        ),
+        migrations.RemoveField(
+            model_name='topic',
+            name='votes',
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='content_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='content_type_votes', to='contenttypes.ContentType'),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='object_id',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together=set([('user', 'content_type', 'object_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='vote',
+            index_together=set([('content_type', 'object_id', 'type')]),
+        ),
+    ]
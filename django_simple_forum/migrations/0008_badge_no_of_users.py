@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.21 on 2026-10-19 07:33
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_badge_users(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Badge = apps.get_model('django_simple_forum', 'Badge')
+    for badge_id, no_of_users in Badge.objects.using(db_alias).annotate(
+            holders=Count('userprofile')).values_list('id', 'holders').iterator():
+        Badge.objects.using(db_alias).filter(id=badge_id).update(no_of_users=no_of_users)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_simple_forum', '0007_profile_pic'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='badge',
+            name='no_of_users',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_badge_users, migrations.RunPython.noop),
+    ]
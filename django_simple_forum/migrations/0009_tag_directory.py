@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.21 on 2026-10-19 07:35
+from __future__ import unicode_literals
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+# a copy of models.tag_bucket as of this migration, so later changes to it do not change the migration
+def tag_bucket(title):
+    letter = unicodedata.normalize('NFKD', title.strip()[:1]).encode('ascii', 'ignore').decode('ascii').lower()
+    return letter if 'a' <= letter <= 'z' else '#'
+
+
+def fill_tag_directory(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Tags = apps.get_model('django_simple_forum', 'Tags')
+    tags = Tags.objects.using(db_alias)
+    for tag_id, title in tags.values_list('id', 'title').iterator():
+        no_of_topics = tags.filter(id=tag_id, topic__status='Published').count()
+        tags.filter(id=tag_id).update(bucket=tag_bucket(title), no_of_topics=no_of_topics)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_simple_forum', '0008_badge_no_of_users'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tags',
+            name='bucket',
+            field=models.CharField(default='#', max_length=1),
+        ),
+        migrations.AddField(
+            model_name='tags',
+            name='no_of_topics',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterIndexTogether(
+            name='tags',
+            index_together=set([('bucket', 'title'), ('no_of_topics', 'title')]),
+        ),
+        migrations.RunPython(fill_tag_directory, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.21 on 2026-10-19 07:42
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('django_simple_forum', '0010_deletion_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTopic',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic_id', models.PositiveIntegerField(unique=True)),
+                ('title', models.CharField(max_length=2000)),
+                ('slug', models.SlugField(max_length=1000)),
+                ('status', models.CharField(choices=[('Draft', 'Draft'), ('Published', 'Published'), ('Disabled', 'Disabled')], max_length=10)),
+                ('created_on', models.DateTimeField()),
+                ('updated_on', models.DateTimeField()),
+                ('no_of_views', models.IntegerField(default=0)),
+                ('no_of_likes', models.IntegerField(default=0)),
+                ('no_of_comments', models.IntegerField(default=0)),
+                ('archived_on', models.DateTimeField(auto_now_add=True)),
+                ('data', models.BinaryField()),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='django_simple_forum.ForumCategory')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.21 on 2026-10-19 07:45
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('django_simple_forum', '0011_archived_topic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('namespace', models.CharField(max_length=250)),
+                ('event_type', models.CharField(max_length=250)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='timeline',
+            index_together=set([('user', 'created_on'), ('content_type', 'object_id', 'namespace')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timelinesummary',
+            unique_together=set([('user', 'month', 'namespace', 'event_type')]),
+        ),
+    ]
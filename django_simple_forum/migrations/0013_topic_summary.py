@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.21 on 2026-10-19 07:49
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_topic_summaries(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Topic = apps.get_model('django_simple_forum', 'Topic')
+    Comment = apps.get_model('django_simple_forum', 'Comment')
+    UserTopics = apps.get_model('django_simple_forum', 'UserTopics')
+    for topic_id, created_by_id, created_on in Topic.objects.using(db_alias).values_list(
+            'id', 'created_by_id', 'created_on').iterator():
+        comments = Comment.objects.using(db_alias).filter(topic_id=topic_id)
+        last_comment = comments.order_by('-id').first()
+        participants = set(comments.exclude(commented_by=None).values_list('commented_by_id', flat=True))
+        participants.update(UserTopics.objects.using(db_alias).filter(
+            models.Q(is_like=True) | models.Q(is_followed=True), topic_id=topic_id).values_list('user_id', flat=True))
+        if created_by_id:
+            participants.add(created_by_id)
+        tag_titles = Topic.tags.through.objects.using(db_alias).filter(topic_id=topic_id).order_by(
+            'tags__title').values_list('tags__title', flat=True)
+        Topic.objects.using(db_alias).filter(id=topic_id).update(
+            no_of_comments=comments.count(),
+            last_comment=last_comment,
+            last_comment_by_id=last_comment.commented_by_id if last_comment else None,
+            last_activity_on=last_comment.created_on if last_comment else created_on,
+            no_of_participants=len(participants),
+            tag_titles=','.join(tag_titles),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('django_simple_forum', '0012_timeline_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='last_activity_on',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='last_comment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='django_simple_forum.Comment'),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='last_comment_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='no_of_comments',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='no_of_participants',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='tag_titles',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='topic',
+            name='created_on',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.RunPython(fill_topic_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.21 on 2026-10-19 07:54
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_comment_paths(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Comment = apps.get_model('django_simple_forum', 'Comment')
+    comments = {}
+    replies = {}
+    # parents have lower ids than their replies
+    for comment_id, parent_id in Comment.objects.using(db_alias).order_by('id').values_list(
+            'id', 'parent_id').iterator():
+        parent = comments.get(parent_id)
+        segment = str(comment_id).zfill(10)
+        if parent is None:
+            comments[comment_id] = {'path': segment, 'depth': 0, 'thread_position': 0}
+            replies[comment_id] = 0
+        else:
+            root_id = int(parent['path'][:10])
+            replies[root_id] += 1
+            comments[comment_id] = {'path': parent['path'] + segment, 'depth': parent['depth'] + 1,
+                                    'thread_position': replies[root_id]}
+    for comment_id, fields in comments.items():
+        Comment.objects.using(db_alias).filter(id=comment_id).update(
+            no_of_replies=replies.get(comment_id, 0), **fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_simple_forum', '0013_topic_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='no_of_replies',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', max_length=750),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='thread_position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterIndexTogether(
+            name='comment',
+            index_together=set([('topic', 'path')]),
+        ),
+        migrations.RunPython(fill_comment_paths, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,16 @@
+import csv
+import json
+import math
+
 from django.contrib.auth import logout
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.shortcuts import redirect, get_object_or_404
 
 from django_simple_forum.models import Topic
+from django_simple_forum.routers import replica_reads
+from django_simple_forum.throttling import throttle
 
 
 class AdminMixin(object):
@@ -27,6 +35,36 @@ class CanUpdateTopicMixin(object):
         return super(CanUpdateTopicMixin, self).dispatch(request, *args, **kwargs)
 
 
+class ReplicaReadMixin(object):
+    """
+    Serves GET/HEAD requests, template rendering included, from a read replica when
+    ReplicaRouter is installed.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super(ReplicaReadMixin, self).dispatch(request, *args, **kwargs)
+        with replica_reads():
+            response = super(ReplicaReadMixin, self).dispatch(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)) and not response.is_rendered:
+                response.render()
+        return response
+
+
+class ThrottleMixin(object):
+    """Answers 429 with Retry-After once the user or their IP runs out of ``throttle_scope`` tokens."""
+    throttle_scope = None
+
+    def dispatch(self, request, *args, **kwargs):
+        retry_after = throttle(request, self.throttle_scope)
+        if retry_after:
+            response = JsonResponse({'error': True, 'response': 'Too many requests, please try again later'},
+                                    status=429)
+            response['Retry-After'] = int(math.ceil(retry_after))
+            return response
+        return super(ThrottleMixin, self).dispatch(request, *args, **kwargs)
+
+
 class LoginRequiredMixin(object):
 
     def dispatch(self, request, *args, **kwargs):
@@ -37,3 +75,73 @@ class LoginRequiredMixin(object):
             else:
                 logout(self.request)
         return redirect(reverse('django_simple_forum:topic_list'))
+
+
+class Echo(object):
+    """File-like object that hands back what is written, so csv.writer rows can be streamed."""
+
+    def write(self, value):
+        return value
+
+
+class ExportMixin(object):
+    """
+    Streams the list as CSV or NDJSON when requested with ?export=csv|ndjson.
+
+    Rows are read with values_list() from queryset.iterator(), so only one chunk of
+    the result set is held in memory; computed columns must be annotations.
+    """
+    export_fields = ()
+    export_filename = 'export'
+    export_content_types = {
+        'csv': 'text/csv',
+        'ndjson': 'application/x-ndjson',
+    }
+
+    def get_export_queryset(self):
+        """The rows to export; the list's own queryset unless a view narrows or annotates it."""
+        return self.get_queryset()
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('export')
+        if export_format in self.export_content_types:
+            return self.export(export_format)
+        return super(ExportMixin, self).get(request, *args, **kwargs)
+
+    def export_rows(self, export_format):
+        rows = self.get_export_queryset().values_list(*self.export_fields).iterator()
+        if export_format == 'csv':
+            writer = csv.writer(Echo())
+            yield writer.writerow(self.export_fields)
+            for row in rows:
+                yield writer.writerow(row)
+        else:
+            for row in rows:
+                yield json.dumps(dict(zip(self.export_fields, row)), cls=DjangoJSONEncoder) + '\n'
+
+    def export(self, export_format):
+        response = StreamingHttpResponse(
+            self.export_rows(export_format), content_type=self.export_content_types[export_format])
+        response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (self.export_filename, export_format)
+        return response
+
+
+class BulkActionMixin(object):
+    """
+    Applies the POSTed action to every object in the POSTed ``ids`` list.
+
+    Each name in ``bulk_actions`` maps to a ``bulk_<action>(ids)`` method which runs one
+    set-based UPDATE/DELETE/M2M statement and returns the number of affected rows.
+    """
+    bulk_actions = ()
+
+    def post(self, request, *args, **kwargs):
+        action = request.POST.get('action')
+        ids = [pk for pk in request.POST.getlist('ids') if pk.isdigit()]
+        if action not in self.bulk_actions:
+            return JsonResponse({'error': True, 'response': 'Invalid action'})
+        if not ids:
+            return JsonResponse({'error': True, 'response': 'Select at least one item'})
+        count = getattr(self, 'bulk_' + action)(ids)
+        return JsonResponse({'error': False, 'response': 'Successfully Updated %d Items' % count,
+                             'action': action, 'count': count})
@@ -1,7 +1,20 @@
+import json
+import threading
+import unicodedata
+import zlib
+from contextlib import contextmanager
+from datetime import timedelta
+
 from django.conf import settings
-from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Q, F, Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, pre_delete, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 
 STATUS = (
     ('Draft', 'Draft'),
@@ -16,11 +29,39 @@ USER_ROLES = (
 
 User = settings.AUTH_USER_MODEL
 
+# width of one comment id in Comment.path
+COMMENT_PATH_WIDTH = 10
+
+
+def get_timeline_retention_days():
+    return getattr(settings, 'FORUM_TIMELINE_RETENTION_DAYS', 365)
+
+
+def get_timeline_cutoff():
+    """Timeline rows created before this are compacted into TimelineSummary."""
+    return timezone.now() - timedelta(days=get_timeline_retention_days())
+
+
+def tag_bucket(title):
+    """Directory letter of a tag: its first letter without accents, lowercased, or '#'."""
+    letter = unicodedata.normalize('NFKD', title.strip()[:1]).encode('ascii', 'ignore').decode('ascii').lower()
+    return letter if 'a' <= letter <= 'z' else '#'
+
 
 # tags created for topic
 class Tags(models.Model):
     title = models.CharField(max_length=50, unique=True)
     slug = models.CharField(max_length=50, unique=True)
+    bucket = models.CharField(max_length=1, default='#')
+    # published topics with this tag, kept in sync by update_tag_counts
+    no_of_topics = models.IntegerField(default=0)
+
+    class Meta:
+        index_together = [("bucket", "title"), ("no_of_topics", "title"), ]
+
+    def save(self, *args, **kwargs):
+        self.bucket = tag_bucket(self.title)
+        super(Tags, self).save(*args, **kwargs)
 
     def get_topics(self):
         topics = Topic.objects.filter(tags__in=[self], status='Published')
@@ -31,10 +72,16 @@ class Tags(models.Model):
 class Badge(models.Model):
     title = models.CharField(max_length=50, unique=True)
     slug = models.CharField(max_length=50, unique=True)
+    # kept in sync with UserProfile.badges by update_badge_counts
+    no_of_users = models.IntegerField(default=0)
+    users_per_page = 20
 
-    def get_users(self):
-        user_profile = UserProfile.objects.filter(badges__in=[self])
-        return user_profile
+    def get_users(self, page=1):
+        start = (page - 1) * self.users_per_page
+        user_profiles = UserProfile.objects.filter(badges=self).select_related('user').annotate(
+            no_of_up_votes=Coalesce(Sum('user__usertopics__no_of_votes'), 0),
+            no_of_down_votes=Coalesce(Sum('user__usertopics__no_of_down_votes'), 0)).order_by('id')
+        return user_profiles[start:start + self.users_per_page]
 
 
 # user profile to store no of votes available to user, badges for a topic, user roles,
@@ -46,6 +93,12 @@ class UserProfile(models.Model):
     user_roles = models.CharField(choices=USER_ROLES, max_length=10)
     badges = models.ManyToManyField(Badge)
     send_mailnotifications = models.BooleanField(default=False)
+    # re-encoded by ProfilePicForm, so it only ever holds decoded image data
+    profile_pic = models.ImageField(upload_to=file_prepend, null=True, blank=True)
+    # thumbnail of profile_pic, generated in the background after each upload
+    avatar_url = models.CharField(max_length=1000, blank=True, default='')
+    # when the last notification digest was sent
+    last_digest_on = models.DateTimeField(null=True, blank=True)
 
     # need to add social details for a user if we implement socail login
 
@@ -78,9 +131,14 @@ class UserProfile(models.Model):
         return topics
 
     def get_timeline(self):
-        timeline = Timeline.objects.filter(user=self.user).order_by('-created_on')
+        # the created_on bound keeps the read on the recent end of the (user, created_on) index
+        timeline = Timeline.objects.filter(user=self.user, created_on__gte=get_timeline_cutoff()).order_by(
+            '-created_on')
         return timeline
 
+    def get_timeline_summary(self):
+        return TimelineSummary.objects.filter(user=self.user).order_by('-month', 'namespace', 'event_type')
+
     def get_user_topic_tags(self):
         tags = Tags.objects.filter(id__in=self.get_topics().values_list('tags', flat=True))
         return tags
@@ -116,6 +174,17 @@ class ForumCategory(models.Model):
         return self.title
 
 
+def get_category_ids(category_id):
+    """The category and all of its subcategories."""
+    category_ids = [category_id]
+    children = [category_id]
+    while children:
+        children = list(ForumCategory.objects.filter(parent_id__in=children).values_list('id', flat=True))
+        category_ids.extend(children)
+    return category_ids
+
+
+# one vote per user on a topic or comment
 class Vote(models.Model):
     TYPES = (
         ("U", "Up"),
@@ -124,24 +193,42 @@ class Vote(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     type = models.CharField(choices=TYPES, max_length=1)
     created_on = models.DateTimeField(auto_now_add=True)
+    content_type = models.ForeignKey(ContentType, related_name="content_type_votes", on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey("content_type", "object_id")
+
+    class Meta:
+        unique_together = [("user", "content_type", "object_id"), ]
+        index_together = [("content_type", "object_id", "type"), ]
 
     def __str__(self):
-        return self.user
+        return str(self.user)
 
 
 class Topic(models.Model):
     title = models.CharField(max_length=2000)
     description = models.TextField()
+    # description sanitized and linkified once at save time by TopicForm
+    description_html = models.TextField(blank=True, default='')
+    excerpt = models.CharField(max_length=250, blank=True, default='')
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     status = models.CharField(choices=STATUS, max_length=10)
     category = models.ForeignKey(ForumCategory, on_delete=models.SET_NULL, null=True)
-    created_on = models.DateTimeField(auto_now=True)
+    created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
     no_of_views = models.IntegerField(default='0')
     slug = models.SlugField(max_length=1000)
     tags = models.ManyToManyField(Tags)
     no_of_likes = models.IntegerField(default='0')
-    votes = models.ManyToManyField(Vote)
+    votes = GenericRelation(Vote, related_query_name="topic")
+    # list row summary, kept up to date by the comment, follower and tag signals below
+    no_of_comments = models.IntegerField(default=0)
+    last_comment = models.ForeignKey('Comment', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    last_comment_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    last_activity_on = models.DateTimeField(null=True, blank=True)
+    no_of_participants = models.IntegerField(default=0)
+    # comma separated, tag titles come from a comma separated input so never contain one
+    tag_titles = models.TextField(blank=True, default='')
 
     def get_comments(self):
         comments = Comment.objects.filter(topic=self, parent=None)
@@ -156,23 +243,31 @@ class Topic(models.Model):
         return comments
 
     def get_topic_users(self):
-        comment_user_ids = Comment.objects.filter(topic=self).values_list('commented_by', flat=True)
-        liked_users_ids = UserTopics.objects.filter(topic=self, is_like=True).values_list('user', flat=True)
-        followed_users = UserTopics.objects.filter(topic=self, is_followed=True).values_list('user', flat=True)
-        all_users = list(comment_user_ids) + list(liked_users_ids) + list(followed_users) + [self.created_by.id]
-        users = UserProfile.objects.filter(user_id__in=set(all_users))
+        # one query: the participant ids are subqueries instead of lists fetched up front
+        comment_user_ids = Comment.objects.filter(topic=self).values('commented_by')
+        topic_user_ids = UserTopics.objects.filter(
+            Q(is_like=True) | Q(is_followed=True), topic=self).values('user')
+        users = UserProfile.objects.filter(
+            Q(user_id__in=comment_user_ids) | Q(user_id__in=topic_user_ids) | Q(user_id=self.created_by_id)
+        ).select_related('user')
         return users
 
     # def get_total_of_votes(self):
     #     no_of_votes = self.no_of_votes + self.no_of_down_votes
     #     return no_of_votes
 
+    def get_user_vote(self, user):
+        return self.votes.filter(user=user).first()
+
     def up_votes_count(self):
         return self.votes.filter(type="U").count()
 
     def down_votes_count(self):
         return self.votes.filter(type="D").count()
 
+    def get_tag_titles(self):
+        return self.tag_titles.split(',') if self.tag_titles else []
+
     def __str__(self):
         return self.title
 
@@ -189,20 +284,51 @@ class UserTopics(models.Model):
     is_like = models.BooleanField(default=False)
 
 
+# a category or tag whose published topics make up the user's feed, see feeds.py
+class Subscription(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="subscriptions")
+    category = models.ForeignKey(ForumCategory, null=True, blank=True, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tags, null=True, blank=True, on_delete=models.CASCADE)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [("user", "category"), ("user", "tag"), ]
+
+
 class Comment(models.Model):
     comment = models.TextField(null=True, blank=True)
+    # comment sanitized and linkified once at save time by CommentForm
+    comment_html = models.TextField(blank=True, default='')
+    excerpt = models.CharField(max_length=250, blank=True, default='')
     commented_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="commented_by")
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name="topic_comments")
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now_add=True)
     parent = models.ForeignKey("self", blank=True, null=True, related_name="comment_parent", on_delete=models.CASCADE)
     mentioned = models.ManyToManyField(User, related_name="mentioned_users")
-    votes = models.ManyToManyField(Vote)
+    votes = GenericRelation(Vote, related_query_name="comment")
+    # zero padded ids from the top level comment down to this one, so a topic's
+    # comments sort in thread order by path; set by comment_saved
+    path = models.CharField(max_length=750, blank=True, default='')
+    depth = models.PositiveIntegerField(default=0)
+    # 1 for the first reply in a top level comment's thread, 2 for the next...; 0 for top level comments
+    thread_position = models.PositiveIntegerField(default=0)
+    # replies at any depth, kept on top level comments only
+    no_of_replies = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        index_together = [("topic", "path"), ]
 
     def get_comments(self):
         comments = self.comment_parent.all()
         return comments
 
+    def get_root_id(self):
+        return int(self.path[:COMMENT_PATH_WIDTH])
+
+    def get_user_vote(self, user):
+        return self.votes.filter(user=user).first()
+
     def up_votes_count(self):
         return self.votes.filter(type="U").count()
 
@@ -210,6 +336,17 @@ class Comment(models.Model):
         return self.votes.filter(type="D").count()
 
 
+# a comment waiting for its recipient's next notification digest, see notifications.py
+class PendingNotification(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pending_notifications")
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name="+")
+    is_mentioned = models.BooleanField(default=False)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [("user", "comment"), ]
+
+
 # user activity
 class Timeline(models.Model):
     content_type = models.ForeignKey(ContentType, related_name="content_type_timelines", on_delete=models.CASCADE)
@@ -223,5 +360,397 @@ class Timeline(models.Model):
     is_read = models.BooleanField(default=False)
 
     class Meta:
-        index_together = [("content_type", "object_id", "namespace"), ]
+        index_together = [("content_type", "object_id", "namespace"), ("user", "created_on"), ]
+        ordering = ['-created_on']
+
+
+# Timeline rows past FORUM_TIMELINE_RETENTION_DAYS, counted per user and month by compact_forum_timeline
+class TimelineSummary(models.Model):
+    user = models.ForeignKey(User, null=True, on_delete=models.CASCADE)
+    month = models.DateField()
+    namespace = models.CharField(max_length=250)
+    event_type = models.CharField(max_length=250)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [("user", "month", "namespace", "event_type"), ]
+
+
+# daily activity per category, maintained by the rollup_forum_activity command
+class DailyActivity(models.Model):
+    day = models.DateField()
+    category = models.ForeignKey(ForumCategory, null=True, blank=True, on_delete=models.CASCADE)
+    topics = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    votes = models.IntegerField(default=0)
+    likes = models.IntegerField(default=0)
+    follows = models.IntegerField(default=0)
+    active_users = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [("day", "category"), ]
+
+
+# users counted in DailyActivity.active_users, so a user is counted once a day per category
+class DailyActiveUser(models.Model):
+    day = models.DateField()
+    category = models.ForeignKey(ForumCategory, null=True, blank=True, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = [("day", "category", "user"), ]
+
+
+# last primary key of each source table folded into DailyActivity
+class RollupWatermark(models.Model):
+    source = models.CharField(max_length=50, unique=True)
+    last_id = models.PositiveIntegerField(default=0)
+    # comma separated ids below last_id that were not committed yet when it passed them,
+    # looked for again while they are within FORUM_ROLLUP_GAP_WINDOW ids of it
+    gaps = models.TextField(blank=True, default='')
+
+    def get_gaps(self):
+        return set(int(pk) for pk in self.gaps.split(',') if pk)
+
+
+# background deletion of a user, category or topic and everything that depends on it, see deletion.py
+class DeletionJob(models.Model):
+    STATUSES = (
+        ("Queued", "Queued"),
+        ("Running", "Running"),
+        ("Done", "Done"),
+        ("Failed", "Failed"),
+    )
+    content_type = models.ForeignKey(ContentType, related_name="content_type_deletion_jobs", on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey("content_type", "object_id")
+    label = models.CharField(max_length=250)
+    status = models.CharField(choices=STATUSES, max_length=10, default="Queued")
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    created_on = models.DateTimeField(auto_now_add=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+    # the thread running the job holds it until then, see deletion.claim_job
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        index_together = [("content_type", "object_id", "status"), ]
         ordering = ['-created_on']
+
+    def get_progress(self):
+        if self.status == "Done":
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100 * self.processed_rows // self.total_rows, 99)
+
+    def __str__(self):
+        return self.label
+
+
+# a cold topic moved out of Topic with its comments, votes and followers in one compressed blob, see archive.py
+class ArchivedTopic(models.Model):
+    topic_id = models.PositiveIntegerField(unique=True)
+    title = models.CharField(max_length=2000)
+    slug = models.SlugField(max_length=1000)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    status = models.CharField(choices=STATUS, max_length=10)
+    category = models.ForeignKey(ForumCategory, on_delete=models.SET_NULL, null=True)
+    created_on = models.DateTimeField()
+    updated_on = models.DateTimeField()
+    no_of_views = models.IntegerField(default=0)
+    no_of_likes = models.IntegerField(default=0)
+    no_of_comments = models.IntegerField(default=0)
+    archived_on = models.DateTimeField(auto_now_add=True)
+    data = models.BinaryField()
+
+    def get_data(self):
+        if not hasattr(self, '_data'):
+            self._data = json.loads(zlib.decompress(bytes(self.data)).decode('utf-8'))
+        return self._data
+
+    def set_data(self, data):
+        self._data = data
+        self.data = zlib.compress(json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8'), 9)
+
+    def get_tags(self):
+        return Tags.objects.filter(id__in=self.get_data()['tags'])
+
+    def get_comments(self):
+        """Top level comments, each with its up/down votes and all of its replies, depth first."""
+        data = self.get_data()
+        votes = {}
+        for vote in data['votes']:
+            votes.setdefault((vote['comment_id'], vote['type']), []).append(vote)
+        children = {}
+        for comment in data['comments']:
+            comment['up_votes_count'] = len(votes.get((comment['id'], 'U'), []))
+            comment['down_votes_count'] = len(votes.get((comment['id'], 'D'), []))
+            children.setdefault(comment['parent_id'], []).append(comment)
+
+        def replies(comment_id):
+            for reply in children.get(comment_id, []):
+                yield reply
+                for each in replies(reply['id']):
+                    yield each
+
+        for comment in children.get(None, []):
+            comment['replies'] = list(replies(comment['id']))
+        return children.get(None, [])
+
+    def get_user_ids(self):
+        data = self.get_data()
+        return {comment['commented_by_id'] for comment in data['comments']} | {self.created_by_id}
+
+    def up_votes_count(self):
+        return len([vote for vote in self.get_data()['votes'] if vote['comment_id'] is None and vote['type'] == 'U'])
+
+    def down_votes_count(self):
+        return len([vote for vote in self.get_data()['votes'] if vote['comment_id'] is None and vote['type'] == 'D'])
+
+    def __str__(self):
+        return self.title
+
+
+def update_badge_counts(badge_ids):
+    """Recounts the holders of the given badges in one UPDATE."""
+    holders = UserProfile.badges.through.objects.filter(badge=OuterRef('pk')).order_by().values(
+        'badge').annotate(count=Count('id')).values('count')
+    Badge.objects.filter(id__in=badge_ids).update(
+        no_of_users=Coalesce(Subquery(holders, output_field=models.IntegerField()), 0))
+
+
+@receiver(m2m_changed, sender=UserProfile.badges.through, dispatch_uid='django_simple_forum.badge_holders_changed')
+def badge_holders_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse: instance is a Badge and pk_set holds UserProfile ids
+    if action == 'pre_clear':
+        instance._cleared_badge_ids = [instance.pk] if reverse else list(
+            instance.badges.values_list('id', flat=True))
+    elif action == 'post_clear':
+        update_badge_counts(instance.__dict__.pop('_cleared_badge_ids', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        update_badge_counts([instance.pk] if reverse else pk_set)
+
+
+@receiver(pre_delete, sender=UserProfile, dispatch_uid='django_simple_forum.user_profile_deleting')
+def user_profile_deleting(sender, instance, **kwargs):
+    instance._deleted_badge_ids = list(instance.badges.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=UserProfile, dispatch_uid='django_simple_forum.user_profile_deleted')
+def user_profile_deleted(sender, instance, **kwargs):
+    update_badge_counts(instance.__dict__.pop('_deleted_badge_ids', []))
+
+
+def update_tag_counts(tag_ids):
+    """Recounts the published topics of the given tags in one UPDATE."""
+    tagged = Topic.tags.through.objects.filter(tags=OuterRef('pk'), topic__status='Published').order_by().values(
+        'tags').annotate(count=Count('id')).values('count')
+    Tags.objects.filter(id__in=tag_ids).update(
+        no_of_topics=Coalesce(Subquery(tagged, output_field=models.IntegerField()), 0))
+
+
+def update_topic_tag_counts(topic_ids):
+    update_tag_counts(list(Topic.tags.through.objects.filter(topic_id__in=topic_ids).values_list('tags_id', flat=True)))
+
+
+def get_topic_participants(topic_ids):
+    """
+    {topic id: set of user ids} of the topics' authors, commenters, followers and likers,
+    in three queries however many topics there are.
+    """
+    participants = {topic_id: set() for topic_id in topic_ids}
+    rows = list(Topic.objects.filter(id__in=topic_ids).exclude(created_by=None).values_list('id', 'created_by_id'))
+    rows += Comment.objects.filter(topic_id__in=topic_ids).exclude(commented_by=None).values_list(
+        'topic_id', 'commented_by_id').distinct()
+    rows += UserTopics.objects.filter(Q(is_like=True) | Q(is_followed=True), topic_id__in=topic_ids).values_list(
+        'topic_id', 'user_id')
+    for topic_id, user_id in rows:
+        participants[topic_id].add(user_id)
+    return participants
+
+
+def update_topic_participants(topic_ids):
+    by_count = {}
+    for topic_id, user_ids in get_topic_participants(topic_ids).items():
+        by_count.setdefault(len(user_ids), []).append(topic_id)
+    for count, ids in by_count.items():
+        Topic.objects.filter(id__in=ids).update(no_of_participants=count)
+
+
+def update_topic_comments(topic_ids):
+    """Recomputes the reply count and last comment columns of the given topics in one UPDATE, then the participants."""
+    comments = Comment.objects.filter(topic=OuterRef('pk')).order_by().values('topic').annotate(
+        count=Count('id')).values('count')
+    last_comment = Comment.objects.filter(topic=OuterRef('pk')).order_by('-id')
+    Topic.objects.filter(id__in=topic_ids).update(
+        no_of_comments=Coalesce(Subquery(comments, output_field=models.IntegerField()), 0),
+        last_comment=Subquery(last_comment.values('id')[:1]),
+        last_comment_by=Subquery(last_comment.values('commented_by')[:1]),
+        last_activity_on=Coalesce(
+            Subquery(last_comment.values('created_on')[:1], output_field=models.DateTimeField()), F('created_on')))
+    update_topic_participants(topic_ids)
+
+
+# per thread: ids of the topics being deleted, and the topics to recompute at the end of batch_topic_updates
+_topic_updates = threading.local()
+
+
+@contextmanager
+def batch_topic_updates():
+    """
+    Collects the recomputes the comment and user topic signals ask for and runs each once, when
+    the block ends without an error, instead of once per saved or deleted row.
+    """
+    batch = _topic_updates.batch = (set(), set())
+    try:
+        yield
+    finally:
+        _topic_updates.batch = None
+    comment_topic_ids, participant_topic_ids = batch
+    if comment_topic_ids:
+        update_topic_comments(list(comment_topic_ids))
+    if participant_topic_ids - comment_topic_ids:
+        update_topic_participants(list(participant_topic_ids - comment_topic_ids))
+
+
+def is_topic_deleting(topic_id):
+    return topic_id in getattr(_topic_updates, 'deleting', ())
+
+
+def refresh_topic(topic_id, comments=True):
+    """
+    Recomputes a topic's comment columns, or only its participants, right away or at the end of
+    batch_topic_updates; not at all when the topic itself is being deleted.
+    """
+    if is_topic_deleting(topic_id):
+        return
+    batch = getattr(_topic_updates, 'batch', None)
+    if batch is not None:
+        batch[0 if comments else 1].add(topic_id)
+    elif comments:
+        update_topic_comments([topic_id])
+    else:
+        update_topic_participants([topic_id])
+
+
+def update_topic_tag_titles(topic_ids):
+    titles = {topic_id: [] for topic_id in topic_ids}
+    for topic_id, title in Topic.tags.through.objects.filter(topic_id__in=topic_ids).order_by(
+            'tags__title').values_list('topic_id', 'tags__title'):
+        titles[topic_id].append(title)
+    by_titles = {}
+    for topic_id, tag_titles in titles.items():
+        by_titles.setdefault(','.join(tag_titles), []).append(topic_id)
+    for tag_titles, ids in by_titles.items():
+        Topic.objects.filter(id__in=ids).update(tag_titles=tag_titles)
+
+
+@receiver(m2m_changed, sender=Topic.tags.through, dispatch_uid='django_simple_forum.topic_tags_changed')
+def topic_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse: instance is a Tags and pk_set holds Topic ids
+    if action == 'pre_clear':
+        instance._cleared_tag_ids = [instance.pk] if reverse else list(instance.tags.values_list('id', flat=True))
+        instance._cleared_topic_ids = list(instance.topic_set.values_list('id', flat=True)) if reverse else [
+            instance.pk]
+    elif action == 'post_clear':
+        update_tag_counts(instance.__dict__.pop('_cleared_tag_ids', []))
+        update_topic_tag_titles(instance.__dict__.pop('_cleared_topic_ids', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        update_tag_counts([instance.pk] if reverse else pk_set)
+        update_topic_tag_titles(pk_set if reverse else [instance.pk])
+
+
+@receiver(post_save, sender=Topic, dispatch_uid='django_simple_forum.topic_saved')
+def topic_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        update_topic_comments([instance.pk])
+    # only a status change can move a saved topic in or out of the counts
+    elif update_fields is None or 'status' in update_fields:
+        update_topic_tag_counts([instance.pk])
+
+
+@receiver(pre_delete, sender=Topic, dispatch_uid='django_simple_forum.topic_deleting')
+def topic_deleting(sender, instance, **kwargs):
+    instance._deleted_tag_ids = list(instance.tags.values_list('id', flat=True))
+    # its comments and followers are deleted first; recomputing the topic for each of them is wasted
+    if not hasattr(_topic_updates, 'deleting'):
+        _topic_updates.deleting = set()
+    _topic_updates.deleting.add(instance.pk)
+
+
+@receiver(post_delete, sender=Topic, dispatch_uid='django_simple_forum.topic_deleted')
+def topic_deleted(sender, instance, **kwargs):
+    update_tag_counts(instance.__dict__.pop('_deleted_tag_ids', []))
+    _topic_updates.deleting.discard(instance.pk)
+
+
+@receiver(post_save, sender=Tags, dispatch_uid='django_simple_forum.tag_saved')
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        update_topic_tag_titles(list(instance.topic_set.values_list('id', flat=True)))
+
+
+def get_comment_path(parent_path, comment_id):
+    return parent_path + str(comment_id).zfill(COMMENT_PATH_WIDTH)
+
+
+def set_comment_path(comment):
+    """Sets path, depth and thread_position of a new comment and counts it into its thread's no_of_replies."""
+    if comment.parent_id:
+        parent = Comment.objects.values('path', 'depth').get(id=comment.parent_id)
+        root = Comment.objects.filter(id=int(parent['path'][:COMMENT_PATH_WIDTH]))
+        root.update(no_of_replies=F('no_of_replies') + 1)
+        comment.path = get_comment_path(parent['path'], comment.id)
+        comment.depth = parent['depth'] + 1
+        comment.thread_position = root.values_list('no_of_replies', flat=True).get()
+    else:
+        comment.path = get_comment_path('', comment.id)
+        comment.depth = comment.thread_position = 0
+    Comment.objects.filter(id=comment.id).update(
+        path=comment.path, depth=comment.depth, thread_position=comment.thread_position)
+
+
+def rebuild_comment_paths(topic_id):
+    """Recomputes path, depth, thread_position and no_of_replies for every comment of a topic."""
+    comments = {}
+    replies = {}
+    # parents have lower ids than their replies
+    for comment_id, parent_id in Comment.objects.filter(topic_id=topic_id).order_by('id').values_list(
+            'id', 'parent_id'):
+        parent = comments.get(parent_id)
+        if parent is None:
+            comments[comment_id] = {'path': get_comment_path('', comment_id), 'depth': 0, 'thread_position': 0}
+            replies[comment_id] = 0
+        else:
+            root_id = int(parent['path'][:COMMENT_PATH_WIDTH])
+            replies[root_id] += 1
+            comments[comment_id] = {'path': get_comment_path(parent['path'], comment_id),
+                                    'depth': parent['depth'] + 1, 'thread_position': replies[root_id]}
+    for comment_id, fields in comments.items():
+        Comment.objects.filter(id=comment_id).update(no_of_replies=replies.get(comment_id, 0), **fields)
+
+
+@receiver(post_save, sender=Comment, dispatch_uid='django_simple_forum.comment_saved')
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        set_comment_path(instance)
+        update_topic_comments([instance.topic_id])
+
+
+@receiver(post_delete, sender=Comment, dispatch_uid='django_simple_forum.comment_deleted')
+def comment_deleted(sender, instance, **kwargs):
+    if is_topic_deleting(instance.topic_id):
+        return
+    if instance.depth:
+        Comment.objects.filter(id=instance.get_root_id(), no_of_replies__gt=0).update(
+            no_of_replies=F('no_of_replies') - 1)
+    refresh_topic(instance.topic_id)
+
+
+@receiver(post_save, sender=UserTopics, dispatch_uid='django_simple_forum.user_topic_saved')
+@receiver(post_delete, sender=UserTopics, dispatch_uid='django_simple_forum.user_topic_deleted')
+def user_topic_changed(sender, instance, **kwargs):
+    refresh_topic(instance.topic_id, comments=False)
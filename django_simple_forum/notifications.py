@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .delivery import DeliveryError, get_email_template, html_message, send_messages
+from .models import UserProfile, PendingNotification, get_topic_participants
+
+
+def get_digest_minutes():
+    """Minutes between two digests to the same user; 0 emails every comment right away."""
+    return getattr(settings, 'FORUM_NOTIFICATION_DIGEST_MINUTES', 60)
+
+
+def get_recipients(comment):
+    """
+    {user id: mentioned} of the users to notify of a comment: the topic's participants and the
+    users mentioned in it, less its author, who turned email notifications on. A user mentioned
+    in a topic they take part in is notified once.
+    """
+    recipients = dict.fromkeys(get_topic_participants([comment.topic_id])[comment.topic_id], False)
+    recipients.update(dict.fromkeys(comment.mentioned.values_list('id', flat=True), True))
+    recipients.pop(comment.commented_by_id, None)
+    subscribed = set(UserProfile.objects.filter(
+        user_id__in=recipients, send_mailnotifications=True).values_list('user_id', flat=True))
+    return {user_id: mentioned for user_id, mentioned in recipients.items() if user_id in subscribed}
+
+
+def queue_notifications(comment, recipients):
+    PendingNotification.objects.bulk_create([
+        PendingNotification(user_id=user_id, comment=comment, is_mentioned=mentioned)
+        for user_id, mentioned in recipients.items()])
+
+
+def get_due_user_ids(now):
+    last_digest_on = now - timedelta(minutes=get_digest_minutes())
+    return UserProfile.objects.filter(
+        Q(last_digest_on=None) | Q(last_digest_on__lte=last_digest_on),
+        send_mailnotifications=True, user__pending_notifications__isnull=False,
+    ).order_by('user_id').values_list('user_id', flat=True).distinct()
+
+
+def get_digest(user_id, template):
+    """
+    A user's digest email of their pending notifications, grouped by topic, and the ids of the
+    notifications in it; None if there are none.
+    """
+    notifications = list(PendingNotification.objects.filter(user_id=user_id).select_related(
+        'user', 'comment__topic', 'comment__commented_by').order_by('comment__topic_id', 'comment_id'))
+    if not notifications:
+        return None
+    topics = []
+    for notification in notifications:
+        topic = notification.comment.topic
+        if not topics or topics[-1]['topic'] != topic:
+            topics.append({
+                'topic': topic, 'notifications': [],
+                'topic_url': settings.HOST_URL + reverse('django_simple_forum:view_topic', kwargs={'slug': topic.slug}),
+            })
+        topics[-1]['notifications'].append(notification)
+    user = notifications[0].user
+    rendered = template.render({'user': user, 'topics': topics, 'HOST_URL': settings.HOST_URL})
+    subject = "%d New Comments For Your Topics" % len(notifications)
+    return html_message(subject, rendered, [user.email]), [notification.id for notification in notifications]
+
+
+def send_digests():
+    """
+    Sends one digest to every subscribed user with pending notifications whose last digest is at
+    least FORUM_NOTIFICATION_DIGEST_MINUTES old. Returns the number of digests sent. When some
+    could not be sent, their notifications are kept for the next run and the DeliveryError is raised.
+    """
+    now = timezone.now()
+    # users who turned notifications off since the comments were queued
+    PendingNotification.objects.exclude(
+        user__in=UserProfile.objects.filter(send_mailnotifications=True).values('user')).delete()
+    template = get_email_template('emails/comment_digest.html')
+    digests = {}
+    for user_id in list(get_due_user_ids(now)):
+        digest = get_digest(user_id, template)
+        if digest is not None:
+            digests[user_id] = digest
+    messages = [message for message, notification_ids in digests.values()]
+    error = None
+    try:
+        send_messages(messages)
+    except DeliveryError as e:
+        messages, error = e.sent, e
+    # only the notifications of digests that went out are cleared, the rest are sent next time
+    sent = set(id(message) for message in messages)
+    digests = {user_id: digest for user_id, digest in digests.items() if id(digest[0]) in sent}
+    with transaction.atomic():
+        PendingNotification.objects.filter(id__in=[
+            notification_id for message, notification_ids in digests.values() for notification_id in notification_ids
+        ]).delete()
+        UserProfile.objects.filter(user_id__in=digests).update(last_digest_on=now)
+    if error is not None:
+        raise error
+    return len(digests)
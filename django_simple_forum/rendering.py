@@ -0,0 +1,127 @@
+import re
+
+from django.urls import reverse
+from django.utils.html import escape, urlize
+from django.utils.six.moves.html_parser import HTMLParser
+from django.utils.text import Truncator
+
+try:
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+except ImportError:
+    from django.contrib.auth.models import User
+
+ALLOWED_TAGS = {
+    'a': ('href', 'title'),
+    'b': (), 'blockquote': (), 'br': (), 'code': (), 'em': (), 'h1': (), 'h2': (), 'h3': (), 'h4': (),
+    'h5': (), 'h6': (), 'hr': (), 'i': (), 'li': (), 'ol': (), 'p': (), 'pre': (), 's': (), 'span': (),
+    'strike': (), 'strong': (), 'sub': (), 'sup': (), 'u': (), 'ul': (),
+    'img': ('src', 'alt', 'title', 'width', 'height'),
+}
+VOID_TAGS = ('br', 'hr', 'img')
+# text inside these tags is dropped along with the tags
+DROP_CONTENT_TAGS = ('script', 'style', 'iframe', 'object')
+# tags that separate words in the plain-text excerpt
+BLOCK_TAGS = ('blockquote', 'br', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'li', 'ol', 'p', 'pre',
+              'table', 'td', 'th', 'tr', 'ul')
+URL_ATTRS = ('href', 'src')
+ALLOWED_SCHEMES = ('http', 'https', 'mailto')
+
+MENTION_RE = re.compile(r'(?<![\w@])@(\w(?:[\w.+-]*\w)?(?:@\w[\w-]*(?:\.\w[\w-]*)+)?)')
+SCHEME_RE = re.compile(r'^([a-zA-Z][a-zA-Z0-9+.-]*):')
+EXCERPT_LENGTH = 200
+
+
+def is_safe_url(url):
+    # browsers ignore whitespace and control characters inside the scheme
+    match = SCHEME_RE.match(re.sub(r'[\x00-\x20]+', '', url))
+    return not match or match.group(1).lower() in ALLOWED_SCHEMES
+
+
+class BodyRenderer(HTMLParser):
+    """
+    Rebuilds a topic or comment body keeping only ALLOWED_TAGS and attributes, escaping
+    everything else, linking bare URLs and the @mentions of existing users.
+    """
+
+    def __init__(self, usernames):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self.usernames = usernames
+        self.html = []
+        self.text = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+        allowed = []
+        for name, value in attrs:
+            if name in ALLOWED_TAGS[tag] and value is not None:
+                if name in URL_ATTRS and not is_safe_url(value):
+                    continue
+                allowed.append(' %s="%s"' % (name, escape(value)))
+        if tag == 'a':
+            allowed.append(' rel="nofollow"')
+        self.html.append('<%s%s>' % (tag, ''.join(allowed)))
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in self.open_tags and tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if tag not in self.open_tags:
+            return
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.html.append('</%s>' % open_tag)
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        self.text.append(data)
+        if 'a' in self.open_tags:
+            self.html.append(escape(data))
+            return
+        parts = MENTION_RE.split(data)
+        for index, part in enumerate(parts):
+            if index % 2 == 0:
+                self.html.append(urlize(part, nofollow=True, autoescape=True))
+            elif part in self.usernames:
+                url = reverse('django_simple_forum:view_profile', kwargs={'user_name': part})
+                self.html.append('<a href="%s" class="mention">@%s</a>' % (escape(url), escape(part)))
+            else:
+                self.html.append(escape('@' + part))
+
+    def close(self):
+        HTMLParser.close(self)
+        while self.open_tags:
+            self.html.append('</%s>' % self.open_tags.pop())
+
+
+def render_body(source):
+    """Returns the sanitized, linkified HTML and a plain-text excerpt of a topic or comment body."""
+    source = source or ''
+    names = set(MENTION_RE.findall(source))
+    usernames = set(User.objects.filter(username__in=names).values_list('username', flat=True)) if names else set()
+    renderer = BodyRenderer(usernames)
+    renderer.feed(source)
+    renderer.close()
+    text = ' '.join(''.join(renderer.text).split())
+    return ''.join(renderer.html), Truncator(text).chars(EXCERPT_LENGTH)
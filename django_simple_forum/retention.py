@@ -0,0 +1,46 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Timeline, TimelineSummary, RollupWatermark, get_timeline_cutoff
+from .rollups import to_day
+
+
+def get_expired_timeline():
+    """Timeline rows past the retention age, leaving alone the ones the activity rollup has not read yet."""
+    timeline = Timeline.objects.filter(created_on__lt=get_timeline_cutoff())
+    watermark = RollupWatermark.objects.filter(source='timeline').first()
+    if watermark is not None:
+        timeline = timeline.filter(id__lte=watermark.last_id)
+    return timeline
+
+
+def summarize(rows):
+    counts = Counter((user_id, to_day(created_on).replace(day=1), namespace, event_type)
+                     for user_id, namespace, event_type, created_on in rows)
+    for (user_id, month, namespace, event_type), count in counts.items():
+        summary = TimelineSummary.objects.filter(
+            user_id=user_id, month=month, namespace=namespace, event_type=event_type)
+        if not summary.update(count=F('count') + count):
+            TimelineSummary.objects.create(
+                user_id=user_id, month=month, namespace=namespace, event_type=event_type, count=count)
+
+
+def compact_timeline(batch_size=1000, summary=True):
+    """
+    Deletes expired Timeline rows ``batch_size`` at a time, oldest first, one transaction per
+    batch; unless ``summary`` is False they are first counted into TimelineSummary.
+    Returns the number of rows deleted.
+    """
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            rows = list(get_expired_timeline().order_by('id').values_list(
+                'id', 'user_id', 'namespace', 'event_type', 'created_on')[:batch_size])
+            if not rows:
+                return deleted
+            if summary:
+                summarize([row[1:] for row in rows])
+            Timeline.objects.filter(id__in=[row[0] for row in rows]).delete()
+        deleted += len(rows)
@@ -0,0 +1,140 @@
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Topic, Comment, Vote, Timeline, DailyActivity, DailyActiveUser, RollupWatermark
+
+METRICS = ('topics', 'comments', 'votes', 'likes', 'follows')
+
+# likes and follows are toggled in place on UserTopics, so they are counted from their timeline events
+TIMELINE_METRICS = {'like-topic': 'likes', 'follow-topic': 'follows'}
+
+
+def get_gap_window():
+    """Ids skipped by a watermark are looked for again until it is this many ids past them."""
+    return getattr(settings, 'FORUM_ROLLUP_GAP_WINDOW', 1000)
+
+
+def to_day(value):
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+def topic_categories(topic_ids):
+    return dict(Topic.objects.filter(id__in=topic_ids).values_list('id', 'category_id'))
+
+
+def topic_facts(topics):
+    rows = topics.values_list('id', 'created_on', 'category_id', 'created_by_id')
+    return [(pk, created_on, category_id, 'topics', user_id) for pk, created_on, category_id, user_id in rows]
+
+
+def comment_facts(comments):
+    rows = comments.values_list('id', 'created_on', 'topic__category_id', 'commented_by_id')
+    return [(pk, created_on, category_id, 'comments', user_id) for pk, created_on, category_id, user_id in rows]
+
+
+def vote_facts(votes):
+    rows = list(votes.values_list('id', 'created_on', 'content_type_id', 'object_id', 'user_id'))
+    topic_type = ContentType.objects.get_for_model(Topic)
+    categories = topic_categories([row[3] for row in rows if row[2] == topic_type.id])
+    comment_categories = dict(Comment.objects.filter(
+        id__in=[row[3] for row in rows if row[2] != topic_type.id]).values_list('id', 'topic__category_id'))
+    facts = []
+    for pk, created_on, content_type_id, object_id, user_id in rows:
+        target_categories = categories if content_type_id == topic_type.id else comment_categories
+        facts.append((pk, created_on, target_categories.get(object_id), 'votes', user_id))
+    return facts
+
+
+def timeline_facts(timeline):
+    rows = list(timeline.values_list('id', 'created_on', 'object_id', 'event_type', 'user_id'))
+    categories = topic_categories([row[2] for row in rows if row[3] in TIMELINE_METRICS])
+    # rows of other event types only move the watermark
+    return [(pk, created_on, categories.get(object_id), TIMELINE_METRICS.get(event_type), user_id)
+            for pk, created_on, object_id, event_type, user_id in rows]
+
+
+SOURCES = (
+    ('topic', Topic, topic_facts),
+    ('comment', Comment, comment_facts),
+    ('vote', Vote, vote_facts),
+    ('timeline', Timeline, timeline_facts),
+)
+
+
+def apply_facts(watermark, facts):
+    """Adds one batch of facts to DailyActivity and moves the watermark past it, atomically."""
+    totals = defaultdict(Counter)
+    active = set()
+    for pk, created_on, category_id, metric, user_id in facts:
+        if metric is None:
+            continue
+        key = (to_day(created_on), category_id)
+        totals[key][metric] += 1
+        if user_id is not None:
+            active.add(key + (user_id,))
+    if active:
+        existing = set(DailyActiveUser.objects.filter(
+            day__in={day for day, category_id, user_id in active},
+            user_id__in={user_id for day, category_id, user_id in active},
+        ).values_list('day', 'category_id', 'user_id'))
+        new_users = active - existing
+        DailyActiveUser.objects.bulk_create(
+            [DailyActiveUser(day=day, category_id=category_id, user_id=user_id)
+             for day, category_id, user_id in new_users])
+        for day, category_id, user_id in new_users:
+            totals[(day, category_id)]['active_users'] += 1
+    for (day, category_id), counts in totals.items():
+        activity, _ = DailyActivity.objects.get_or_create(day=day, category_id=category_id)
+        DailyActivity.objects.filter(id=activity.id).update(
+            **{metric: F(metric) + count for metric, count in counts.items()})
+    move_watermark(watermark, facts)
+
+
+def move_watermark(watermark, facts):
+    """
+    Moves the watermark past the facts. Ids it skips were not committed yet, or were rolled
+    back or deleted; they are kept as gaps so a row committed late is still counted once.
+    """
+    seen = set(fact[0] for fact in facts)
+    last_id = max([watermark.last_id] + list(seen))
+    window_start = last_id - get_gap_window()
+    skipped = set(range(max(watermark.last_id, window_start) + 1, last_id))
+    gaps = (watermark.get_gaps() | skipped) - seen
+    watermark.gaps = ','.join(str(pk) for pk in sorted(gaps) if pk > window_start)
+    watermark.last_id = last_id
+    watermark.save(update_fields=['last_id', 'gaps'])
+
+
+def fold(watermark, facts):
+    if facts:
+        with transaction.atomic():
+            apply_facts(watermark, facts)
+    return len(facts)
+
+
+def rollup(batch_size=1000):
+    """
+    Folds the rows added to each source since its watermark, and the rows of its gaps committed
+    since, into DailyActivity; returns the number of rows read per source.
+    """
+    processed = OrderedDict()
+    for source, model, get_facts in SOURCES:
+        watermark, _ = RollupWatermark.objects.get_or_create(source=source)
+        processed[source] = 0
+        rows = model.objects.order_by('id')
+        gaps = sorted(watermark.get_gaps())
+        for start in range(0, len(gaps), batch_size):
+            processed[source] += fold(watermark, get_facts(rows.filter(id__in=gaps[start:start + batch_size])))
+        while True:
+            count = fold(watermark, get_facts(rows.filter(id__gt=watermark.last_id)[:batch_size]))
+            if not count:
+                break
+            processed[source] += count
+    return processed
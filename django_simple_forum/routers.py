@@ -0,0 +1,73 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE_NAME = 'forum_primary_pin'
+
+_state = threading.local()
+
+
+def get_replica_databases():
+    return getattr(settings, 'FORUM_REPLICA_DATABASES', [])
+
+
+def get_pin_seconds():
+    return getattr(settings, 'FORUM_REPLICA_PIN_SECONDS', 10)
+
+
+def set_pinned(pinned):
+    _state.pinned = pinned
+    _state.written = False
+
+
+def has_written():
+    return getattr(_state, 'written', False)
+
+
+def replica_database():
+    """
+    Returns a replica alias to read from, or the primary when no replica is configured,
+    the user wrote recently (or earlier in this request) or a transaction is open.
+    """
+    replicas = get_replica_databases()
+    if not replicas or getattr(_state, 'pinned', False) or has_written() or \
+            connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+@contextmanager
+def replica_reads():
+    previous = getattr(_state, 'replica_reads', False)
+    _state.replica_reads = True
+    try:
+        yield
+    finally:
+        _state.replica_reads = previous
+
+
+class ReplicaRouter(object):
+    """
+    Sends reads made inside replica_reads() to FORUM_REPLICA_DATABASES and every write to
+    the primary. Writes are recorded so ReplicaPinMiddleware can pin the user to the
+    primary for FORUM_REPLICA_PIN_SECONDS.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'replica_reads', False):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in get_replica_databases():
+            return instance._state.db
+        return replica_database()
+
+    def db_for_write(self, model, **hints):
+        _state.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
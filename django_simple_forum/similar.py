@@ -0,0 +1,91 @@
+import re
+from collections import Counter
+
+from django.conf import settings
+
+from .indexes import TopicIndex, register
+from .models import Topic
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def get_min_score():
+    return getattr(settings, 'FORUM_SIMILAR_MIN_SCORE', 0.3)
+
+
+def get_max_postings():
+    """Trigrams found in more topics than this say little and are skipped while another one matches."""
+    return getattr(settings, 'FORUM_SIMILAR_MAX_POSTINGS', 5000)
+
+
+def trigrams(text):
+    """The trigrams of each word of the text, padded like pg_trgm: "web" gives "  w", " we", "web" and "eb "."""
+    grams = set()
+    for word in WORD_RE.findall(text.lower()):
+        word = '  %s ' % word
+        grams.update(word[index:index + 3] for index in range(len(word) - 2))
+    return grams
+
+
+class TitleIndex(TopicIndex):
+    """Trigrams of the titles and tags of the published topics, with the topics of each trigram."""
+
+    def clear(self):
+        super(TitleIndex, self).clear()
+        self.postings = {}
+
+    def add(self, topic_id, row):
+        super(TitleIndex, self).add(topic_id, row)
+        for gram in row:
+            self.postings.setdefault(gram, set()).add(topic_id)
+
+    def remove(self, topic_id):
+        row = super(TitleIndex, self).remove(topic_id)
+        for gram in row or ():
+            topic_ids = self.postings.get(gram)
+            if topic_ids is not None:
+                topic_ids.discard(topic_id)
+                if not topic_ids:
+                    del self.postings[gram]
+
+    def load(self, topic_ids=None):
+        """The trigrams of each published topic, from one pass over Topic and the topic tags table."""
+        topics = Topic.objects.filter(status='Published')
+        links = Topic.tags.through.objects.filter(topic__status='Published')
+        if topic_ids is not None:
+            topics = topics.filter(id__in=topic_ids)
+            links = links.filter(topic_id__in=topic_ids)
+        rows = {topic_id: trigrams(title) for topic_id, title in topics.values_list('id', 'title').iterator()}
+        for topic_id, title in links.values_list('topic_id', 'tags__title').iterator():
+            if topic_id in rows:
+                rows[topic_id] |= trigrams(title)
+        for topic_id, grams in rows.items():
+            rows[topic_id] = frozenset(grams)
+        return rows
+
+    def search(self, text, limit=5):
+        """
+        [(topic id, score)] of the ``limit`` topics whose trigrams are most like the text's,
+        best first, scored by Jaccard similarity and at least FORUM_SIMILAR_MIN_SCORE.
+        """
+        grams = trigrams(text)
+        if not grams:
+            return []
+        self.catch_up()
+        with self.lock:
+            postings = sorted((self.postings[gram] for gram in grams if gram in self.postings), key=len)
+            if not postings:
+                return []
+            shared = Counter()
+            for topic_ids in postings:
+                if len(topic_ids) > get_max_postings() and shared:
+                    break
+                shared.update(topic_ids)
+            scores = [(topic_id, count / float(len(grams) + len(self.topics[topic_id]) - count))
+                      for topic_id, count in shared.items()]
+        scores = [(topic_id, score) for topic_id, score in scores if score >= get_min_score()]
+        scores.sort(key=lambda item: (-item[1], -item[0]))
+        return scores[:limit]
+
+
+index = register(TitleIndex())
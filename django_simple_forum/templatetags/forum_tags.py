@@ -1,6 +1,8 @@
 from django import template
-from django_simple_forum.models import ForumCategory, Tags, Badge, UserTopics, UserProfile
+from django_simple_forum.models import ForumCategory, Tags, Badge, UserTopics, get_topic_participants
 from django.db.models import Count
+from django_simple_forum.routers import replica_database
+from django_simple_forum.avatars import DEFAULT_AVATAR_URL, get_author_card, get_author_cards
 try:
     from django.contrib.auth import get_user_model
     User = get_user_model()
@@ -12,28 +14,40 @@ register = template.Library()
 
 @register.assignment_tag()
 def get_categories():
-    all_categories = ForumCategory.objects.filter(is_active=True).annotate(num_topics=Count('topic')).order_by('-num_topics')[:10]
+    all_categories = ForumCategory.objects.using(replica_database()).filter(is_active=True).annotate(num_topics=Count('topic')).order_by('-num_topics')[:10]
     return all_categories
 
 
 @register.assignment_tag()
 def get_tags():
-    all_categories = Tags.objects.annotate(num_topics=Count('topic')).order_by('-num_topics')[:10]
+    all_categories = Tags.objects.using(replica_database()).order_by('-no_of_topics', '-title')[:10]
     return all_categories
 
 
 @register.assignment_tag()
 def get_users():
-    all_users = User.objects.annotate(num_topics=Count('topic')).order_by('-num_topics')[:10]
+    all_users = User.objects.using(replica_database()).annotate(num_topics=Count('topic')).order_by('-num_topics')[:10]
     return all_users
 
 
 @register.assignment_tag()
 def get_badges():
-    all_badges = Badge.objects.filter()[:10]
+    all_badges = Badge.objects.using(replica_database()).filter()[:10]
     return all_badges
 
 
+@register.assignment_tag()
+def with_participants(topics):
+    """The page's topics, each with the author cards of its participants as ``participants``."""
+    topics = list(topics)
+    participants = get_topic_participants([topic.id for topic in topics])
+    author_cards = get_author_cards(set().union(*participants.values()))
+    for topic in topics:
+        topic.participants = [author_cards[user_id] for user_id in sorted(participants[topic.id])
+                              if user_id in author_cards]
+    return topics
+
+
 @register.filter
 def is_topic_like(topic_id, user_id):
     user_topic = UserTopics.objects.filter(topic_id=topic_id, user_id=user_id).first()
@@ -44,11 +58,17 @@ def is_topic_like(topic_id, user_id):
 
 
 @register.filter
-def user_profile_pic(user_id):
-    user = UserProfile.objects.filter(user_id=user_id).first()
-    if user:
-        return user.profile_pic
-    return ''
+def user_profile_pic(user):
+    card = get_author_card(getattr(user, 'pk', user))
+    return card['avatar_url'] if card else DEFAULT_AVATAR_URL
+
+
+@register.filter
+def author_card(cards, user_id):
+    """Looks a user up in the cards the view fetched for the page, falling back to the card cache."""
+    if not user_id:
+        return None
+    return (cards or {}).get(user_id) or get_author_card(user_id)
 
 
 @register.filter
@@ -1,4 +1,23 @@
-from django.test import TestCase, Client
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, timedelta
+from io import BytesIO
+from smtplib import SMTPRecipientsRefused
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, transaction
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
 
 try:
     from django.contrib.auth import get_user_model
@@ -7,9 +26,27 @@ try:
 except ImportError:
     from django.contrib.auth.models import User
 from django.urls import reverse
+from django.views.generic import ListView
+from PIL import Image
+from django.utils import timezone
 from django_simple_forum.models import (
-    ForumCategory, Badge, UserProfile, Topic, Comment, Tags
+    ForumCategory, Badge, UserProfile, Topic, Comment, Tags, Vote, Timeline, DailyActivity, DeletionJob, ArchivedTopic,
+    UserTopics, TimelineSummary, RollupWatermark, PendingNotification, Subscription, tag_bucket
 )
+from django_simple_forum import autocomplete, events, facets, feeds, indexes, routers, similar, viewcounts
+from django_simple_forum.middleware import ReplicaPinMiddleware
+from django_simple_forum.forms import TopicForm
+from django_simple_forum.mixins import ExportMixin
+from django_simple_forum.throttling import TokenBucket
+from django_simple_forum.views import DashboardView, DeletionJobList, ForumTagsList, ProfileTopicsView, TopicList, \
+    TopicView, TopicBrowse, TopicFeed, TopicBulkAction, ForumTagsView
+from django_simple_forum.avatars import get_author_cards
+from django_simple_forum.deletion import hide_topic, queue_deletion, queue_deletions, run_job
+from django_simple_forum.rendering import render_body
+from django_simple_forum.threads import get_thread_page, get_reply_page
+from django_simple_forum.notifications import send_digests
+from django_simple_forum.delivery import DeliveryError, send_messages, html_message
+from django_simple_forum.templatetags.forum_tags import with_participants
 
 
 class TestLoginView(TestCase):
@@ -384,6 +421,44 @@ class TestBadgeDeleteView(TestCase):
         self.assertFalse(response.json().get('error'))
 
 
+class TestBadgeBulkAction(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+            is_superuser=True
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.user2 = User.objects.create(
+            first_name='Santharao',
+            last_name='N',
+            email='santharao@micropyramid.com',
+            username='santharao@micropyramid.com',
+        )
+        self.profile = UserProfile.objects.create(user=self.user, user_roles='Admin')
+        self.profile2 = UserProfile.objects.create(user=self.user2, user_roles='Publisher')
+        self.badge = Badge.objects.create(title='Gold', slug='gold')
+
+    def test_badge_bulk_action(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        url = reverse('django_simple_forum:bulk_badge', kwargs={'slug': self.badge.slug})
+        self.profile.badges.add(self.badge)
+        ids = [self.user.id, self.user2.id]
+        response = self.client.post(url, {'action': 'assign', 'ids': ids})
+        self.assertEqual(response.json().get('count'), 1)
+        self.assertEqual(self.badge.userprofile_set.count(), 2)
+        response = self.client.post(url, {'action': 'revoke', 'ids': [self.user2.id]})
+        self.assertEqual(response.json().get('count'), 1)
+        self.assertEqual(list(self.badge.userprofile_set.all()), [self.profile])
+
+
 class TestBadgeEditView(TestCase):
 
     def setUp(self):
@@ -438,6 +513,76 @@ class TestUserListView(TestCase):
         self.assertTemplateUsed(response, 'dashboard/users.html')
 
 
+class TestDashboardExportView(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+            is_superuser=True
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        UserProfile.objects.create(user=self.user, user_roles='Admin')
+        self.category = ForumCategory.objects.create(
+            created_by=self.user,
+            title='Python',
+            is_active=True,
+            slug='python',
+            description='dynamic programming language'
+        )
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            created_by=self.user,
+            status='Published',
+            category=self.category
+        )
+        Vote.objects.create(user=self.user, type='U', content_object=self.topic)
+        Comment.objects.create(comment='first', commented_by=self.user, topic=self.topic)
+        Comment.objects.create(comment='second', commented_by=self.user, topic=self.topic)
+        Badge.objects.create(title='Gold', slug='gold')
+
+    def test_topics_export(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        url = reverse('django_simple_forum:topics')
+        response = self.client.get(url, {'export': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('id,title,slug,status'))
+        self.assertTrue(lines[1].endswith(',1,0,2'))
+
+        response = self.client.get(url, {'export': 'ndjson', 'search_text': 'nomatch'})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    def test_dashboard_lists_export(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        for name, key in (('users', 'user__email'), ('categories', 'title'), ('badges', 'title')):
+            response = self.client.get(reverse('django_simple_forum:' + name), {'export': 'ndjson'})
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+            self.assertEqual(len(rows), 1)
+            self.assertIn(key, rows[0])
+
+    def test_default_export_queryset(self):
+        class BadgeExport(ExportMixin, ListView):
+            queryset = Badge.objects.all()
+            export_fields = ('title', 'slug')
+
+        view = BadgeExport()
+        view.request = RequestFactory().get('/', {'export': 'ndjson'})
+        response = view.get(view.request)
+        self.assertEqual(b''.join(response.streaming_content), b'{"title": "Gold", "slug": "gold"}\n')
+
+
 class TestDashboardUserEditView(TestCase):
 
     def setUp(self):
@@ -662,6 +807,70 @@ class TestTopicView(TestCase):
         response = self.client.get(url)
         self.assertTemplateUsed(response, 'forum/view_topic.html')
 
+    def test_topic_views_buffered(self):
+        # views buffered by other tests may belong to a topic with the same id
+        viewcounts.flush()
+        self.topic.refresh_from_db()
+        views = self.topic.no_of_views
+        cache.clear()
+        request = RequestFactory().get('/')
+        request.user = self.user
+        self.assertTrue(viewcounts.record_view(request, self.topic.id))
+        # the same user again within the dedupe window
+        self.assertFalse(viewcounts.record_view(request, self.topic.id))
+        request.user = User.objects.create(username='other', email='other@micropyramid.com')
+        self.assertTrue(viewcounts.record_view(request, self.topic.id))
+        viewcounts.flush_if_due()
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.no_of_views, views)
+        with self.settings(FORUM_VIEW_FLUSH_SECONDS=0):
+            viewcounts.flush_if_due()
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.no_of_views, views + 2)
+
+
+class TestTopicViewsTimer(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+        )
+        self.topic = Topic.objects.create(title="django", slug='django', description="web framework",
+                                          created_by=self.user, status='Published')
+
+    @override_settings(FORUM_VIEW_FLUSH_SECONDS=0.5)
+    def test_timed_flush(self):
+        viewcounts.flush()
+        cache.clear()
+        request = RequestFactory().get('/')
+        request.user = self.user
+        self.assertTrue(viewcounts.record_view(request, self.topic.id))
+        # no request finishes after the view; the timer writes it
+        viewcounts._timer.join(30)
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.no_of_views, 1)
+
+    def test_timed_flush_failures(self):
+        def failing_flush():
+            raise DatabaseError('database is down')
+
+        flush = viewcounts.flush
+        viewcounts.flush = failing_flush
+        viewcounts._pending[self.topic.id] += 1
+        viewcounts._timed_failures = viewcounts.MAX_TIMED_FAILURES - 1
+        try:
+            with self.assertLogs('django_simple_forum.viewcounts', 'ERROR'):
+                viewcounts.timed_flush()
+            # gives up until the next view
+            self.assertIsNone(viewcounts._timer)
+        finally:
+            viewcounts.flush = flush
+            viewcounts._timed_failures = 0
+        self.assertEqual(viewcounts.flush(), 1)
+
 
 class TestTopicDeleteView(TestCase):
 
@@ -891,6 +1100,19 @@ class TestTopicLike(TestCase):
         response = self.client.post(url)
         self.assertFalse(response.json().get('error'))
 
+    def test_topic_like_counts(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        url = reverse('django_simple_forum:like_topic', kwargs={'slug': self.topic.slug})
+        UserProfile.objects.create(user=self.user, user_roles='Admin')
+        response = self.client.post(url)
+        self.assertEqual(response.json().get('no_of_likes'), 1)
+        self.assertEqual(response.json().get('no_of_users'), 1)
+        self.assertTrue(response.json().get('is_like'))
+        response = self.client.post(url)
+        self.assertEqual(response.json().get('no_of_likes'), 0)
+        self.assertFalse(response.json().get('is_like'))
+
 
 class TestForumCategoryList(TestCase):
 
@@ -1074,6 +1296,47 @@ class TestTopicStatus(TestCase):
         self.assertFalse(response.json().get('error'))
 
 
+class TestTopicBulkAction(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+            is_superuser=True
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.topics = [
+            Topic.objects.create(title=title, slug=title, description="web framework",
+                                 created_by=self.user, status='Draft')
+            for title in ('django', 'flask', 'pyramid')
+        ]
+
+    def test_topic_bulk_action(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        url = reverse('django_simple_forum:bulk_topics')
+        ids = [self.topics[0].id, self.topics[1].id]
+        response = self.client.post(url, {'action': 'publish', 'ids': ids})
+        self.assertFalse(response.json().get('error'))
+        self.assertEqual(response.json().get('count'), 2)
+        self.assertEqual(Topic.objects.filter(status='Published').count(), 2)
+        response = self.client.post(url, {'action': 'disable', 'ids': ids})
+        self.assertEqual(Topic.objects.filter(status='Disabled').count(), 2)
+        response = self.client.post(url, {'action': 'delete', 'ids': ids})
+        self.assertEqual(response.json().get('count'), 2)
+        call_command('run_deletion_jobs', stdout=open(os.devnull, 'w'))
+        self.assertEqual(Topic.objects.count(), 1)
+        response = self.client.post(url, {'action': 'unknown', 'ids': ids})
+        self.assertTrue(response.json().get('error'))
+        response = self.client.post(url, {'action': 'publish'})
+        self.assertTrue(response.json().get('error'))
+
+
 class TestDashboardUserDelete(TestCase):
 
     def setUp(self):
@@ -1134,6 +1397,45 @@ class TestUserStatusView(TestCase):
         self.assertFalse(response.json().get('error'))
 
 
+class TestUserBulkAction(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+            is_superuser=True
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.user2 = User.objects.create(
+            first_name='Santharao',
+            last_name='N',
+            email='santharao@micropyramid.com',
+            username='santharao@micropyramid.com',
+        )
+
+    def test_user_bulk_action(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        url = reverse('django_simple_forum:bulk_users')
+        ids = [self.user.id, self.user2.id]
+        response = self.client.post(url, {'action': 'deactivate', 'ids': ids})
+        self.assertEqual(response.json().get('count'), 1)
+        self.assertFalse(User.objects.get(id=self.user2.id).is_active)
+        self.assertTrue(User.objects.get(id=self.user.id).is_active)
+        response = self.client.post(url, {'action': 'activate', 'ids': ids})
+        self.assertTrue(User.objects.get(id=self.user2.id).is_active)
+        response = self.client.post(url, {'action': 'delete', 'ids': ids})
+        self.assertEqual(response.json().get('count'), 1)
+        self.assertFalse(User.objects.get(id=self.user2.id).is_active)
+        call_command('run_deletion_jobs', stdout=open(os.devnull, 'w'))
+        self.assertEqual(User.objects.count(), 1)
+
+
 class TestUserDetailView(TestCase):
 
     def setUp(self):
@@ -1248,6 +1550,76 @@ class TestTopicVoteUpView(TestCase):
         response = self.client.get(url)
         self.assertFalse(response.json().get('error'))
 
+    def test_topic_vote_is_unique_per_user(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        up_url = reverse('django_simple_forum:topic_vote_up', kwargs={'slug': self.topic.slug})
+        down_url = reverse('django_simple_forum:topic_vote_down', kwargs={'slug': self.topic.slug})
+        self.assertEqual(self.client.get(up_url).json().get('status'), 'up')
+        self.assertEqual(self.client.get(up_url).json().get('status'), 'neutral')
+        self.assertEqual(self.topic.up_votes_count(), 1)
+        self.assertEqual(self.topic.get_user_vote(self.user).type, 'U')
+        self.assertEqual(self.client.get(down_url).json().get('status'), 'removed')
+        self.assertIsNone(self.topic.get_user_vote(self.user))
+        self.assertEqual(self.client.get(down_url).json().get('status'), 'down')
+        self.assertEqual(Vote.objects.count(), 1)
+
+
+@override_settings(FORUM_THROTTLE_RATES={'vote': '2/m'}, FORUM_THROTTLE_IP_RATES={'vote': '3/m'})
+class TestVoteThrottle(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            created_by=self.user,
+            status='Published',
+        )
+
+    def test_vote_throttle(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        url = reverse('django_simple_forum:topic_vote_up', kwargs={'slug': self.topic.slug})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertTrue(response.json().get('error'))
+
+    def test_ip_throttle(self):
+        # a second user behind the same address has their own bucket, up to the address's larger one
+        url = reverse('django_simple_forum:topic_vote_up', kwargs={'slug': self.topic.slug})
+        self.client.login(username=self.user.email, password=self.password)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        other = User.objects.create(username='other@micropyramid.com', email='other@micropyramid.com')
+        other.set_password(self.password)
+        other.save()
+        self.assertTrue(self.client.login(username=other.email, password=self.password))
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 429)
+
+    def test_token_bucket_refill(self):
+        bucket = TokenBucket('forum-throttle:test', 2, 60)
+        self.assertEqual(bucket.consume(now=0), 0)
+        self.assertEqual(bucket.consume(now=0), 0)
+        self.assertEqual(bucket.consume(now=0), 30)
+        self.assertEqual(bucket.consume(now=15), 15)
+        self.assertEqual(bucket.consume(now=45), 0)
+
 
 class TestTopicVoteDownView(TestCase):
 
@@ -1403,6 +1775,52 @@ class TestUserProfilePicView(TestCase):
         response = self.client.post(url)
         self.assertTrue(response.json().get('error'))
 
+    def test_profile_pic_upload(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        url = reverse('django_simple_forum:user_profile_pic')
+        with override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+            response = self.client.post(url, {'profile_pic': SimpleUploadedFile('me.gif', self.get_image('GIF'),
+                                                                                'image/gif')})
+            self.assertFalse(response.json().get('error'))
+            self.profile.refresh_from_db()
+            self.assertTrue(self.profile.profile_pic.name.startswith(UserProfile.file_prepend))
+            # stored re-encoded
+            self.assertTrue(self.profile.profile_pic.name.endswith('.png'))
+            self.assertEqual(Image.open(self.profile.profile_pic.path).format, 'PNG')
+            shutil.rmtree(settings.MEDIA_ROOT)
+        self.assertEqual(UserProfile.objects.filter(user=self.user).count(), 1)
+
+    def get_image(self, image_format):
+        output = BytesIO()
+        Image.new('RGB', (4, 4), 'red').save(output, image_format)
+        return output.getvalue()
+
+    def test_profile_pic_not_an_image(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        url = reverse('django_simple_forum:user_profile_pic')
+        svg = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+        for upload in (SimpleUploadedFile('me.svg', svg, 'image/svg+xml'),
+                       SimpleUploadedFile('me.png', b'<html><script>alert(1)</script></html>', 'image/png')):
+            response = self.client.post(url, {'profile_pic': upload})
+            self.assertEqual(response.json(), {'error': True, 'response': 'Please upload an image'})
+        self.profile.refresh_from_db()
+        self.assertFalse(self.profile.profile_pic)
+
+    def test_author_cards(self):
+        UserProfile.objects.filter(id=self.profile.id).update(avatar_url='/media/me.png')
+        cache.clear()
+        with self.assertNumQueries(2):
+            cards = get_author_cards([self.user.id])
+        self.assertEqual(cards[self.user.id]['avatar_url'], '/media/me.png')
+        self.assertEqual(cards[self.user.id]['username'], self.user.username)
+        with self.assertNumQueries(0):
+            get_author_cards([self.user.id])
+        self.user.username = 'ravi'
+        self.user.save()
+        self.assertEqual(get_author_cards([self.user.id])[self.user.id]['username'], 'ravi')
+
 
 class TestUserSettingsView(TestCase):
 
@@ -1557,6 +1975,11 @@ class TestMentionedUser(TestCase):
         response = self.client.get(url)
         self.assertEqual(len(response.json().get('data')), 1)
 
+    def test_get_mentioned_user_queries(self):
+        url = reverse('django_simple_forum:get_mentioned_user', kwargs={'topic_id': self.topic.id})
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
 
 class TestCommentVoteUpView(TestCase):
 
@@ -1600,3 +2023,1364 @@ class TestCommentVoteUpView(TestCase):
         self.assertEqual(response.json().get('status'), 'up')
         response = self.client.get(url)
         self.assertEqual(response.json().get('status'), 'neutral')
+
+
+@override_settings(DATABASE_ROUTERS=['django_simple_forum.routers.ReplicaRouter'],
+                   FORUM_REPLICA_DATABASES=['replica'])
+class TestReplicaRouter(TransactionTestCase):
+    # the replica is a separate, empty database, so rows written in setUp are only on the primary
+    multi_db = True
+
+    def setUp(self):
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+        )
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            created_by=self.user,
+            status='Published',
+        )
+        routers.set_pinned(False)
+
+    def read_view(self, request):
+        with routers.replica_reads():
+            return HttpResponse(str(Topic.objects.filter(slug='django').exists()))
+
+    def test_replica_reads(self):
+        with routers.replica_reads():
+            self.assertFalse(Topic.objects.exists())
+            with transaction.atomic():
+                self.assertTrue(Topic.objects.exists())
+        self.assertTrue(Topic.objects.exists())
+
+    def test_read_your_writes(self):
+        with routers.replica_reads():
+            Topic.objects.filter(id=self.topic.id).update(no_of_views=1)
+            self.assertTrue(Topic.objects.exists())
+
+        def write_view(request):
+            Topic.objects.filter(id=self.topic.id).update(no_of_views=2)
+            return self.read_view(request)
+
+        factory = RequestFactory()
+        response = ReplicaPinMiddleware(write_view)(factory.get('/'))
+        self.assertEqual(response.content, b'True')
+        self.assertIn(routers.PIN_COOKIE_NAME, response.cookies)
+
+        request = factory.get('/')
+        request.COOKIES[routers.PIN_COOKIE_NAME] = '1'
+        self.assertEqual(ReplicaPinMiddleware(self.read_view)(request).content, b'True')
+        response = ReplicaPinMiddleware(self.read_view)(factory.get('/'))
+        self.assertEqual(response.content, b'False')
+        self.assertNotIn(routers.PIN_COOKIE_NAME, response.cookies)
+
+
+class TestRenderBody(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi',
+        )
+
+    def test_render_body(self):
+        html, excerpt = render_body(
+            '<p onclick="x()">Hi @ravi and @nobody, see https://djangoproject.com</p>'
+            '<script>alert(1)</script><a href="javascript:alert(1)">link</a><iframe>x</iframe>')
+        self.assertIn('<a href="/user/profile/ravi/" class="mention">@ravi</a>', html)
+        self.assertIn('@nobody', html)
+        self.assertIn('<a href="https://djangoproject.com" rel="nofollow">https://djangoproject.com</a>', html)
+        self.assertNotIn('onclick', html)
+        self.assertNotIn('script', html)
+        self.assertNotIn('javascript', html)
+        self.assertNotIn('iframe', html)
+        self.assertIn('<a rel="nofollow">link</a>', html)
+        self.assertEqual(excerpt, 'Hi @ravi and @nobody, see https://djangoproject.com link')
+
+    def test_render_forum_bodies_command(self):
+        topic = Topic.objects.create(title="django", slug='django', description="<b>web</b> framework",
+                                     created_by=self.user, status='Published')
+        Comment.objects.create(comment='<i>first</i>', commented_by=self.user, topic=topic)
+        call_command('render_forum_bodies', batch_size=1, stdout=open(os.devnull, 'w'))
+        topic = Topic.objects.get(id=topic.id)
+        self.assertEqual(topic.description_html, '<b>web</b> framework')
+        self.assertEqual(topic.excerpt, 'web framework')
+        self.assertEqual(Comment.objects.get().comment_html, '<i>first</i>')
+
+
+@override_settings(FORUM_EVENTS_STREAM_SECONDS=0.2)
+class TestTopicEvents(TransactionTestCase):
+    # events are published on commit, which never happens inside TestCase
+
+    def setUp(self):
+        self.client = Client(HTTP_HOST="django-forum.com")
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        UserProfile.objects.create(user=self.user)
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            created_by=self.user,
+            status='Published',
+        )
+        events._backends.clear()
+        cache.clear()
+
+    def read_stream(self):
+        url = reverse('django_simple_forum:topic_events', kwargs={'slug': self.topic.slug})
+        response = self.client.get(url, HTTP_LAST_EVENT_ID='0')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return ''.join(chunk.decode() for chunk in response.streaming_content)
+
+    def test_backend_buffer(self):
+        backend = events.InMemoryBackend()
+        with self.settings(FORUM_EVENTS_BUFFER=2):
+            for count in range(3):
+                backend.publish(self.topic.id, 'like', {'no_of_likes': count})
+        self.assertEqual([item[0] for item in backend.read(self.topic.id, 0, 0)], [2, 3])
+        self.assertEqual(backend.read(self.topic.id, 3, 0.01), [])
+        self.assertEqual(backend.read(self.topic.id + 1, 0, 0), [])
+
+    def test_stream_events(self):
+        self.client.login(username=self.user.email, password=self.password)
+        self.client.post(reverse('django_simple_forum:like_topic', kwargs={'slug': self.topic.slug}))
+        self.client.get(reverse('django_simple_forum:topic_vote_up', kwargs={'slug': self.topic.slug}))
+        self.client.post(reverse('django_simple_forum:new_comment'),
+                         {'topic': self.topic.id, 'comment': 'live comment', 'parent': ''})
+        comment = Comment.objects.get(topic=self.topic)
+        content = self.read_stream()
+        self.assertIn('event: like\ndata: {"no_of_likes": 1}', content)
+        self.assertIn('"target": "topic"', content)
+        self.assertIn('"up": 1', content)
+        self.assertIn('event: comment', content)
+        self.assertIn('data-comment=\\"%s\\"' % comment.id, content)
+
+    def test_stream_requires_login(self):
+        url = reverse('django_simple_forum:topic_events', kwargs={'slug': self.topic.slug})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+
+class TestActivityRollup(TestCase):
+
+    def setUp(self):
+        self.client = Client(HTTP_HOST="django-forum.com")
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+            is_superuser=True
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.category = ForumCategory.objects.create(
+            created_by=self.user,
+            title='Python',
+            is_active=True,
+            slug='python',
+            description='dynamic programming language'
+        )
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            created_by=self.user,
+            status='Published',
+            category=self.category
+        )
+        self.comment = Comment.objects.create(
+            commented_by=self.user,
+            topic=self.topic,
+        )
+        Vote.objects.create(user=self.user, type='U', content_object=self.comment)
+        Timeline.objects.create(user=self.user, content_object=self.topic, namespace='like the',
+                                event_type='like-topic')
+        Timeline.objects.create(user=self.user, content_object=self.topic, namespace='created topic on',
+                                event_type='topic-create')
+
+    def rollup(self):
+        call_command('rollup_forum_activity', batch_size=1, stdout=open(os.devnull, 'w'))
+        return DailyActivity.objects.get(category=self.category)
+
+    def test_rollup(self):
+        activity = self.rollup()
+        self.assertEqual((activity.topics, activity.comments, activity.votes, activity.likes, activity.follows),
+                         (1, 1, 1, 1, 0))
+        self.assertEqual(activity.active_users, 1)
+        # only rows added since the last run are counted
+        Comment.objects.create(commented_by=self.user, topic=self.topic)
+        activity = self.rollup()
+        self.assertEqual(activity.comments, 2)
+        self.assertEqual(activity.active_users, 1)
+        self.assertEqual(DailyActivity.objects.count(), 1)
+
+    def test_dashboard_context(self):
+        self.rollup()
+        # dashboard_base.html links to url names this app does not define, so read the context directly
+        view = DashboardView()
+        view.request = RequestFactory().get(reverse('django_simple_forum:dashboard'))
+        context = view.get_context_data()
+        self.assertEqual(context['daily_activity'][0]['comments'], 1)
+        self.assertEqual(context['max_active_users'], 1)
+        self.assertEqual(context['category_activity'][0]['category__title'], 'Python')
+
+    def test_daily_active_users(self):
+        ruby = ForumCategory.objects.create(created_by=self.user, title='Ruby', is_active=True, slug='ruby',
+                                            description='ruby')
+        Topic.objects.create(title="rails", slug='rails', description="web framework", created_by=self.user,
+                             status='Published', category=ruby)
+        self.rollup()
+        view = DashboardView()
+        view.request = RequestFactory().get(reverse('django_simple_forum:dashboard'))
+        context = view.get_context_data()
+        # active in two categories, one active user of the day
+        self.assertEqual(context['daily_activity'][0]['active_users'], 1)
+        self.assertEqual([category['active_users'] for category in context['category_activity']], [1, 1])
+
+    def test_late_commit(self):
+        # a comment whose id was handed out before the last run's but committed after it
+        late_id = Comment.objects.create(commented_by=self.user, topic=self.topic).id
+        Comment.objects.create(commented_by=self.user, topic=self.topic)
+        Comment.objects.filter(id=late_id).delete()
+        self.assertEqual(self.rollup().comments, 2)
+        self.assertEqual(RollupWatermark.objects.get(source='comment').get_gaps(), {late_id})
+        Comment.objects.create(id=late_id, commented_by=self.user, topic=self.topic)
+        self.assertEqual(self.rollup().comments, 3)
+        self.assertEqual(self.rollup().comments, 3)
+        self.assertEqual(RollupWatermark.objects.get(source='comment').get_gaps(), set())
+
+
+class TestBadgeUserCount(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+        )
+        self.other = User.objects.create(username='other', email='other@micropyramid.com')
+        self.profile = UserProfile.objects.create(user=self.user)
+        self.other_profile = UserProfile.objects.create(user=self.other)
+        self.badge = Badge.objects.create(title='Helper', slug='helper')
+        self.other_badge = Badge.objects.create(title='Writer', slug='writer')
+
+    def counts(self):
+        return list(Badge.objects.order_by('id').values_list('no_of_users', flat=True))
+
+    def test_badge_user_count(self):
+        self.profile.badges.add(self.badge, self.other_badge)
+        self.assertEqual(self.counts(), [1, 1])
+        # adding an existing holder again does not count twice
+        self.badge.userprofile_set.add(self.profile, self.other_profile)
+        self.assertEqual(self.counts(), [2, 1])
+        self.profile.badges.clear()
+        self.assertEqual(self.counts(), [1, 0])
+        self.badge.userprofile_set.remove(self.other_profile)
+        self.assertEqual(self.counts(), [0, 0])
+        self.other_profile.badges.add(self.other_badge)
+        self.other.delete()
+        self.assertEqual(self.counts(), [0, 0])
+
+    def test_get_users(self):
+        self.badge.userprofile_set.add(self.profile, self.other_profile)
+        category = ForumCategory.objects.create(created_by=self.user, title='Python', slug='python')
+        for slug in ('django', 'flask'):
+            topic = Topic.objects.create(title=slug, slug=slug, description=slug, created_by=self.user,
+                                         status='Published', category=category)
+            UserTopics.objects.create(user=self.user, topic=topic, no_of_votes=2, no_of_down_votes=1)
+        with self.assertNumQueries(1):
+            self.assertEqual([(profile.user.username, profile.no_of_up_votes, profile.no_of_down_votes)
+                              for profile in self.badge.get_users()],
+                             [(self.user.username, 4, 2), ('other', 0, 0)])
+        self.badge.users_per_page = 1
+        self.assertEqual([profile.user for profile in self.badge.get_users(2)], [self.other])
+
+
+class TestTagDirectory(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+        )
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            created_by=self.user,
+            status='Published',
+        )
+        self.draft = Topic.objects.create(
+            title="flask",
+            slug='flask',
+            description="micro framework",
+            created_by=self.user,
+            status='Draft',
+        )
+        self.tag = Tags.objects.create(title='Python', slug='python')
+        self.other_tag = Tags.objects.create(title='\xc9lan', slug='elan')
+
+    def counts(self):
+        return list(Tags.objects.order_by('id').values_list('no_of_topics', flat=True))
+
+    def test_tag_bucket(self):
+        self.assertEqual(tag_bucket('Python'), 'p')
+        self.assertEqual(tag_bucket('\xc9lan'), 'e')
+        self.assertEqual(tag_bucket('3d'), '#')
+        self.assertEqual(self.other_tag.bucket, 'e')
+
+    def test_tag_topic_count(self):
+        self.topic.tags.add(self.tag, self.other_tag)
+        self.draft.tags.add(self.tag)
+        self.assertEqual(self.counts(), [1, 1])
+        self.draft.status = 'Published'
+        self.draft.save()
+        self.assertEqual(self.counts(), [2, 1])
+        self.topic.tags.remove(self.other_tag)
+        self.assertEqual(self.counts(), [2, 0])
+        self.tag.topic_set.clear()
+        self.assertEqual(self.counts(), [0, 0])
+        self.topic.tags.add(self.tag)
+        self.topic.delete()
+        self.assertEqual(self.counts(), [0, 0])
+
+    def test_letters(self):
+        letters = dict(ForumTagsList().get_letters())
+        self.assertEqual((letters['p'], letters['e'], letters['#']), (1, 1, 0))
+
+
+@override_settings(FORUM_DELETION_BATCH_SIZE=1)
+class TestDeletionJob(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+            is_superuser=True
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.user2 = User.objects.create(
+            first_name='Santharao',
+            last_name='N',
+            email='santharao@micropyramid.com',
+            username='santharao@micropyramid.com',
+        )
+        self.category = ForumCategory.objects.create(
+            created_by=self.user,
+            title='Python',
+            is_active=True,
+            slug='python',
+            description='dynamic programming language'
+        )
+        self.sub_category = ForumCategory.objects.create(
+            created_by=self.user,
+            title='Django',
+            is_active=True,
+            slug='django',
+            description='web framework',
+            parent=self.category
+        )
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            created_by=self.user,
+            status='Published',
+            category=self.sub_category
+        )
+        comment = Comment.objects.create(comment='first', commented_by=self.user2, topic=self.topic)
+        Comment.objects.create(comment='reply', commented_by=self.user2, topic=self.topic, parent=comment)
+        Vote.objects.create(user=self.user2, type='U', content_object=self.topic)
+        Vote.objects.create(user=self.user, type='U', content_object=comment)
+        Timeline.objects.create(user=self.user2, content_object=comment, namespace='comment',
+                                event_type='comment-create')
+
+    def test_user_deletion(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        TimelineSummary.objects.create(user=self.user2, month=date(2020, 1, 1), namespace='comment',
+                                       event_type='comment-create', count=3)
+        PendingNotification.objects.create(user=self.user2, comment=Comment.objects.first())
+        Subscription.objects.create(user=self.user2, category=self.category)
+        url = reverse('django_simple_forum:delete_user', kwargs={'user_id': self.user2.id})
+        response = self.client.post(url)
+        job = DeletionJob.objects.get(id=response.json().get('job'))
+        self.assertEqual((job.status, job.created_by, job.get_progress()), ('Queued', self.user, 0))
+        self.assertFalse(User.objects.get(id=self.user2.id).is_active)
+        # deleting it again reuses the pending job
+        response = self.client.post(url)
+        self.assertEqual(response.json().get('job'), job.id)
+        job = run_job(job.id)
+        self.assertEqual((job.status, job.processed_rows, job.get_progress()), ('Done', 8, 100))
+        self.assertFalse(User.objects.filter(id=self.user2.id).exists())
+        self.assertFalse(TimelineSummary.objects.exists() or PendingNotification.objects.exists() or
+                         Subscription.objects.exists())
+        self.assertEqual(Comment.objects.filter(commented_by=None).count(), 2)
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_topic_delete_queries(self):
+        topics = []
+        for title, no_of_comments in (('flask', 1), ('bottle', 5)):
+            topic = Topic.objects.create(title=title, slug=title, description="micro framework",
+                                         created_by=self.user, status='Published')
+            for index in range(no_of_comments):
+                Comment.objects.create(comment='comment', commented_by=self.user2, topic=topic)
+            topics.append(topic)
+        with CaptureQueriesContext(connection) as one_comment:
+            topics[0].delete()
+        with CaptureQueriesContext(connection) as five_comments:
+            topics[1].delete()
+        # the comments of a deleted topic do not recompute it
+        self.assertEqual(len(five_comments), len(one_comment))
+        comment = Comment.objects.create(comment='after', commented_by=self.user2,
+                                         topic=Topic.objects.create(title='pyramid', slug='pyramid', description='web'))
+        comment.delete()
+        self.assertEqual(Topic.objects.get(slug='pyramid').no_of_comments, 0)
+
+    def test_claimed_job(self):
+        job = queue_deletion(self.topic, self.user)
+        DeletionJob.objects.filter(id=job.id).update(claimed_until=timezone.now() + timedelta(minutes=5))
+        # another thread is working through it
+        self.assertEqual(run_job(job.id).status, 'Queued')
+        self.assertTrue(Topic.objects.exists())
+        # that thread went away
+        DeletionJob.objects.filter(id=job.id).update(claimed_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(run_job(job.id).status, 'Done')
+
+    def test_bulk_deletion(self):
+        other = Topic.objects.create(title="flask", slug='flask', description="micro framework",
+                                     created_by=self.user, status='Published')
+        jobs = queue_deletions(Topic.objects.order_by('id'), self.user)
+        self.assertEqual([job.object_id for job in jobs], [self.topic.id, other.id])
+        self.assertEqual(queue_deletions([self.topic], self.user), jobs[:1])
+        self.assertFalse(Topic.objects.filter(status='Published').exists())
+
+    def test_topic_deletion(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        url = reverse('django_simple_forum:delete_topic', kwargs={'slug': self.topic.slug})
+        response = self.client.delete(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(Topic.objects.get(id=self.topic.id).status, 'Disabled')
+        job = run_job(response.json().get('job'))
+        self.assertEqual((job.status, job.total_rows, job.processed_rows), ('Done', 6, 6))
+        self.assertFalse(Topic.objects.exists())
+        self.assertEqual((Comment.objects.count(), Vote.objects.count(), Timeline.objects.count()), (0, 0, 0))
+
+    def test_category_deletion(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        url = reverse('django_simple_forum:delete_category', kwargs={'slug': self.category.slug})
+        response = self.client.post(url)
+        self.assertFalse(ForumCategory.objects.filter(is_active=True).exists())
+        self.assertEqual(run_job(response.json().get('job')).status, 'Done')
+        self.assertFalse(ForumCategory.objects.exists())
+        self.assertEqual(Topic.objects.get(id=self.topic.id).category, None)
+        self.assertEqual(list(DeletionJobList().get_queryset()), list(DeletionJob.objects.all()))
+
+
+class TestTopicArchive(TestCase):
+
+    def setUp(self):
+        self.client = Client(HTTP_HOST="django-forum.com")
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com',
+            is_superuser=True
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.tag = Tags.objects.create(title='Python', slug='python')
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            description_html="<p>web framework</p>",
+            created_by=self.user,
+            status='Published',
+        )
+        self.topic.tags.add(self.tag)
+        self.recent = Topic.objects.create(
+            title="flask",
+            slug='flask',
+            description="micro framework",
+            created_by=self.user,
+            status='Published',
+        )
+        self.comment = Comment.objects.create(comment='first', comment_html='<p>first</p>', commented_by=self.user,
+                                              topic=self.topic)
+        self.reply = Comment.objects.create(comment='reply', commented_by=self.user, topic=self.topic,
+                                            parent=self.comment)
+        self.reply.mentioned.add(self.user)
+        Vote.objects.create(user=self.user, type='U', content_object=self.topic)
+        Vote.objects.create(user=self.user, type='D', content_object=self.comment)
+        # archived comment times keep millisecond precision
+        self.old = (timezone.now() - timedelta(days=100)).replace(microsecond=0)
+        UserTopics.objects.create(user=self.user, topic=self.topic, is_followed=True, followed_on=self.old.date())
+        Topic.objects.filter(id=self.topic.id).update(updated_on=self.old, created_on=self.old)
+        Comment.objects.filter(topic=self.topic).update(created_on=self.old, updated_on=self.old)
+
+    def test_archive_and_restore(self):
+        call_command('archive_forum_topics', days=30, stdout=open(os.devnull, 'w'))
+        self.assertEqual(list(Topic.objects.values_list('id', flat=True)), [self.recent.id])
+        self.assertEqual((Comment.objects.count(), Vote.objects.count(), UserTopics.objects.count()), (0, 0, 0))
+        self.assertEqual(Tags.objects.get(id=self.tag.id).no_of_topics, 0)
+        archived = ArchivedTopic.objects.get(slug='django')
+        self.assertEqual((archived.topic_id, archived.no_of_comments), (self.topic.id, 2))
+
+        view = TopicView()
+        view.request = RequestFactory().get('/')
+        view.request.user = self.user
+        view.kwargs = {'slug': 'django'}
+        self.assertEqual(view.get_template_names(), ['forum/view_archived_topic.html'])
+        context = view.get_context_data(**view.kwargs)
+        comments = context['comments']
+        self.assertEqual([comment['id'] for comment in comments], [self.comment.id])
+        self.assertEqual([reply['id'] for reply in comments[0]['replies']], [self.reply.id])
+        self.assertEqual((comments[0]['down_votes_count'], context['topic'].up_votes_count()), (1, 1))
+        self.assertEqual(list(context['author_cards']), [self.user.id])
+
+        call_command('archive_forum_topics', restore='django', stdout=open(os.devnull, 'w'))
+        self.assertFalse(ArchivedTopic.objects.exists())
+        topic = Topic.objects.get(id=self.topic.id)
+        self.assertEqual((topic.description_html, topic.updated_on), ('<p>web framework</p>', self.old))
+        self.assertEqual(list(topic.tags.all()), [self.tag])
+        self.assertEqual(Tags.objects.get(id=self.tag.id).no_of_topics, 1)
+        self.assertEqual(Comment.objects.get(id=self.reply.id).parent_id, self.comment.id)
+        self.assertEqual(Comment.objects.get(id=self.comment.id).created_on, self.old)
+        self.assertEqual(list(Comment.objects.get(id=self.reply.id).mentioned.all()), [self.user])
+        self.assertEqual((topic.up_votes_count(), Comment.objects.get(id=self.comment.id).down_votes_count()), (1, 1))
+        self.assertTrue(UserTopics.objects.get(topic=topic).is_followed)
+        self.assertEqual((topic.no_of_comments, topic.last_comment_id), (2, self.reply.id))
+
+    def test_archived_slug(self):
+        call_command('archive_forum_topics', days=30, stdout=open(os.devnull, 'w'))
+        form = TopicForm({'title': 'Django', 'description': 'web framework'}, user=self.user)
+        self.assertIn('title', form.errors)
+        # a live topic that took the slug anyway blocks the restore
+        Topic.objects.create(title='django', slug='django', description='web framework', created_by=self.user)
+        with self.assertRaises(CommandError):
+            call_command('archive_forum_topics', restore='django', stdout=open(os.devnull, 'w'))
+        self.assertTrue(ArchivedTopic.objects.filter(slug='django').exists())
+
+
+@override_settings(FORUM_TIMELINE_RETENTION_DAYS=30)
+class TestTimelineRetention(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com'
+        )
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            created_by=self.user,
+            status='Published',
+        )
+        for event_type in ('like-topic', 'like-topic', 'follow-topic', 'like-topic'):
+            Timeline.objects.create(user=self.user, content_object=self.topic, namespace='topic', event_type=event_type)
+        self.old = timezone.now() - timedelta(days=40)
+        self.old_ids = list(Timeline.objects.order_by('id').values_list('id', flat=True)[:3])
+        Timeline.objects.filter(id__in=self.old_ids).update(created_on=self.old)
+
+    def test_compact_timeline(self):
+        profile = UserProfile.objects.create(user=self.user)
+        self.assertEqual(profile.get_timeline().count(), 1)
+        call_command('compact_forum_timeline', batch_size=2, stdout=open(os.devnull, 'w'))
+        self.assertEqual(Timeline.objects.count(), 1)
+        month = self.old.date().replace(day=1)
+        self.assertEqual(list(profile.get_timeline_summary().values_list('month', 'event_type', 'count')),
+                         [(month, 'follow-topic', 1), (month, 'like-topic', 2)])
+
+    def test_rollup_watermark_respected(self):
+        RollupWatermark.objects.create(source='timeline', last_id=self.old_ids[0])
+        call_command('compact_forum_timeline', no_summary=True, stdout=open(os.devnull, 'w'))
+        self.assertEqual(Timeline.objects.count(), 3)
+        self.assertFalse(TimelineSummary.objects.exists())
+
+
+class TestProfileTopicsView(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com'
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.user2 = User.objects.create(
+            first_name='Santharao',
+            last_name='N',
+            email='santharao@micropyramid.com',
+            username='santharao@micropyramid.com',
+        )
+        self.profile = UserProfile.objects.create(user=self.user)
+        self.category = ForumCategory.objects.create(
+            created_by=self.user,
+            title='Python',
+            is_active=True,
+            slug='python',
+            description='dynamic programming language'
+        )
+
+    def add_topic(self, title):
+        topic = Topic.objects.create(title=title, slug=title, description="web framework", created_by=self.user,
+                                     status='Published', category=self.category)
+        Comment.objects.create(comment='first', commented_by=self.user2, topic=topic)
+        UserTopics.objects.create(user=self.user2, topic=topic, is_like=True)
+        return topic
+
+    def get_tab(self, tab, page=1):
+        url = reverse('django_simple_forum:profile_topics', kwargs={'user_name': self.user.username, 'tab': tab})
+        return self.client.get(url, {'page': page})
+
+    def test_profile_topics(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        topic = self.add_topic('django')
+        UserTopics.objects.create(user=self.user, topic=topic, is_followed=True)
+        response = self.get_tab('created')
+        self.assertTemplateUsed(response, 'forum/profile_topics.html')
+        topics = list(response.context['topics'])
+        self.assertEqual(topics, [topic])
+        self.assertEqual(topics[0].no_of_comments, 1)
+        self.assertEqual([card['id'] for card in topics[0].participants], [self.user.id, self.user2.id])
+        self.assertEqual(list(self.get_tab('followed').context['topics']), [topic])
+        self.assertEqual(list(self.get_tab('liked').context['topics']), [])
+        self.assertEqual(list(self.get_tab('suggested').context['topics']), [topic])
+
+    def test_profile_topics_queries(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        self.add_topic('django')
+        cache.clear()
+        with CaptureQueriesContext(connection) as one_topic:
+            self.get_tab('created')
+        for title in ('flask', 'pyramid', 'bottle'):
+            self.add_topic(title)
+        cache.clear()
+        with CaptureQueriesContext(connection) as four_topics:
+            response = self.get_tab('created')
+        self.assertEqual(len(response.context['topics']), 4)
+        self.assertEqual(len(four_topics), len(one_topic))
+
+    def test_with_participants(self):
+        for title in ('django', 'flask'):
+            self.add_topic(title)
+        cache.clear()
+        with self.assertNumQueries(6):
+            topics = with_participants(Topic.objects.order_by('id'))
+        self.assertEqual([[card['username'] for card in topic.participants] for topic in topics],
+                         [[self.user.username, self.user2.username]] * 2)
+
+    def test_profile_topics_pages(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        for index in range(ProfileTopicsView.paginate_by + 1):
+            Topic.objects.create(title='topic%d' % index, slug='topic%d' % index, description='web framework',
+                                 created_by=self.user, status='Published')
+        response = self.get_tab('created')
+        self.assertTrue(response.context['page_obj'].has_next())
+        self.assertEqual(len(self.get_tab('created', 2).context['topics']), 1)
+
+
+class TestTopicSummary(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com'
+        )
+        self.user2 = User.objects.create(
+            first_name='Santharao',
+            last_name='N',
+            email='santharao@micropyramid.com',
+            username='santharao@micropyramid.com',
+        )
+        self.category = ForumCategory.objects.create(
+            created_by=self.user,
+            title='Python',
+            is_active=True,
+            slug='python',
+            description='dynamic programming language'
+        )
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            created_by=self.user,
+            status='Published',
+            category=self.category
+        )
+
+    def summary(self):
+        return Topic.objects.filter(id=self.topic.id).values_list(
+            'no_of_comments', 'last_comment', 'last_comment_by', 'no_of_participants', 'tag_titles').get()
+
+    def test_topic_summary(self):
+        self.assertEqual(self.summary(), (0, None, None, 1, ''))
+        comment = Comment.objects.create(comment='first', commented_by=self.user2, topic=self.topic)
+        self.assertEqual(self.summary(), (1, comment.id, self.user2.id, 2, ''))
+        reply = Comment.objects.create(comment='reply', commented_by=self.user, topic=self.topic, parent=comment)
+        self.assertEqual(self.summary()[:3], (2, reply.id, self.user.id))
+        reply.delete()
+        self.assertEqual(self.summary()[:3], (1, comment.id, self.user2.id))
+        user_topic = UserTopics.objects.create(user=User.objects.create(username='ashwin'), topic=self.topic,
+                                               is_like=True)
+        self.assertEqual(self.summary()[3], 3)
+        user_topic.delete()
+        self.assertEqual(self.summary()[3], 2)
+        python, django = Tags.objects.create(title='Python', slug='python'), Tags.objects.create(title='Django',
+                                                                                                  slug='django')
+        self.topic.tags.add(python, django)
+        self.assertEqual(self.summary()[4], 'Django,Python')
+        python.title = 'Python3'
+        python.save()
+        self.assertEqual(Topic.objects.get(id=self.topic.id).get_tag_titles(), ['Django', 'Python3'])
+        self.topic.tags.clear()
+        self.assertEqual(self.summary()[4], '')
+
+    def test_created_on_kept(self):
+        created_on = Topic.objects.get(id=self.topic.id).created_on
+        self.topic.title = 'django 2'
+        self.topic.save()
+        self.assertEqual(Topic.objects.get(id=self.topic.id).created_on, created_on)
+
+    def test_topic_list_single_query(self):
+        Comment.objects.create(comment='first', commented_by=self.user2, topic=self.topic)
+        view = TopicList()
+        view.request = RequestFactory().get('/')
+        view.request.user = self.user
+        with self.assertNumQueries(1):
+            rows = [(topic.category.title, topic.no_of_comments, topic.last_comment_by.username,
+                     topic.no_of_participants) for topic in view.get_queryset()]
+        self.assertEqual(rows, [('Python', 1, self.user2.username, 2)])
+
+
+class TestCommentThreads(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com'
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            created_by=self.user,
+            status='Published',
+        )
+        self.first = self.add_comment('first')
+        self.reply = self.add_comment('reply', self.first)
+        self.second = self.add_comment('second')
+        self.nested = self.add_comment('nested', self.reply)
+        self.other = self.add_comment('other', self.second)
+
+    def add_comment(self, text, parent=None):
+        comment = Comment.objects.create(comment=text, commented_by=self.user, topic=self.topic, parent=parent)
+        return Comment.objects.get(id=comment.id)
+
+    def test_comment_path(self):
+        comments = Comment.objects.filter(topic=self.topic).order_by('path')
+        self.assertEqual([comment.comment for comment in comments], ['first', 'reply', 'nested', 'second', 'other'])
+        self.assertEqual([comment.depth for comment in comments], [0, 1, 2, 0, 1])
+        self.assertEqual([comment.thread_position for comment in comments], [0, 1, 2, 0, 1])
+        self.assertEqual(self.nested.path, self.reply.path + '%010d' % self.nested.id)
+        self.assertEqual(Comment.objects.get(id=self.first.id).no_of_replies, 2)
+        self.nested.delete()
+        self.assertEqual(Comment.objects.get(id=self.first.id).no_of_replies, 1)
+
+    def test_comment_add_path(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        response = self.client.post(reverse('django_simple_forum:new_comment'), {
+            'comment': 'third', 'topic': self.topic.id, 'parent': self.other.id})
+        self.assertFalse(json.loads(response.content.decode('utf-8'))['error'])
+        comment = Comment.objects.get(comment='third')
+        self.assertEqual((comment.path, comment.depth), (self.other.path + '%010d' % comment.id, 2))
+
+    @override_settings(FORUM_MAX_COMMENT_DEPTH=2)
+    def test_comment_add_parent(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        topic = Topic.objects.create(title="flask", slug='flask', description="micro framework", created_by=self.user,
+                                     status='Published')
+        url = reverse('django_simple_forum:new_comment')
+        for parent in (self.first.id, 'first'):
+            response = self.client.post(url, {'comment': 'elsewhere', 'topic': topic.id, 'parent': parent})
+            self.assertTrue(json.loads(response.content.decode('utf-8'))['error'])
+        response = self.client.post(url, {'comment': 'too deep', 'topic': self.topic.id, 'parent': self.nested.id})
+        self.assertIn('parent', json.loads(response.content.decode('utf-8'))['response'])
+        self.assertFalse(Comment.objects.filter(comment__in=['elsewhere', 'too deep']).exists())
+
+    @override_settings(FORUM_COMMENTS_PER_PAGE=1, FORUM_REPLIES_PER_COMMENT=1)
+    def test_thread_page(self):
+        Vote.objects.create(user=self.user, content_object=self.reply, type='U')
+        with self.assertNumQueries(1):
+            threads, after = get_thread_page(self.topic.id)
+        self.assertEqual(after, self.first.path)
+        self.assertEqual([(thread['comment'], thread['replies']) for thread in threads], [(self.first, [self.reply])])
+        self.assertEqual(threads[0]['replies'][0].no_of_up_votes, 1)
+        threads, after = get_thread_page(self.topic.id, after)
+        self.assertEqual(after, '')
+        self.assertEqual([(thread['comment'], thread['replies']) for thread in threads], [(self.second, [self.other])])
+
+    @override_settings(FORUM_COMMENTS_PER_PAGE=1)
+    def test_reply_page(self):
+        self.assertEqual(get_reply_page(self.first), ([self.reply], self.reply.path))
+        self.assertEqual(get_reply_page(self.first, self.reply.path), ([self.nested], ''))
+        # a cursor from another thread starts from the beginning
+        self.assertEqual(get_reply_page(self.first, self.other.path), ([self.reply], self.reply.path))
+
+    def test_thread_fragments(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        response = self.client.get(reverse('django_simple_forum:topic_comments', kwargs={'slug': self.topic.slug}),
+                                   {'after': self.first.path})
+        self.assertTemplateUsed(response, 'forum/comment_thread.html')
+        self.assertEqual([thread['comment'] for thread in response.context['threads']], [self.second])
+        response = self.client.get(reverse('django_simple_forum:comment_replies', kwargs={'pk': self.first.id}))
+        self.assertTemplateUsed(response, 'forum/comment_replies.html')
+        self.assertEqual(list(response.context['comments']), [self.reply, self.nested])
+        response = self.client.get(reverse('django_simple_forum:comment_replies', kwargs={'pk': self.reply.id}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_topic_view_threads(self):
+        view = TopicView(kwargs={'slug': self.topic.slug})
+        view.request = RequestFactory().get('/', HTTP_HOST='testserver')
+        view.request.user = self.user
+        context = view.get_context_data()
+        self.assertEqual([thread['comment'] for thread in context['threads']], [self.first, self.second])
+        self.assertEqual(context['next_after'], '')
+        self.assertIn(self.user.id, context['author_cards'])
+
+
+class FailingEmailBackend(locmem.EmailBackend):
+    """Fails the whole batch when a message goes to fail@micropyramid.com."""
+
+    def send_messages(self, messages):
+        if any(message.to == ['fail@micropyramid.com'] for message in messages):
+            raise SMTPRecipientsRefused({'fail@micropyramid.com': (550, b'No such user')})
+        return super(FailingEmailBackend, self).send_messages(messages)
+
+
+class TestNotificationDigest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com'
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.user2 = User.objects.create(
+            first_name='Santharao',
+            last_name='N',
+            email='santharao@micropyramid.com',
+            username='santharao',
+        )
+        self.user3 = User.objects.create(email='ashwin@micropyramid.com', username='ashwin')
+        UserProfile.objects.create(user=self.user, send_mailnotifications=True)
+        UserProfile.objects.create(user=self.user2, send_mailnotifications=True)
+        UserProfile.objects.create(user=self.user3)
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            created_by=self.user2,
+            status='Published',
+        )
+        UserTopics.objects.create(user=self.user3, topic=self.topic, is_followed=True)
+
+    def add_comment(self, text, mentioned=''):
+        self.client.post(reverse('django_simple_forum:new_comment'), {
+            'comment': text, 'topic': self.topic.id, 'parent': '', 'mentioned_user': mentioned})
+
+    def test_digest(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        self.add_comment('first')
+        self.add_comment('@santharao second', '@santharao')
+        # the author and the user without email notifications are left out, the mention is not repeated
+        self.assertEqual(list(PendingNotification.objects.order_by('id').values_list('user', 'is_mentioned')),
+                         [(self.user2.id, False), (self.user2.id, True)])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(send_digests(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user2.email])
+        self.assertIn('mentioned you', mail.outbox[0].body)
+        self.assertFalse(PendingNotification.objects.exists())
+        # the next digest waits for the interval
+        self.add_comment('third')
+        self.assertEqual(send_digests(), 0)
+        UserProfile.objects.filter(user=self.user2).update(
+            last_digest_on=timezone.now() - timedelta(minutes=60))
+        call_command('send_forum_digests', stdout=open(os.devnull, 'w'))
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(EMAIL_BACKEND='django_simple_forum.tests.FailingEmailBackend')
+    def test_digest_failure(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        self.add_comment('first')
+        User.objects.filter(id=self.user2.id).update(email='fail@micropyramid.com')
+        with self.assertRaises(DeliveryError):
+            send_digests()
+        # kept for the next run
+        self.assertEqual(PendingNotification.objects.count(), 1)
+        self.assertIsNone(UserProfile.objects.get(user=self.user2).last_digest_on)
+
+    @override_settings(FORUM_NOTIFICATION_DIGEST_MINUTES=0)
+    def test_digest_off(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        self.add_comment('first')
+        self.assertFalse(PendingNotification.objects.exists())
+
+    def test_unsubscribed(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        self.add_comment('first')
+        UserProfile.objects.filter(user=self.user2).update(send_mailnotifications=False)
+        self.assertEqual(send_digests(), 0)
+        self.assertFalse(PendingNotification.objects.exists())
+
+
+@override_settings(FORUM_NOTIFICATION_DIGEST_MINUTES=0)
+class TestCommentEmails(TransactionTestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com'
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.topic = Topic.objects.create(
+            title="django",
+            slug='django',
+            description="web framework",
+            created_by=self.user,
+            status='Published',
+        )
+        for username in ('santharao', 'ashwin', 'kumar'):
+            user = User.objects.create(email=username + '@micropyramid.com', username=username)
+            UserProfile.objects.create(user=user, send_mailnotifications=True)
+            UserTopics.objects.create(user=user, topic=self.topic, is_followed=True)
+
+    def add_comment(self):
+        self.client.post(reverse('django_simple_forum:new_comment'), {
+            'comment': '@ashwin first', 'topic': self.topic.id, 'parent': '', 'mentioned_user': '@ashwin'})
+        # sent from a background thread
+        for thread in threading.enumerate():
+            if thread is not threading.current_thread() and not thread.daemon:
+                thread.join(30)
+
+    def test_comment_emails(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        self.add_comment()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [
+            'ashwin@micropyramid.com', 'kumar@micropyramid.com', 'santharao@micropyramid.com'])
+        bodies = {message.to[0]: message.body for message in mail.outbox}
+        self.assertEqual(bodies['kumar@micropyramid.com'], bodies['santharao@micropyramid.com'])
+        self.assertNotEqual(bodies['kumar@micropyramid.com'], bodies['ashwin@micropyramid.com'])
+
+    @override_settings(EMAIL_BACKEND='django_simple_forum.tests.FailingEmailBackend')
+    def test_comment_emails_failure(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        User.objects.filter(username='kumar').update(email='fail@micropyramid.com')
+        with self.assertLogs('django_simple_forum.delivery', 'ERROR'):
+            self.add_comment()
+        self.assertTrue(Comment.objects.filter(topic=self.topic).exists())
+
+    @override_settings(FORUM_EMAIL_BATCH_SIZE=2, FORUM_EMAIL_THREADS=3)
+    def test_send_messages(self):
+        messages = [html_message('subject', 'body', ['user%d@micropyramid.com' % index]) for index in range(7)]
+        self.assertEqual(send_messages(messages), 7)
+        self.assertEqual(len(mail.outbox), 7)
+        self.assertEqual(send_messages([]), 0)
+
+    @override_settings(FORUM_EMAIL_BATCH_SIZE=2, FORUM_EMAIL_THREADS=3,
+                       EMAIL_BACKEND='django_simple_forum.tests.FailingEmailBackend')
+    def test_send_messages_failure(self):
+        messages = [html_message('subject', 'body', ['user%d@micropyramid.com' % index]) for index in range(7)]
+        messages[3].to = ['fail@micropyramid.com']
+        with self.assertRaises(DeliveryError) as error:
+            send_messages(messages)
+        self.assertEqual(sorted(message.to[0] for message in error.exception.sent),
+                         sorted(message.to[0] for message in messages[:2] + messages[4:]))
+        self.assertEqual(len(mail.outbox), 5)
+
+
+class TestTopicBrowse(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com'
+        )
+        self.python = ForumCategory.objects.create(
+            created_by=self.user, title='Python', is_active=True, slug='python', description='python')
+        self.ruby = ForumCategory.objects.create(
+            created_by=self.user, title='Ruby', is_active=True, slug='ruby', description='ruby')
+        self.web, self.orm = Tags.objects.create(title='web', slug='web'), Tags.objects.create(title='orm', slug='orm')
+        self.django = self.add_topic('django', self.python, [self.web, self.orm])
+        self.flask = self.add_topic('flask', self.python, [self.web])
+        self.rails = self.add_topic('rails', self.ruby, [self.web, self.orm])
+        self.draft = self.add_topic('draft', self.python, [self.web, self.orm], status='Draft')
+        cache.clear()
+        for index in indexes.indexes:
+            index.version = None
+
+    def add_topic(self, title, category, tags, status='Published'):
+        topic = Topic.objects.create(title=title, slug=title, description='web framework', created_by=self.user,
+                                     status=status, category=category)
+        topic.tags.add(*tags)
+        return topic
+
+    def browse(self, user=None, **params):
+        view = TopicBrowse()
+        view.request = RequestFactory().get('/', params)
+        view.request.user = user or self.user
+        return view.get_context_data()
+
+    def test_bitmap(self):
+        bitmap = facets.Bitmap([3, 70000, 5, 1 << 40])
+        self.assertEqual(len(bitmap), 4)
+        self.assertEqual(list(bitmap.descending()), [1 << 40, 70000, 5, 3])
+        self.assertEqual(list((bitmap & facets.Bitmap([5, 70000, 9])).descending()), [70000, 5])
+        bitmap.discard(70000)
+        self.assertNotIn(70000, bitmap)
+        self.assertEqual(len(bitmap.chunks), 2)
+
+    def test_browse(self):
+        context = self.browse(category=self.python.id, tag=[self.web.id, self.orm.id])
+        self.assertEqual(list(context['topic_list'][:20]), [self.django])
+        context = self.browse(tag=self.web.id)
+        self.assertEqual(list(context['topic_list'][:20]), [self.rails, self.flask, self.django])
+        self.assertEqual([(facet['object'], facet['count']) for facet in context['category_facets']],
+                         [(self.python, 2), (self.ruby, 1)])
+        self.assertEqual([(facet['object'], facet['count'], facet['selected']) for facet in context['tag_facets']],
+                         [(self.web, 3, True), (self.orm, 2, False)])
+        self.assertNotIn('status_facets', context)
+        admin = User.objects.create(username='admin', is_superuser=True)
+        context = self.browse(admin, status='Draft')
+        self.assertEqual(list(context['topic_list'][:20]), [self.draft])
+        self.assertEqual(len(self.browse(admin)['topic_list']), 4)
+        # the unfiltered result is not the index's own bitmap
+        self.assertIsNot(facets.index.filter(), facets.index.all)
+
+    def test_page_queries(self):
+        facets.index.filter()
+        # the facet categories and tags, then the page
+        with self.assertNumQueries(3):
+            topics = self.browse(tag=self.web.id)['topic_list'][:2]
+        with self.assertNumQueries(0):
+            self.assertEqual([topic.category.title for topic in topics], ['Ruby', 'Python'])
+
+    def test_changes(self):
+        other = facets.FacetIndex()
+        other.build()
+        facets.index.filter()
+        self.flask.tags.add(self.orm)
+        Topic.objects.filter(id=self.rails.id).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(list(facets.index.filter(tag_ids=[self.orm.id]).descending()),
+                             [self.draft.id, self.flask.id, self.django.id])
+        # another process replays the logged changes instead of rebuilding
+        with self.assertNumQueries(2):
+            self.assertEqual(len(other.filter(tag_ids=[self.orm.id])), 3)
+        self.orm.delete()
+        self.assertEqual(len(other.filter(tag_ids=[self.orm.id])), 0)
+        self.assertEqual(len(other.filter(tag_ids=[self.web.id])), 3)
+
+    def test_status_changes(self):
+        self.assertEqual(len(facets.index.filter(status='Published')), 3)
+        TopicBulkAction().update_status([self.flask.id], 'Draft')
+        hide_topic(self.rails.id)
+        self.assertEqual(list(facets.index.filter(status='Published').descending()), [self.django.id])
+        # a page never shows a topic whose status the index has not caught up with yet
+        Topic.objects.filter(id=self.django.id).update(status='Draft')
+        self.assertEqual(len(self.browse()['topic_list']), 1)
+        self.assertEqual(list(self.browse()['topic_list'][:20]), [])
+
+
+class TestSimilarTopics(TransactionTestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com'
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.topic = self.add_topic('How to deploy django with nginx')
+        self.add_topic('Flask blueprints explained')
+        self.add_topic('How to deploy django on heroku', status='Draft')
+        cache.clear()
+        for index in indexes.indexes:
+            index.version = None
+
+    def add_topic(self, title, status='Published'):
+        return Topic.objects.create(title=title, slug=title.replace(' ', '-').lower(), description='web framework',
+                                    created_by=self.user, status=status)
+
+    def test_trigrams(self):
+        self.assertEqual(similar.trigrams('Web!'), {'  w', ' we', 'web', 'eb '})
+
+    def test_search(self):
+        self.assertEqual([topic_id for topic_id, score in similar.index.search('deploying django to nginx')],
+                         [self.topic.id])
+        self.assertEqual(similar.index.search('kubernetes'), [])
+        # published later, and tagged
+        draft = Topic.objects.get(status='Draft')
+        draft.status = 'Published'
+        draft.save()
+        draft.tags.add(Tags.objects.create(title='heroku', slug='heroku'))
+        with self.assertNumQueries(0):
+            matches = similar.index.search('django heroku')
+        self.assertEqual(matches[0][0], draft.id)
+
+    def test_similar_topics_view(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        response = self.client.get(reverse('django_simple_forum:similar_topics'), {'title': 'deploy django nginx'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([topic['url'] for topic in data['response']],
+                         [reverse('django_simple_forum:view_topic', kwargs={'slug': self.topic.slug})])
+        # unpublished without the index hearing of it
+        Topic.objects.filter(id=self.topic.id).update(status='Draft')
+        response = self.client.get(reverse('django_simple_forum:similar_topics'), {'title': 'deploy django nginx'})
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['response'], [])
+
+
+class TestTagSuggestions(TransactionTestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com'
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.django = Tags.objects.create(title='Django', slug='django')
+        self.rest = Tags.objects.create(title='django-rest', slug='django-rest')
+        self.docker = Tags.objects.create(title='docker', slug='docker')
+        for title in ('Django forms', 'Django admin'):
+            topic = Topic.objects.create(title=title, slug=title.replace(' ', '-').lower(), description='web',
+                                         created_by=self.user, status='Published')
+            topic.tags.add(self.django)
+        cache.clear()
+        for index in indexes.indexes:
+            index.version = None
+
+    def get_titles(self, prefix):
+        return [title for tag_id, title, count in autocomplete.index.suggest(prefix)]
+
+    def test_suggest(self):
+        self.assertEqual(self.get_titles('DJ'), ['Django', 'django-rest'])
+        self.assertEqual(self.get_titles('do'), ['docker'])
+        self.assertEqual(self.get_titles('x'), [])
+        self.assertEqual(autocomplete.index.suggest('django')[0][2], 2)
+        # a new tag is indexed as it is created, and counts follow the topics
+        Tags.objects.create(title='Djangocms', slug='djangocms')
+        topic = Topic.objects.create(title='REST apis', slug='rest-apis', description='web',
+                                     created_by=self.user, status='Published')
+        topic.tags.add(self.rest)
+        Topic.objects.filter(title='Django admin').delete()
+        with self.assertNumQueries(0):
+            suggestions = autocomplete.index.suggest('dj')
+        self.assertEqual([(title, count) for tag_id, title, count in suggestions],
+                         [('Django', 1), ('django-rest', 1), ('Djangocms', 0)])
+
+    @override_settings(FORUM_TAG_INDEX_SIZE=2)
+    def test_index_size(self):
+        self.assertEqual(self.get_titles('d'), ['Django', 'django-rest'])
+        # a new tag takes the place of the least used one
+        Tags.objects.create(title='debian', slug='debian')
+        self.assertEqual(self.get_titles('d'), ['Django', 'debian'])
+        self.assertEqual(len(autocomplete.index.titles), 2)
+        # a tag that becomes more used than an indexed one is suggested from then on
+        for title in ('compose', 'swarm'):
+            topic = Topic.objects.create(title=title, slug=title, description='containers', created_by=self.user,
+                                         status='Published')
+            topic.tags.add(self.docker)
+        self.assertEqual(self.get_titles('d'), ['Django', 'docker'])
+
+    def test_suggest_tags_view(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        response = self.client.get(reverse('django_simple_forum:suggest_tags'), {'q': 'dja'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['response'], [{'title': 'Django', 'no_of_topics': 2},
+                                            {'title': 'django-rest', 'no_of_topics': 0}])
+
+
+class TestTopicFeed(TransactionTestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(
+            first_name='Ravi',
+            last_name='G',
+            email='ravi@micropyramid.com',
+            username='ravi@micropyramid.com'
+        )
+        self.password = 'secret'
+        self.user.set_password(self.password)
+        self.user.save()
+        self.python = ForumCategory.objects.create(
+            created_by=self.user, title='Python', is_active=True, slug='python', description='python')
+        self.django = ForumCategory.objects.create(
+            created_by=self.user, title='Django', is_active=True, slug='django', description='django',
+            parent=self.python)
+        self.ruby = ForumCategory.objects.create(
+            created_by=self.user, title='Ruby', is_active=True, slug='ruby', description='ruby')
+        self.web = Tags.objects.create(title='web', slug='web')
+        self.flask = self.add_topic('flask', self.python)
+        self.orm = self.add_topic('orm', self.django)
+        self.rails = self.add_topic('rails', self.ruby)
+        self.sinatra = self.add_topic('sinatra', self.ruby, [self.web])
+        self.add_topic('draft', self.python, status='Draft')
+        Subscription.objects.create(user=self.user, category=self.python)
+        Subscription.objects.create(user=self.user, tag=self.web)
+        cache.clear()
+        for index in indexes.indexes:
+            index.version = None
+
+    def add_topic(self, title, category, tags=(), status='Published'):
+        topic = Topic.objects.create(title=title, slug=title, description='web framework', created_by=self.user,
+                                     status=status, category=category)
+        topic.tags.add(*tags)
+        return topic
+
+    def get_feed(self, **params):
+        view = TopicFeed()
+        view.request = RequestFactory().get('/', params)
+        view.request.user = self.user
+        return view.get_context_data()
+
+    def test_bitmap_union(self):
+        bitmap = facets.Bitmap([3, 70000]) | facets.Bitmap([5, 70000, 1 << 40])
+        self.assertEqual(list(bitmap.descending()), [1 << 40, 70000, 5, 3])
+        self.assertEqual(list(bitmap.descending(below=70000)), [5, 3])
+        self.assertEqual(list(bitmap.descending(below=5)), [3])
+        self.assertEqual([bitmap.count_from(value) for value in (0, 5, 6, 70000, 70001, 1 << 41)], [4, 3, 2, 2, 1, 0])
+
+    def test_feed(self):
+        self.assertEqual(feeds.get_feed(self.user.id), [self.sinatra.id, self.orm.id, self.flask.id])
+        # a topic published later shows first
+        topic = self.add_topic('pyramid', self.django)
+        self.assertEqual(feeds.get_feed(self.user.id)[0], topic.id)
+        self.assertEqual(feeds.get_feed(User.objects.create(username='new').id), [])
+        # sub categories of sub categories are followed too
+        orm = ForumCategory.objects.create(
+            created_by=self.user, title='ORM', is_active=True, slug='orm', description='orm', parent=self.django)
+        topic = self.add_topic('peewee', orm)
+        self.assertEqual(feeds.get_feed(self.user.id)[0], topic.id)
+
+    def test_unpublished(self):
+        # the index has not heard of it yet
+        Topic.objects.filter(id=self.orm.id).update(status='Draft')
+        self.assertEqual(feeds.get_feed_page(self.user.id), ([self.sinatra, self.flask], None))
+
+    def test_cursor_pagination(self):
+        context = self.get_feed()
+        self.assertEqual(context['topic_list'], [self.sinatra, self.orm, self.flask])
+        self.assertIsNone(context['next_before'])
+        topics, next_before = feeds.get_feed_page(self.user.id, size=2)
+        self.assertEqual((topics, next_before), ([self.sinatra, self.orm], self.orm.id))
+        context = self.get_feed(before=next_before)
+        self.assertEqual((context['topic_list'], context['next_before']), ([self.flask], None))
+        self.assertEqual([subscription['title'] for subscription in context['subscriptions']], ['web', 'Python'])
+
+    @override_settings(FORUM_FEED_SIZE=2)
+    def test_feed_size(self):
+        self.assertEqual(feeds.get_feed(self.user.id), [self.sinatra.id, self.orm.id])
+        self.assertEqual(feeds.get_feed_page(self.user.id, self.orm.id), ([], None))
+        self.assertEqual(feeds.get_feed_page(self.user.id, size=1), ([self.sinatra], self.sinatra.id))
+        self.assertEqual(feeds.get_feed_page(self.user.id, self.sinatra.id, size=1), ([self.orm], None))
+
+    def test_tag_page(self):
+        view = ForumTagsView()
+        view.request = RequestFactory().get('/')
+        view.request.user = self.user
+        subscription = view.get_context_data(slug=self.web.slug)['subscription']
+        self.assertEqual((subscription['title'], subscription['is_subscribed']), ('web', True))
+
+    def test_subscribe(self):
+        login = self.client.login(username=self.user.email, password=self.password)
+        self.assertTrue(login)
+        url = reverse('django_simple_forum:subscribe', kwargs={'kind': 'category', 'pk': self.ruby.id})
+        response = self.client.post(url)
+        self.assertTrue(json.loads(response.content.decode('utf-8'))['is_subscribed'])
+        self.assertIn(self.rails.id, feeds.get_feed(self.user.id))
+        response = self.client.post(url)
+        self.assertFalse(json.loads(response.content.decode('utf-8'))['is_subscribed'])
+        self.assertFalse(Subscription.objects.filter(user=self.user, category=self.ruby).exists())
+        url = reverse('django_simple_forum:subscribe', kwargs={'kind': 'tag', 'pk': 0})
+        self.assertEqual(self.client.post(url).status_code, 404)
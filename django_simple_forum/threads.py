@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.db.models import Count, Case, When, Value, Subquery, CharField
+from django.db.models.functions import Coalesce
+
+from .models import Comment, COMMENT_PATH_WIDTH
+
+# sorts after every path
+PATH_END = '~'
+# deepest reply whose path still fits the path column, the top level comment taking the first id
+MAX_COMMENT_DEPTH = Comment._meta.get_field('path').max_length // COMMENT_PATH_WIDTH - 1
+
+
+def get_comments_per_page():
+    return getattr(settings, 'FORUM_COMMENTS_PER_PAGE', 20)
+
+
+def get_replies_per_comment():
+    return getattr(settings, 'FORUM_REPLIES_PER_COMMENT', 3)
+
+
+def get_max_comment_depth():
+    return min(getattr(settings, 'FORUM_MAX_COMMENT_DEPTH', MAX_COMMENT_DEPTH), MAX_COMMENT_DEPTH)
+
+
+def with_vote_counts(comments):
+    return comments.annotate(
+        no_of_up_votes=Count(Case(When(votes__type='U', then=1))),
+        no_of_down_votes=Count(Case(When(votes__type='D', then=1))))
+
+
+def get_thread_page(topic_id, after='', size=None, replies=None):
+    """
+    The ``size`` top level comments of a topic that follow the top level comment with path
+    ``after``, each with the first ``replies`` replies of its thread, read in one query ordered
+    by path. Returns a list of {'comment', 'replies'} dicts and the ``after`` of the next page,
+    '' on the last one.
+    """
+    size = get_comments_per_page() if size is None else size
+    replies = get_replies_per_comment() if replies is None else replies
+    start = after[:COMMENT_PATH_WIDTH] + PATH_END if after else ''
+    # the first top level comment of the next page; it is read too, to tell whether there is one
+    end = Comment.objects.filter(topic_id=topic_id, depth=0, path__gt=start).order_by('path').values('path')
+    comments = with_vote_counts(Comment.objects.filter(
+        topic_id=topic_id, path__gt=start, thread_position__lte=replies,
+        path__lte=Coalesce(Subquery(end[size:size + 1], output_field=CharField()), Value(PATH_END)),
+    )).order_by('path')
+    threads = []
+    for comment in comments:
+        if not comment.depth:
+            threads.append({'comment': comment, 'replies': []})
+        elif threads:
+            threads[-1]['replies'].append(comment)
+    if len(threads) > size:
+        threads.pop()
+        return threads, threads[-1]['comment'].path
+    return threads, ''
+
+
+def get_reply_page(root, after='', size=None):
+    """
+    The ``size`` replies in the thread of the top level comment ``root`` that follow the path
+    ``after``, in path order, and the ``after`` of the next page, '' on the last one.
+    """
+    size = get_comments_per_page() if size is None else size
+    start = after if after.startswith(root.path) else root.path
+    comments = list(with_vote_counts(Comment.objects.filter(
+        topic_id=root.topic_id, path__gt=start, path__lt=root.path + PATH_END)).order_by('path')[:size + 1])
+    if len(comments) > size:
+        return comments[:size], comments[size - 1].path
+    return comments, ''
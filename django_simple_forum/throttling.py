@@ -0,0 +1,108 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+
+DEFAULT_RATES = {
+    'vote': '30/m',
+    'like': '20/m',
+    'follow': '20/m',
+    'comment': '10/m',
+}
+
+# an IP can be a proxy or a NAT in front of many users, so its buckets are larger
+DEFAULT_IP_RATES = {
+    'vote': '300/m',
+    'like': '200/m',
+    'follow': '200/m',
+    'comment': '100/m',
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# buckets kept in process when the cache is a dummy backend or unavailable
+LOCAL_MAX_BUCKETS = 10000
+_local_buckets = {}
+_local_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """'30/m' -> (30, 60): capacity of the bucket and the seconds it takes to refill it."""
+    if not rate:
+        return None
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def get_rate(scope):
+    rates = dict(DEFAULT_RATES, **getattr(settings, 'FORUM_THROTTLE_RATES', {}))
+    return parse_rate(rates.get(scope))
+
+
+def get_ip_rate(scope):
+    rates = dict(DEFAULT_IP_RATES, **getattr(settings, 'FORUM_THROTTLE_IP_RATES', {}))
+    return parse_rate(rates.get(scope))
+
+
+def get_client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class TokenBucket(object):
+    """
+    Token bucket stored in the Django cache, falling back to an in-process dict.
+
+    Cache reads and writes are not atomic, so concurrent requests can overshoot the
+    limit by a few tokens; the limit is meant to shed load, not to be exact.
+    """
+
+    def __init__(self, key, capacity, period):
+        self.key = key
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / float(period)
+
+    def get_cache(self):
+        cache = caches[getattr(settings, 'FORUM_THROTTLE_CACHE', 'default')]
+        if isinstance(cache, DummyCache):
+            return None
+        return cache
+
+    def consume(self, now=None):
+        """Takes one token; returns 0 if one was available, else the seconds until there is."""
+        now = time.time() if now is None else now
+        cache = self.get_cache()
+        if cache is not None:
+            try:
+                return self._consume(cache.get(self.key), now, cache.set)
+            except Exception:
+                pass
+        with _local_lock:
+            if len(_local_buckets) >= LOCAL_MAX_BUCKETS:
+                _local_buckets.clear()
+            return self._consume(_local_buckets.get(self.key), now, self._store_local)
+
+    def _consume(self, state, now, store):
+        tokens, updated = state if state else (self.capacity, now)
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+        if not wait:
+            tokens -= 1
+        store(self.key, (tokens, now), self.period)
+        return wait
+
+    def _store_local(self, key, state, timeout):
+        _local_buckets[key] = state
+
+
+def throttle(request, scope):
+    """Charges the request to the per-user and per-IP buckets of ``scope``; returns the wait in seconds."""
+    rate = get_rate(scope)
+    if rate is None:
+        return 0
+    buckets = [('forum-throttle:%s:ip:%s' % (scope, get_client_ip(request)), get_ip_rate(scope))]
+    if request.user.is_authenticated():
+        buckets.append(('forum-throttle:%s:user:%s' % (scope, request.user.pk), rate))
+    return max([TokenBucket(key, *rate).consume() for key, rate in buckets if rate is not None] or [0])
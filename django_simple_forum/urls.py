@@ -4,16 +4,24 @@ from . import views
 
 urlpatterns = [
     url(r'^$', views.TopicList.as_view(), name="topic_list"),
+    url(r'^topics/browse/$', views.TopicBrowse.as_view(), name="browse_topics"),
+    url(r'^feed/$', views.TopicFeed.as_view(), name="topic_feed"),
+    url(r'^subscribe/(?P<kind>category|tag)/(?P<pk>\d+)/$', views.Subscribe.as_view(), name="subscribe"),
 
     url(r'^topic/add/$', views.TopicAdd.as_view(), name="new_topic"),
+    url(r'^topic/similar/$', views.SimilarTopics.as_view(), name="similar_topics"),
     url(r'^topic/(?P<slug>[-\w]+)/update/$', views.TopicUpdateView.as_view(), name="topic_update"),
     url(r'^topic/view/(?P<slug>[-\w]+)/$', views.TopicView.as_view(), name="view_topic"),
+    url(r'^topic/events/(?P<slug>[-\w]+)/$', views.TopicEvents.as_view(), name="topic_events"),
+    url(r'^topic/comments/(?P<slug>[-\w]+)/$', views.TopicComments.as_view(), name="topic_comments"),
     url(r'^topic/like/(?P<slug>[-\w]+)/$', views.TopicLike.as_view(), name="like_topic"),
     url(r'^topic/follow/(?P<slug>[-\w]+)/$', views.TopicFollow.as_view(), name="follow_topic"),
     url(r'^topic/votes/(?P<slug>[-\w]+)/up/$', views.TopicVoteUpView.as_view(), name="topic_vote_up"),
     url(r'^topic/votes/(?P<slug>[-\w]+)/down/$', views.TopicVoteDownView.as_view(), name="topic_vote_down"),
 
     url(r'^mentioned-users/(?P<topic_id>[-\w]+)/$', views.get_mentioned_user, name="get_mentioned_user"),
+    url(r'^user/profile/(?P<user_name>[^/]+)/topics/(?P<tab>created|followed|liked|suggested)/$',
+        views.ProfileTopicsView.as_view(), name="profile_topics"),
     url(r'^user/profile/(?P<user_name>[a-zA-Z0-9_.-@]+)/$', views.ProfileView.as_view(), name="view_profile"),
     url(r'^comment/delete/(?P<comment_id>[-\w]+)/$',
         views.CommentDelete.as_view(), name="comment_delete"),
@@ -21,8 +29,10 @@ urlpatterns = [
 
     url(r'^categories/$', views.ForumCategoryList.as_view(), name="forum_categories"),
     url(r'^tags/$', views.ForumTagsList.as_view(), name="forum_tags"),
+    url(r'^tags/suggest/$', views.TagSuggestions.as_view(), name="suggest_tags"),
     url(r'^badges/$', views.ForumBadgeList.as_view(), name="forum_badges"),
     url(r'^profile/$', views.UserProfileView.as_view(), name="user_profile"),
+    url(r'^profile/picture/$', views.UserProfilePicView.as_view(), name="user_profile_pic"),
     url(r'^send-mail/settings/$', views.UserSettingsView.as_view(), name="user_settings"),
 
     url(r'^category/(?P<slug>[-\w]+)/$', views.ForumCategoryView.as_view(), name="forum_category_detail"),
@@ -33,6 +43,7 @@ urlpatterns = [
     url(r'^comment/add/$', views.CommentAdd.as_view(), name="new_comment"),
     url(r'^comment/votes/(?P<pk>[-\w]+)/up/$', views.CommentVoteUpView.as_view(), name="comment_vote_up"),
     url(r'^comment/votes/(?P<pk>[-\w]+)/down/$', views.CommentVoteDownView.as_view(), name="comment_vote_down"),
+    url(r'^comment/replies/(?P<pk>[-\w]+)/$', views.CommentReplies.as_view(), name="comment_replies"),
 
     url(r'^dashboard/$', views.DashboardView.as_view(), name="dashboard"),
 
@@ -50,8 +61,10 @@ urlpatterns = [
     url(r'^dashboard/badge/delete/(?P<slug>[-\w]+)/$', views.BadgeDelete.as_view(), name="delete_badge"),
     url(r'^dashboard/badge/edit/(?P<slug>[-\w]+)/$', views.BadgeEdit.as_view(), name="edit_badge"),
     url(r'^dashboard/badge/view/(?P<slug>[-\w]+)/$', views.BadgeDetailView.as_view(), name="view_badge"),
+    url(r'^dashboard/badge/bulk/(?P<slug>[-\w]+)/$', views.BadgeBulkAction.as_view(), name="bulk_badge"),
 
     url(r'^dashboard/users/list/$', views.UserList.as_view(), name="users"),
+    url(r'^dashboard/users/bulk/$', views.UserBulkAction.as_view(), name="bulk_users"),
     url(r'^dashboard/users/delete/(?P<user_id>[a-zA-Z0-9_-]+.*?)/$',
         views.DashboardUserDelete.as_view(), name="delete_user"),
     url(r'^dashboard/users/status/(?P<user_id>[a-zA-Z0-9_-]+.*?)/$',
@@ -62,7 +75,9 @@ urlpatterns = [
         views.DashboardUserEdit.as_view(), name="edit_user"),
 
     url(r'^dashboard/topics/list/$', views.DashboardTopicList.as_view(), name="topics"),
+    url(r'^dashboard/topics/bulk/$', views.TopicBulkAction.as_view(), name="bulk_topics"),
     url(r'^dashboard/topics/delete/(?P<slug>[-\w]+)/$', views.TopicDeleteView.as_view(), name="delete_topic"),
+    url(r'^dashboard/deletions/$', views.DeletionJobList.as_view(), name="deletion_jobs"),
     url(r'^dashboard/topic/view/(?P<slug>[-\w]+)/$', views.TopicDetail.as_view(), name="topic_detail"),
     url(r'^dashboard/topic/status/(?P<slug>[-\w]+)/$', views.TopicStatus.as_view(), name="topic_status"),
 
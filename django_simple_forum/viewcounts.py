@@ -0,0 +1,160 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.signals import request_finished
+from django.db import connection
+from django.db.models import F
+from django.dispatch import receiver
+
+from .models import Topic
+
+logger = logging.getLogger(__name__)
+
+# viewers remembered in process when the cache is a dummy backend or unavailable
+LOCAL_MAX_VIEWERS = 10000
+_local_viewers = {}
+
+_pending = Counter()
+_pending_since = None
+_timer = None
+# timed flushes that failed in a row; the timer stops retrying after MAX_TIMED_FAILURES
+_timed_failures = 0
+MAX_TIMED_FAILURES = 5
+_lock = threading.Lock()
+
+
+def get_dedupe_seconds():
+    return getattr(settings, 'FORUM_VIEW_DEDUPE_SECONDS', 30 * 60)
+
+
+def get_flush_seconds():
+    return getattr(settings, 'FORUM_VIEW_FLUSH_SECONDS', 10)
+
+
+def get_flush_size():
+    return getattr(settings, 'FORUM_VIEW_FLUSH_SIZE', 500)
+
+
+def get_viewer(request):
+    if request.user.is_authenticated():
+        return 'user:%s' % request.user.pk
+    session_key = getattr(request, 'session', None) and request.session.session_key
+    if session_key:
+        return 'session:%s' % session_key
+    return 'ip:%s' % request.META.get('REMOTE_ADDR', '')
+
+
+def is_new_view(key, now):
+    """Remembers ``key`` for FORUM_VIEW_DEDUPE_SECONDS; returns False if it was already remembered."""
+    cache = caches[getattr(settings, 'FORUM_VIEW_CACHE', 'default')]
+    if not isinstance(cache, DummyCache):
+        try:
+            return cache.add(key, 1, get_dedupe_seconds())
+        except Exception:
+            pass
+    with _lock:
+        if _local_viewers.get(key, 0) > now:
+            return False
+        if len(_local_viewers) >= LOCAL_MAX_VIEWERS:
+            _local_viewers.clear()
+        _local_viewers[key] = now + get_dedupe_seconds()
+        return True
+
+
+def record_view(request, topic_id):
+    """
+    Counts a view of the topic unless the same user or session viewed it within
+    FORUM_VIEW_DEDUPE_SECONDS. The increment is buffered until the next flush.
+    """
+    global _pending_since
+    now = time.time()
+    if not is_new_view('forum-view:%s:%s' % (topic_id, get_viewer(request)), now):
+        return False
+    with _lock:
+        _pending[topic_id] += 1
+        if _pending_since is None:
+            _pending_since = now
+        schedule_flush()
+    return True
+
+
+def schedule_flush():
+    """
+    Flushes the buffer FORUM_VIEW_FLUSH_SECONDS from now in a timer thread, so a worker that
+    gets no more requests still writes its views. Called with the lock held.
+    """
+    global _timer
+    if _timer is None:
+        _timer = threading.Timer(get_flush_seconds(), timed_flush)
+        _timer.daemon = True
+        _timer.start()
+
+
+def timed_flush():
+    global _timer, _timed_failures
+    with _lock:
+        _timer = None
+    try:
+        flush()
+        _timed_failures = 0
+    except Exception:
+        _timed_failures += 1
+        logger.exception('Could not write the buffered topic views')
+    finally:
+        connection.close()
+    with _lock:
+        # retries what could not be written; after repeated failures the next view starts the timer again
+        if _pending and _timed_failures < MAX_TIMED_FAILURES:
+            schedule_flush()
+
+
+def flush():
+    """Writes the buffered views with one UPDATE per distinct increment; returns the number of views written."""
+    global _pending_since
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _pending_since = None
+    by_increment = {}
+    for topic_id, count in pending.items():
+        by_increment.setdefault(count, []).append(topic_id)
+    try:
+        for count, topic_ids in by_increment.items():
+            Topic.objects.filter(id__in=topic_ids).update(no_of_views=F('no_of_views') + count)
+            for topic_id in topic_ids:
+                del pending[topic_id]
+    finally:
+        if pending:
+            # keep what was not written for the next flush
+            with _lock:
+                _pending.update(pending)
+                if _pending_since is None:
+                    _pending_since = time.time()
+    return sum(count * len(topic_ids) for count, topic_ids in by_increment.items())
+
+
+def flush_if_due():
+    with _lock:
+        due = _pending_since is not None and (
+            time.time() - _pending_since >= get_flush_seconds() or len(_pending) >= get_flush_size())
+    if due:
+        flush()
+
+
+@receiver(request_finished, dispatch_uid='django_simple_forum.viewcounts')
+def flush_after_request(sender, **kwargs):
+    # runs after the response is sent, so the UPDATE neither delays it nor pins the user to the primary
+    try:
+        flush_if_due()
+    except Exception:
+        logger.exception('Could not write the buffered topic views')
+
+
+# don't lose buffered views when the worker shuts down
+atexit.register(flush)
@@ -1,13 +1,18 @@
-from datetime import datetime
+import string
+from datetime import datetime, timedelta
 
-from django.conf import settings
 from django.contrib.auth.hashers import check_password
-from django.db.models import Q
-from django.http import JsonResponse
+from django.contrib.contenttypes.models import ContentType
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q, F, Count, Sum, Case, When
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
-from django.template import Context, loader
+from django.template import loader
 from django.template.defaultfilters import slugify
 from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.utils.http import urlencode
 from django.views.generic import TemplateView, UpdateView, ListView, CreateView, DetailView, \
     DeleteView, View
 from django.views.generic.edit import FormView
@@ -19,10 +24,25 @@ try:
 except ImportError:
     from django.contrib.auth.models import User
 
-from .models import ForumCategory, STATUS, Badge, Topic, Tags, UserProfile, UserTopics, Timeline, Comment, Vote
-from .mixins import AdminMixin, LoginRequiredMixin, CanUpdateTopicMixin
-from .forms import CategoryForm, BadgeForm, TopicForm, CommentForm, UserProfileForm, \
-    ChangePasswordForm
+from .models import ForumCategory, STATUS, Badge, Topic, Tags, UserProfile, UserTopics, Timeline, Comment, Vote, \
+    DailyActivity, DailyActiveUser, DeletionJob, ArchivedTopic, Subscription, tag_bucket, update_topic_tag_counts, \
+    get_topic_participants
+from .mixins import AdminMixin, LoginRequiredMixin, CanUpdateTopicMixin, ExportMixin, BulkActionMixin, \
+    ReplicaReadMixin, ThrottleMixin
+from .forms import CategoryForm, BadgeForm, TopicForm, CommentForm, UserProfileForm, ProfilePicForm
+from . import events
+from .rollups import METRICS, to_day
+from .viewcounts import record_view
+from .avatars import get_author_cards, invalidate_author_card, schedule_avatar
+from .deletion import queue_deletion, queue_deletions
+from .threads import get_thread_page, get_reply_page, get_max_comment_depth
+from .notifications import get_digest_minutes, get_recipients, queue_notifications
+from .delivery import schedule_comment_emails
+from .facets import index as facet_index, FacetResults
+from .indexes import log_change_on_commit
+from .similar import index as title_index
+from .autocomplete import index as tag_index
+from .feeds import get_feed_page
 
 
 def timeline_activity(user, content_object, namespace, event_type):
@@ -34,14 +54,68 @@ def timeline_activity(user, content_object, namespace, event_type):
     )
 
 
+def vote_activity(user, content_object, vote_type):
+    """
+    Records the user's vote on a topic or comment; a vote of the opposite type is removed
+    instead. The unique (user, target) index makes concurrent duplicates collapse into one row.
+    """
+    vote, created = Vote.objects.get_or_create(
+        user=user,
+        content_type=ContentType.objects.get_for_model(content_object),
+        object_id=content_object.id,
+        defaults={'type': vote_type},
+    )
+    if created:
+        return "up" if vote_type == "U" else "down"
+    if vote.type != vote_type:
+        vote.delete()
+        return "removed"
+    return "neutral"
+
+
+def publish_vote_counts(topic_id, content_object):
+    counts = dict(content_object.votes.order_by().values_list('type').annotate(count=Count('id')))
+    events.publish(topic_id, 'vote', {
+        'target': content_object._meta.model_name,
+        'id': content_object.id,
+        'up': counts.get('U', 0),
+        'down': counts.get('D', 0),
+    })
+
+
 class DashboardView(AdminMixin, TemplateView):
     template_name = 'dashboard/dashboard.html'
+    activity_days = 30
+
+    def get_context_data(self, **kwargs):
+        context = super(DashboardView, self).get_context_data(**kwargs)
+        # reads only the rollup rows of the last activity_days, however large the forum is
+        since = to_day(timezone.now()) - timedelta(days=self.activity_days - 1)
+        activity = DailyActivity.objects.filter(day__gte=since)
+        totals = {metric: Sum(metric) for metric in METRICS}
+        # a user active in several categories is one active user of the day, and of the period in a category
+        active_users = DailyActiveUser.objects.filter(day__gte=since).order_by()
+        daily_active_users = dict(active_users.values_list('day').annotate(Count('user', distinct=True)))
+        category_active_users = dict(active_users.values_list('category').annotate(Count('user', distinct=True)))
+        daily_activity = list(activity.values('day').annotate(**totals).order_by('-day'))
+        for day in daily_activity:
+            day['active_users'] = daily_active_users.get(day['day'], 0)
+        context['daily_activity'] = daily_activity
+        context['max_active_users'] = max([day['active_users'] for day in daily_activity] or [0])
+        category_activity = list(activity.values('category', 'category__title').annotate(**totals).order_by('-topics'))
+        for category in category_activity:
+            category['active_users'] = category_active_users.get(category['category'], 0)
+        context['category_activity'] = category_activity
+        return context
 
 
-class CategoryList(AdminMixin, ListView):
+class CategoryList(AdminMixin, ExportMixin, ListView):
     model = ForumCategory
     template_name = 'dashboard/categories.html'
     context_object_name = 'categories_list'
+    export_filename = 'categories'
+    export_fields = ('id', 'title', 'slug', 'parent__slug', 'color', 'is_active', 'is_votable',
+                     'created_by__username', 'created_on', 'no_of_topics')
 
     def get_context_data(self, **kwargs):
         context = super(CategoryList, self).get_context_data(**kwargs)
@@ -49,15 +123,21 @@ class CategoryList(AdminMixin, ListView):
         context['categories_list'] = categories_list
         return context
 
-    def post(self, request, *args, **kwargs):
-        categories_list = self.model.objects.all()
-
-        if request.POST.get('is_active') == 'True':
+    def filter_queryset(self, categories_list, data):
+        if data.get('is_active') == 'True':
             categories_list = categories_list.filter(is_active=True)
-        if request.POST.get('search_text', ''):
+        if data.get('search_text', ''):
             categories_list = categories_list.filter(
-                title__icontains=request.POST.get('search_text')
+                title__icontains=data.get('search_text')
             )
+        return categories_list
+
+    def get_export_queryset(self):
+        categories_list = self.filter_queryset(self.model.objects.all(), self.request.GET)
+        return categories_list.annotate(no_of_topics=Count('topic')).order_by('id')
+
+    def post(self, request, *args, **kwargs):
+        categories_list = self.filter_queryset(self.model.objects.all(), request.POST)
         return render(request, self.template_name, {'categories_list': categories_list})
 
 
@@ -121,8 +201,8 @@ class CategoryDelete(AdminMixin, DeleteView):
 
     def post(self, request, *args, **kwargs):
         category = self.get_object()
-        category.delete()
-        return JsonResponse({'error': False, 'response': 'Successfully Deleted Category'})
+        job = queue_deletion(category, request.user)
+        return JsonResponse({'error': False, 'response': 'Category Queued for Deletion', 'job': job.id})
 
 
 class CategoryEdit(AdminMixin, UpdateView):
@@ -162,39 +242,61 @@ class CategoryEdit(AdminMixin, UpdateView):
         return context
 
 
-class BadgeList(AdminMixin, ListView):
+class BadgeList(AdminMixin, ExportMixin, ListView):
     model = Badge
     template_name = 'dashboard/badges.html'
     context_object_name = 'badges_list'
+    export_filename = 'badges'
+    export_fields = ('id', 'title', 'slug', 'no_of_users')
 
     def get_context_data(self, **kwargs):
         context = super(BadgeList, self).get_context_data(**kwargs)
         return context
 
-    def post(self, request, *args, **kwargs):
-        badges_list = self.model.objects.all()
-        if request.POST.get('search_text', ''):
+    def filter_queryset(self, badges_list, data):
+        if data.get('search_text', ''):
             badges_list = badges_list.filter(
-                Q(title__icontains=request.POST.get('search_text')))
+                Q(title__icontains=data.get('search_text')))
+        return badges_list
+
+    def get_export_queryset(self):
+        badges_list = self.filter_queryset(self.model.objects.all(), self.request.GET)
+        return badges_list.order_by('id')
+
+    def post(self, request, *args, **kwargs):
+        badges_list = self.filter_queryset(self.model.objects.all(), request.POST)
         per_page = request.POST.get("filter_per_page") if request.POST.get(
             "filter_per_page") else 10
         return render(request, self.template_name, {'badges_list': badges_list,
                                                     "per_page": per_page})
 
 
-class DashboardTopicList(AdminMixin, ListView):
+class DashboardTopicList(AdminMixin, ExportMixin, ListView):
     template_name = 'dashboard/topics.html'
     context_object_name = "topic_list"
+    export_filename = 'topics'
+    export_fields = ('id', 'title', 'slug', 'status', 'category__title', 'created_by__username',
+                     'created_on', 'no_of_views', 'no_of_likes', 'no_of_up_votes', 'no_of_down_votes',
+                     'no_of_comments')
 
-    def get_queryset(self):
-        queryset = Topic.objects.all()
-        search_text = self.request.POST.get('search_text')
+    def filter_queryset(self, queryset, data):
+        search_text = data.get('search_text')
         if search_text:
             queryset = queryset.filter(
                 Q(title__icontains=search_text) | Q(created_by__username__icontains=search_text)
             )
         return queryset
 
+    def get_queryset(self):
+        return self.filter_queryset(Topic.objects.select_related('created_by'), self.request.POST)
+
+    def get_export_queryset(self):
+        queryset = self.filter_queryset(Topic.objects.all(), self.request.GET)
+        return queryset.annotate(
+            no_of_up_votes=Count(Case(When(votes__type='U', then='votes')), distinct=True),
+            no_of_down_votes=Count(Case(When(votes__type='D', then='votes')), distinct=True),
+        ).order_by('id')
+
 
 class BadgeDetailView(AdminMixin, DetailView):
     model = Badge
@@ -205,6 +307,15 @@ class BadgeDetailView(AdminMixin, DetailView):
     def get_object(self, **kwargs):
         return get_object_or_404(Badge, slug=self.kwargs['slug'])
 
+    def get_context_data(self, **kwargs):
+        context = super(BadgeDetailView, self).get_context_data(**kwargs)
+        page = self.request.GET.get('page', '')
+        page = int(page) if page.isdigit() and int(page) > 0 else 1
+        context['page'] = page
+        context['badge_users'] = self.object.get_users(page)
+        context['has_next_page'] = page * Badge.users_per_page < self.object.no_of_users
+        return context
+
 
 class BadgeAdd(AdminMixin, CreateView):
     model = Badge
@@ -252,6 +363,26 @@ class BadgeDelete(AdminMixin, DeleteView):
         return JsonResponse({'error': False, 'response': 'Successfully Deleted Badge'})
 
 
+class BadgeBulkAction(AdminMixin, BulkActionMixin, View):
+    bulk_actions = ('assign', 'revoke')
+
+    def get_object(self):
+        return get_object_or_404(Badge, slug=self.kwargs['slug'])
+
+    def bulk_assign(self, ids):
+        badge = self.get_object()
+        profile_ids = list(UserProfile.objects.filter(user_id__in=ids).exclude(
+            badges=badge).values_list('id', flat=True))
+        badge.userprofile_set.add(*profile_ids)
+        return len(profile_ids)
+
+    def bulk_revoke(self, ids):
+        badge = self.get_object()
+        profile_ids = list(badge.userprofile_set.filter(user_id__in=ids).values_list('id', flat=True))
+        badge.userprofile_set.remove(*profile_ids)
+        return len(profile_ids)
+
+
 class BadgeEdit(AdminMixin, UpdateView):
     model = Badge
     template_name = "dashboard/badge_add.html"
@@ -284,28 +415,42 @@ class BadgeEdit(AdminMixin, UpdateView):
         return context
 
 
-class UserList(AdminMixin, ListView):
+class UserList(AdminMixin, ExportMixin, ListView):
     model = UserProfile
     template_name = 'dashboard/users.html'
     context_object_name = 'users_list'
     queryset = UserProfile.objects.filter()
+    export_filename = 'users'
+    export_fields = ('user__id', 'user__email', 'user__username', 'user__is_active', 'user__date_joined',
+                     'user_roles', 'used_votes', 'no_of_up_votes', 'no_of_down_votes')
 
     def get_context_data(self, **kwargs):
         context = super(UserList, self).get_context_data(**kwargs)
+        context['badges'] = Badge.objects.all()
         return context
 
+    def filter_queryset(self, users_list, data):
+        search_text = data.get('search_text', '')
+        if search_text:
+            users_list = users_list.filter(
+                Q(user__email__icontains=search_text) | Q(user__username__icontains=search_text)
+            )
+        return users_list
+
+    def get_export_queryset(self):
+        users_list = self.filter_queryset(self.model.objects.all(), self.request.GET)
+        return users_list.annotate(
+            no_of_up_votes=Coalesce(Sum('user__usertopics__no_of_votes'), 0),
+            no_of_down_votes=Coalesce(Sum('user__usertopics__no_of_down_votes'), 0),
+        ).order_by('id')
+
     def post(self, request, *args, **kwargs):
-        users_list = self.model.objects.all()
-        if request.POST.get('search_text', ''):
-            users_list = list(set(users_list.filter(
-                user__email__icontains=request.POST.get('search_text')
-            ) | users_list.filter(
-                user__username__icontains=request.POST.get('search_text')
-            )))
+        users_list = self.filter_queryset(self.model.objects.all(), request.POST)
         per_page = request.POST.get("filter_per_page") if request.POST.get(
             "filter_per_page") else 10
         return render(request, self.template_name, {'users_list': users_list,
-                                                    "per_page": per_page})
+                                                    "per_page": per_page,
+                                                    'badges': Badge.objects.all()})
 
 
 class DashboardUserEdit(AdminMixin, UpdateView):
@@ -451,7 +596,7 @@ class TopicUpdateView(CanUpdateTopicMixin, UpdateView):
         return JsonResponse({'error': True, 'errors': form.errors})
 
 
-class TopicList(LoginRequiredMixin, ListView):
+class TopicList(LoginRequiredMixin, ReplicaReadMixin, ListView):
     template_name = 'forum/topic_list.html'
     context_object_name = "topic_list"
 
@@ -460,19 +605,76 @@ class TopicList(LoginRequiredMixin, ListView):
             query = Q(status='Published') | Q(created_by=self.request.user)
         else:
             query = Q(status='Published')
-        queryset = Topic.objects.filter(query).order_by('-created_on')
+        # the list rows read the summary columns, so the page is a single query
+        queryset = Topic.objects.filter(query).select_related('category', 'last_comment_by').order_by('-created_on')
         return queryset
 
 
-class TopicView(LoginRequiredMixin, TemplateView):
+def get_subscription_link(target, is_subscribed):
+    """Title and follow/unfollow url of a category or tag, for the subscribe links."""
+    kind = 'category' if isinstance(target, ForumCategory) else 'tag'
+    return {'title': target.title, 'is_subscribed': is_subscribed,
+            'url': reverse('django_simple_forum:subscribe', kwargs={'kind': kind, 'pk': target.id})}
+
+
+class TopicFeed(LoginRequiredMixin, ReplicaReadMixin, TemplateView):
+    """The newest published topics of the categories and tags the user follows, paged by topic id cursor."""
+    template_name = 'forum/topic_feed.html'
+    page_size = 20
+
+    def get_context_data(self, **kwargs):
+        context = super(TopicFeed, self).get_context_data(**kwargs)
+        before = self.request.GET.get('before', '')
+        context['topic_list'], context['next_before'] = get_feed_page(
+            self.request.user.id, int(before) if before.isdigit() else None, self.page_size)
+        subscriptions = self.request.user.subscriptions.select_related('category', 'tag').order_by('-created_on')
+        context['subscriptions'] = [get_subscription_link(subscription.category or subscription.tag, True)
+                                    for subscription in subscriptions]
+        return context
+
+
+class Subscribe(LoginRequiredMixin, ThrottleMixin, View):
+    """Follows or unfollows a category or a tag; the topics of the followed ones make up the user's feed."""
+    throttle_scope = 'follow'
+
+    def post(self, request, *args, **kwargs):
+        if kwargs['kind'] == 'category':
+            lookup = {'category': get_object_or_404(ForumCategory, pk=kwargs['pk'])}
+        else:
+            lookup = {'tag': get_object_or_404(Tags, pk=kwargs['pk'])}
+        deleted, rows = Subscription.objects.filter(user=request.user, **lookup).delete()
+        if not deleted:
+            Subscription.objects.get_or_create(user=request.user, **lookup)
+        return JsonResponse({'error': False, 'response': 'Successfully updated your subscriptions',
+                             'is_subscribed': not deleted})
+
+
+class TopicView(LoginRequiredMixin, ReplicaReadMixin, TemplateView):
     template_name = 'forum/view_topic.html'
+    archived_template_name = 'forum/view_archived_topic.html'
 
     def get_object(self):
-        return get_object_or_404(Topic, slug=self.kwargs['slug'])
+        if not hasattr(self, 'object'):
+            # archived threads keep their URL
+            self.object = Topic.objects.filter(slug=self.kwargs['slug']).first() or get_object_or_404(
+                ArchivedTopic, slug=self.kwargs['slug'])
+        return self.object
+
+    def get_template_names(self):
+        if isinstance(self.get_object(), ArchivedTopic):
+            return [self.archived_template_name]
+        return super(TopicView, self).get_template_names()
 
     def get_context_data(self, **kwargs):
         context = super(TopicView, self).get_context_data(**kwargs)
         context['topic'] = self.get_object()
+        if isinstance(context['topic'], ArchivedTopic):
+            context['comments'] = context['topic'].get_comments()
+            context['author_cards'] = get_author_cards(context['topic'].get_user_ids())
+            return context
+        record_view(self.request, context['topic'].id)
+        context.update(get_thread_context(
+            context['topic'], author_ids=[context['topic'].created_by_id, context['topic'].last_comment_by_id]))
         # user_profile = get_object_or_404(UserProfile, user=self.request.user)
         # context['user_profile'] = user_profile
         suggested_topics = Topic.objects.filter(
@@ -486,6 +688,84 @@ class TopicView(LoginRequiredMixin, TemplateView):
         return context
 
 
+def get_thread_context(topic, after='', author_ids=()):
+    threads, next_after = get_thread_page(topic.id, after)
+    author_ids = set(author_ids)
+    for thread in threads:
+        author_ids.add(thread['comment'].commented_by_id)
+        author_ids.update(reply.commented_by_id for reply in thread['replies'])
+    return {'topic': topic, 'threads': threads, 'next_after': next_after, 'author_cards': get_author_cards(author_ids)}
+
+
+class TopicComments(LoginRequiredMixin, ReplicaReadMixin, TemplateView):
+    """The next page of a topic's comment threads, for "load more comments"."""
+    template_name = 'forum/comment_thread.html'
+
+    def get_context_data(self, **kwargs):
+        context = super(TopicComments, self).get_context_data(**kwargs)
+        topic = get_object_or_404(Topic.objects.only('id', 'slug'), slug=self.kwargs['slug'])
+        context.update(get_thread_context(topic, self.request.GET.get('after', '')))
+        return context
+
+
+class CommentReplies(LoginRequiredMixin, ReplicaReadMixin, TemplateView):
+    """The next page of replies in a top level comment's thread, for "load more replies"."""
+    template_name = 'forum/comment_replies.html'
+
+    def get_context_data(self, **kwargs):
+        context = super(CommentReplies, self).get_context_data(**kwargs)
+        root = get_object_or_404(Comment.objects.only('id', 'topic', 'path'), pk=self.kwargs['pk'], depth=0)
+        context['comments'], context['next_after'] = get_reply_page(root, self.request.GET.get('after', ''))
+        context['root'] = root
+        context['author_cards'] = get_author_cards(set(comment.commented_by_id for comment in context['comments']))
+        return context
+
+
+class SimilarTopics(LoginRequiredMixin, View):
+    """Published topics like the title being typed in the new topic form, from the in-memory title index."""
+    limit = 5
+
+    def get(self, request, *args, **kwargs):
+        matches = title_index.search(request.GET.get('title', '')[:200], self.limit)
+        # the index may not have caught up with a topic that was unpublished
+        topics = Topic.objects.filter(status='Published').only('title', 'slug').in_bulk(
+            [topic_id for topic_id, score in matches])
+        response = [{
+            'title': topics[topic_id].title,
+            'url': reverse('django_simple_forum:view_topic', kwargs={'slug': topics[topic_id].slug}),
+            'score': round(score, 2),
+        } for topic_id, score in matches if topic_id in topics]
+        return JsonResponse({'error': False, 'response': response})
+
+
+class TagSuggestions(LoginRequiredMixin, View):
+    """
+    The most used tags starting with what is typed in the new topic form's tag input, from the
+    in-memory tag index.
+    """
+    limit = 10
+
+    def get(self, request, *args, **kwargs):
+        suggestions = tag_index.suggest(request.GET.get('q', '')[:50], self.limit)
+        response = [{'title': title, 'no_of_topics': count} for tag_id, title, count in suggestions]
+        return JsonResponse({'error': False, 'response': response})
+
+
+class TopicEvents(LoginRequiredMixin, View):
+    """Streams new comments and vote/like count changes of a topic as server-sent events."""
+
+    def get(self, request, *args, **kwargs):
+        topic = get_object_or_404(Topic.objects.only('id'), slug=kwargs.get('slug'))
+        last_id = request.META.get('HTTP_LAST_EVENT_ID', '')
+        response = StreamingHttpResponse(
+            events.stream(topic.id, int(last_id) if last_id.isdigit() else None),
+            content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # tell nginx not to buffer the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
 class TopicDeleteView(CanUpdateTopicMixin, DeleteView):
     model = Topic
     template_name = "forum/topic_delete.html"
@@ -497,12 +777,11 @@ class TopicDeleteView(CanUpdateTopicMixin, DeleteView):
         return self.object
 
     def delete(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        job = queue_deletion(self.object, request.user)
         if request.is_ajax():
-            self.object = self.get_object()
-            self.object.delete()
-            return JsonResponse({"error": False, "message": "deleted"})
-        else:
-            return super(TopicDeleteView, self).delete(request, *args, **kwargs)
+            return JsonResponse({"error": False, "message": "deleted", "job": job.id})
+        return redirect(self.get_success_url())
 
 
 def comment_mentioned_users_list(data):
@@ -512,44 +791,31 @@ def comment_mentioned_users_list(data):
     return result
 
 
-class CommentVoteUpView(LoginRequiredMixin, View):
+class CommentVoteUpView(LoginRequiredMixin, ThrottleMixin, View):
+    throttle_scope = 'vote'
 
     def get(self, request, *args, **kwargs):
-        comment = get_object_or_404(Comment, pk=kwargs.get("pk"))
-        vote = comment.votes.filter(user=request.user).first()
-        if not vote:
-            vote = Vote.objects.create(user=request.user, type="U")
-            comment.votes.add(vote)
-            comment.save()
-            status = "up"
-        elif vote and vote.type == "D":
-            vote.delete()
-            status = "removed"
-        else:
-            status = "neutral"
+        comment = get_object_or_404(Comment.objects.only('id', 'topic'), pk=kwargs.get("pk"))
+        status = vote_activity(request.user, comment, "U")
+        if status != "neutral":
+            publish_vote_counts(comment.topic_id, comment)
         return JsonResponse({"status": status})
 
 
-class CommentVoteDownView(LoginRequiredMixin, View):
+class CommentVoteDownView(LoginRequiredMixin, ThrottleMixin, View):
+    throttle_scope = 'vote'
 
     def get(self, request, *args, **kwargs):
-        comment = get_object_or_404(Comment, pk=kwargs.get("pk"))
-        vote = comment.votes.filter(user=request.user).first()
-        if not vote:
-            vote = Vote.objects.create(user=request.user, type="D")
-            comment.votes.add(vote)
-            comment.save()
-            status = "down"
-        elif vote and vote.type == "U":
-            vote.delete()
-            status = "removed"
-        else:
-            status = "neutral"
+        comment = get_object_or_404(Comment.objects.only('id', 'topic'), pk=kwargs.get("pk"))
+        status = vote_activity(request.user, comment, "D")
+        if status != "neutral":
+            publish_vote_counts(comment.topic_id, comment)
         return JsonResponse({"status": status})
 
 
-class CommentAdd(LoginRequiredMixin, CreateView):
+class CommentAdd(LoginRequiredMixin, ThrottleMixin, CreateView):
     model = Topic
+    throttle_scope = 'comment'
     form_class = CommentForm
     template_name = 'forum/view_topic.html'
 
@@ -559,39 +825,40 @@ class CommentAdd(LoginRequiredMixin, CreateView):
         return kwargs
 
     def form_valid(self, form):
-        comment = form.save()
-        if self.request.POST['parent']:
-            comment.parent_id = self.request.POST['parent']
-            comment.save()
-        if self.request.POST.get('mentioned_user', False):
-            data = self.request.POST.get('mentioned_user')
-            comment.mentioned = comment_mentioned_users_list(data)
+        # the topic's summary columns and the comment's path are set by the comment signals in the same transaction
+        with transaction.atomic():
+            comment = form.save(commit=False)
+            parent_id = self.request.POST.get('parent') or None
+            if parent_id is not None:
+                parent = Comment.objects.filter(
+                    id=parent_id if parent_id.isdigit() else None, topic_id=comment.topic_id).values('depth').first()
+                if parent is None:
+                    return JsonResponse({'error': True, 'response': {'parent': ['Reply to a comment of this topic']}})
+                if parent['depth'] >= get_max_comment_depth():
+                    return JsonResponse({'error': True, 'response': {
+                        'parent': ['Replies cannot be nested more than %d levels deep' % get_max_comment_depth()]}})
+            # set before the first save, the path is built from the parent's
+            comment.parent_id = parent_id
             comment.save()
+            if self.request.POST.get('mentioned_user', False):
+                data = self.request.POST.get('mentioned_user')
+                comment.mentioned = comment_mentioned_users_list(data)
+                comment.save()
 
-        for user in comment.topic.get_topic_users():
-            mto = [user.user.email]
-            c = {'comment': comment, "user": user.user,
-                 'topic_url': settings.HOST_URL + reverse('django_simple_forum:view_topic', kwargs={'slug': comment.topic.slug}),
-                 "HOST_URL": settings.HOST_URL}
-            t = loader.get_template('emails/comment_add.html')
-            subject = "New Comment For The Topic " + (comment.topic.title)
-            rendered = t.render(c)
-            mfrom = settings.DEFAULT_FROM_EMAIL
-            # TODO: Memail(mto, mfrom, subject, rendered, email_template_name=None, context=None)
-
-        for user in comment.mentioned.all():
-            mto = [user.user.email]
-            c = Context({'comment': comment, "user": user.user,
-                         'topic_url': settings.HOST_URL + reverse('django_simple_forum:view_topic', kwargs={'slug': comment.topic.slug}),
-                         "HOST_URL": settings.HOST_URL})
-            t = loader.get_template('emails/comment_mentioned.html')
-            subject = "New Comment For The Topic " + (comment.topic.title)
-            rendered = t.render(c)
-            mfrom = settings.DEFAULT_FROM_EMAIL
-            # TODO: Memail(mto, mfrom, subject, rendered)
+        # subscribed users get comments in a digest, see send_forum_digests, unless digests are turned off
+        recipients = get_recipients(comment)
+        if get_digest_minutes():
+            queue_notifications(comment, recipients)
+        else:
+            schedule_comment_emails(comment, recipients)
 
         timeline_activity(user=self.request.user, content_object=comment,
                           namespace='commented for the', event_type="comment-create")
+        events.publish(comment.topic_id, 'comment', {
+            'id': comment.id,
+            'parent': comment.parent_id,
+            'html': loader.render_to_string('forum/comment_live.html', {'comment': comment}),
+        })
 
         data = {'error': False, 'response': 'Successfully Created Topic'}
         return JsonResponse(data)
@@ -622,10 +889,8 @@ class CommentEdit(LoginRequiredMixin, UpdateView):
         comment = self.get_object()
         if self.request.user == comment.commented_by:
             self.get_object().mentioned.all().delete()
+            # the parent is left as it is, the comment's path depends on it
             comment = form.save()
-            if self.request.POST['parent']:
-                comment.parent_id = self.request.POST['parent']
-                comment.save()
             if self.request.POST.get('mentioned_user', False):
                 data = self.request.POST.get('mentioned_user')
                 comment.mentioned = comment_mentioned_users_list(data)
@@ -676,8 +941,9 @@ class CommentDelete(LoginRequiredMixin, DeleteView):
             return JsonResponse({'error': False, 'response': 'Only commented user can delete this comment'})
 
 
-class TopicLike(LoginRequiredMixin, View):
+class TopicLike(LoginRequiredMixin, ThrottleMixin, View):
     model = Topic
+    throttle_scope = 'like'
     slug_field = 'slug'
 
     def get_object(self):
@@ -688,24 +954,25 @@ class TopicLike(LoginRequiredMixin, View):
 
     def post(self, request, *args, **kwargs):
         topic = self.get_object()
-        user_topics = UserTopics.objects.filter(user=request.user, topic=topic)
-        if user_topics:
-            user_topic = user_topics[0]
-        else:
+        user_topic = UserTopics.objects.filter(user=request.user, topic=topic).first()
+        if not user_topic:
             user_topic = UserTopics.objects.create(
                 user=request.user, topic=topic)
         if user_topic.is_like:
             user_topic.is_like = False
-            topic.no_of_likes = topic.no_of_likes - 1
+            topic.no_of_likes = F('no_of_likes') - 1
             timeline_activity(user=self.request.user, content_object=topic,
                               namespace='unlike the', event_type="unlike-topic")
         else:
             user_topic.is_like = True
-            topic.no_of_likes = topic.no_of_likes + 1
+            topic.no_of_likes = F('no_of_likes') + 1
             timeline_activity(
                 user=self.request.user, content_object=topic, namespace='like the', event_type="like-topic")
-        user_topic.save()
-        topic.save()
+        # write only the toggled columns; the like count is incremented in SQL so concurrent likes add up
+        user_topic.save(update_fields=['is_like'])
+        topic.save(update_fields=['no_of_likes'])
+        topic.refresh_from_db(fields=['no_of_likes'])
+        events.publish(topic.id, 'like', {'no_of_likes': topic.no_of_likes})
 
         return JsonResponse({'error': False, 'response': 'Successfully Deleted Category',
                              'is_like': user_topic.is_like, 'no_of_likes': topic.no_of_likes,
@@ -721,34 +988,44 @@ class ForumCategoryList(LoginRequiredMixin, ListView):
 
 
 class ForumTagsList(LoginRequiredMixin, ListView):
-    queryset = Tags.objects.filter()
+    queryset = Tags.objects.order_by('bucket', 'title')
     template_name = 'forum/tags.html'
     context_object_name = "tags"
     paginate_by = '10'
 
+    def get_letters(self):
+        counts = dict(Tags.objects.order_by().values_list('bucket').annotate(Count('id')))
+        return [(letter, counts.get(letter, 0)) for letter in string.ascii_lowercase + '#']
+
+    def get_context_data(self, **kwargs):
+        context = super(ForumTagsList, self).get_context_data(**kwargs)
+        context['letters'] = self.get_letters()
+        return context
+
     def post(self, request, *args, **kwargs):
         tags = self.queryset
         if str(request.POST.get('alphabet_value')) != 'all':
-            tags = tags.filter(
-                title__istartswith=request.POST.get('alphabet_value'))
-        return render(request, self.template_name, {'tags': tags})
+            tags = tags.filter(bucket=tag_bucket(request.POST.get('alphabet_value', '')))
+        if request.POST.get('sort') == 'popular':
+            tags = tags.order_by('-no_of_topics', '-title')
+        return render(request, self.template_name, {'tags': tags, 'letters': self.get_letters()})
 
 
 class ForumBadgeList(LoginRequiredMixin, ListView):
-    queryset = Tags.objects.filter()
+    queryset = Badge.objects.order_by('title')
     template_name = 'forum/badges.html'
     context_object_name = "badges_list"
     paginate_by = '10'
 
     def post(self, request, *args, **kwargs):
-        tags = self.queryset
+        badges_list = self.queryset
         if str(request.POST.get('alphabet_value')) != 'all':
-            tags = tags.filter(
+            badges_list = badges_list.filter(
                 title__istartswith=request.POST.get('alphabet_value'))
-        return render(request, self.template_name, {'tags': tags})
+        return render(request, self.template_name, {'badges_list': badges_list})
 
 
-class ForumCategoryView(LoginRequiredMixin, ListView):
+class ForumCategoryView(LoginRequiredMixin, ReplicaReadMixin, ListView):
     template_name = 'forum/topic_list.html'
 
     def get_queryset(self, queryset=None):
@@ -756,19 +1033,83 @@ class ForumCategoryView(LoginRequiredMixin, ListView):
             query = Q(status="Published") | Q(created_by=self.request.user)
         else:
             query = Q(status="Published")
-        category = get_object_or_404(ForumCategory, slug=self.kwargs.get("slug"))
-        topics = category.topic_set.filter(query)
+        self.category = get_object_or_404(ForumCategory, slug=self.kwargs.get("slug"))
+        topics = self.category.topic_set.filter(query).select_related('category', 'last_comment_by')
         return topics
 
+    def get_context_data(self, **kwargs):
+        context = super(ForumCategoryView, self).get_context_data(**kwargs)
+        context['subscription'] = get_subscription_link(self.category, Subscription.objects.filter(
+            user=self.request.user, category=self.category).exists())
+        return context
+
 
-class ForumTagsView(LoginRequiredMixin, TemplateView):
+class ForumTagsView(LoginRequiredMixin, ReplicaReadMixin, TemplateView):
     template_name = 'forum/topic_list.html'
 
     def get_context_data(self, **kwargs):
         tag = get_object_or_404(Tags, slug=kwargs.get("slug"))
         context = super(ForumTagsView, self).get_context_data(**kwargs)
-        topics = tag.get_topics()
+        topics = tag.get_topics().select_related('category', 'last_comment_by')
         context['topic_list'] = topics
+        context['subscription'] = get_subscription_link(tag, Subscription.objects.filter(
+            user=self.request.user, tag=tag).exists())
+        return context
+
+
+class TopicBrowse(LoginRequiredMixin, ReplicaReadMixin, TemplateView):
+    """
+    Topics in any combination of a category, several tags and, for admins, a status, with the
+    number of matching topics for each facet value. The filtering and counting is done on the
+    in-memory facet index; only the topics of the page shown are read from the database.
+    """
+    template_name = 'forum/browse_topics.html'
+    facet_size = 30
+
+    def get_filters(self):
+        category = self.request.GET.get('category', '')
+        category_id = int(category) if category.isdigit() else None
+        tag_ids = sorted(set(int(tag) for tag in self.request.GET.getlist('tag') if tag.isdigit()))
+        status = 'Published'
+        if self.request.user.is_superuser:
+            status = self.request.GET.get('status') or None
+            if status not in dict(STATUS):
+                status = None
+        return category_id, tag_ids, status
+
+    def get_url(self, category_id, tag_ids, status):
+        params = [('category', category_id)] if category_id else []
+        params += [('tag', tag_id) for tag_id in tag_ids]
+        if status and self.request.user.is_superuser:
+            params.append(('status', status))
+        return '?' + urlencode(params)
+
+    def get_facets(self, counts, objects, get_url, selected):
+        counts = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:self.facet_size]
+        objects = objects.in_bulk([value for value, count in counts]) if objects is not None else {}
+        return [{'value': value, 'object': objects.get(value, value), 'count': count, 'selected': value in selected,
+                 'url': get_url(value)} for value, count in counts]
+
+    def get_context_data(self, **kwargs):
+        context = super(TopicBrowse, self).get_context_data(**kwargs)
+        category_id, tag_ids, status = self.get_filters()
+        topics = facet_index.filter(category_id, tag_ids, status)
+        queryset = Topic.objects.select_related('category', 'last_comment_by')
+        if status:
+            # the index may not have caught up with a topic's new status yet
+            queryset = queryset.filter(status=status)
+        context['topic_list'] = FacetResults(topics, queryset)
+        context['category_facets'] = self.get_facets(
+            facet_index.counts('category', topics), ForumCategory.objects,
+            lambda value: self.get_url(None if value == category_id else value, tag_ids, status), [category_id])
+        context['tag_facets'] = self.get_facets(
+            facet_index.counts('tag', topics), Tags.objects,
+            lambda value: self.get_url(category_id, sorted(set(tag_ids) ^ {value}), status), tag_ids)
+        if self.request.user.is_superuser:
+            context['status_facets'] = self.get_facets(
+                facet_index.counts('status', topics), None,
+                lambda value: self.get_url(category_id, tag_ids, None if value == status else value), [status])
+        context['clear_url'] = self.get_url(None, [], None)
         return context
 
 
@@ -803,6 +1144,30 @@ class TopicStatus(AdminMixin, View):
         return JsonResponse({'error': False, 'response': 'Successfully Updated Topic Status'})
 
 
+class TopicBulkAction(AdminMixin, BulkActionMixin, View):
+    bulk_actions = ('publish', 'draft', 'disable', 'delete')
+
+    def bulk_publish(self, ids):
+        return self.update_status(ids, 'Published')
+
+    def bulk_draft(self, ids):
+        return self.update_status(ids, 'Draft')
+
+    def bulk_disable(self, ids):
+        return self.update_status(ids, 'Disabled')
+
+    def update_status(self, ids, status):
+        updated = Topic.objects.filter(id__in=ids).update(status=status)
+        update_topic_tag_counts(ids)
+        # update() sends no post_save for the indexes to pick the new status up from
+        log_change_on_commit(ids)
+        return updated
+
+    def bulk_delete(self, ids):
+        # returns the number of topics queued for deletion
+        return len(queue_deletions(Topic.objects.filter(id__in=ids), self.request.user))
+
+
 class DashboardUserDelete(AdminMixin, DeleteView):
     model = User
     template_name = "dashboard/topic.html"
@@ -816,8 +1181,36 @@ class DashboardUserDelete(AdminMixin, DeleteView):
 
     def post(self, request, *args, **kwargs):
         user = self.get_object()
-        user.delete()
-        return JsonResponse({'error': False, 'response': 'Successfully Deleted User'})
+        job = queue_deletion(user, request.user)
+        return JsonResponse({'error': False, 'response': 'User Queued for Deletion', 'job': job.id})
+
+
+class UserBulkAction(AdminMixin, BulkActionMixin, View):
+    bulk_actions = ('activate', 'deactivate', 'delete')
+
+    def get_queryset(self, ids):
+        # an admin never deactivates or deletes their own account from a bulk selection
+        return User.objects.filter(id__in=ids).exclude(id=self.request.user.id)
+
+    def bulk_activate(self, ids):
+        return self.get_queryset(ids).update(is_active=True)
+
+    def bulk_deactivate(self, ids):
+        return self.get_queryset(ids).update(is_active=False)
+
+    def bulk_delete(self, ids):
+        # returns the number of users queued for deletion
+        return len(queue_deletions(self.get_queryset(ids), self.request.user))
+
+
+class DeletionJobList(AdminMixin, ListView):
+    model = DeletionJob
+    template_name = 'dashboard/deletion_jobs.html'
+    context_object_name = 'deletion_jobs'
+    paginate_by = 50
+
+    def get_queryset(self):
+        return DeletionJob.objects.select_related('content_type', 'created_by')
 
 
 class UserStatus(AdminMixin, View):
@@ -860,8 +1253,9 @@ class UserDetail(AdminMixin, TemplateView):
         return context
 
 
-class TopicFollow(LoginRequiredMixin, View):
+class TopicFollow(LoginRequiredMixin, ThrottleMixin, View):
     model = Topic
+    throttle_scope = 'follow'
     slug_field = 'slug'
 
     def get_object(self):
@@ -869,10 +1263,8 @@ class TopicFollow(LoginRequiredMixin, View):
 
     def post(self, request, *args, **kwargs):
         topic = self.get_object()
-        user_topics = UserTopics.objects.filter(user=request.user, topic=topic)
-        if user_topics:
-            user_topic = user_topics[0]
-        else:
+        user_topic = UserTopics.objects.filter(user=request.user, topic=topic).first()
+        if not user_topic:
             user_topic = UserTopics.objects.create(
                 user=request.user, topic=topic)
         if user_topic.is_followed:
@@ -885,72 +1277,92 @@ class TopicFollow(LoginRequiredMixin, View):
             user_topic.followed_on = datetime.now()
             timeline_activity(user=self.request.user, content_object=topic,
                               namespace='follow the', event_type="follow-topic")
-        user_topic.save()
+        user_topic.save(update_fields=['is_followed', 'followed_on'])
         return JsonResponse({'error': False, 'response': 'Successfully Followed the topic',
                              'is_followed': user_topic.is_followed})
 
 
-class TopicVoteUpView(LoginRequiredMixin, View):
+class TopicVoteUpView(LoginRequiredMixin, ThrottleMixin, View):
+    throttle_scope = 'vote'
 
     def get(self, request, *args, **kwargs):
-        topic = get_object_or_404(Topic, slug=kwargs.get("slug"))
-        vote = topic.votes.filter(user=request.user).first()
-        if not vote:
-            vote = Vote.objects.create(user=request.user, type="U")
-            topic.votes.add(vote)
-            topic.save()
-            status = "up"
-        elif vote and vote.type == "D":
-            vote.delete()
-            status = "removed"
-        else:
-            status = "neutral"
+        topic = get_object_or_404(Topic.objects.only('id'), slug=kwargs.get("slug"))
+        status = vote_activity(request.user, topic, "U")
+        if status != "neutral":
+            publish_vote_counts(topic.id, topic)
         return JsonResponse({"status": status})
 
 
-class TopicVoteDownView(LoginRequiredMixin, View):
+class TopicVoteDownView(LoginRequiredMixin, ThrottleMixin, View):
+    throttle_scope = 'vote'
 
     def get(self, request, *args, **kwargs):
-        topic = get_object_or_404(Topic, slug=kwargs.get("slug"))
-        vote = topic.votes.filter(user=request.user).first()
-        if not vote:
-            vote = Vote.objects.create(user=request.user, type="D")
-            topic.votes.add(vote)
-            topic.save()
-            status = "down"
-        elif vote and vote.type == "U":
-            vote.delete()
-            status = "removed"
-        else:
-            status = "neutral"
+        topic = get_object_or_404(Topic.objects.only('id'), slug=kwargs.get("slug"))
+        status = vote_activity(request.user, topic, "D")
+        if status != "neutral":
+            publish_vote_counts(topic.id, topic)
         return JsonResponse({"status": status})
 
 
-class UserProfileView(LoginRequiredMixin, TemplateView):
+def get_user_profile(user):
+    """The user's profile, created with the role their account gives them on first use."""
+    user_role = "Publisher"
+    if user.is_superuser:
+        user_role = "Admin"
+    # the profile may have just been created on the primary, so never look it up on a replica
+    user_profile, _ = UserProfile.objects.using(DEFAULT_DB_ALIAS).get_or_create(
+        user=user, defaults={'user_roles': user_role})
+    return user_profile
+
+
+class UserProfileView(LoginRequiredMixin, ReplicaReadMixin, TemplateView):
     template_name = 'forum/profile.html'
 
     def get_context_data(self, **kwargs):
         context = super(UserProfileView, self).get_context_data(**kwargs)
-        user_role = "Publisher"
-        if self.request.user.is_superuser:
-            user_role = "Admin"
-        user_profile, _ = UserProfile.objects.get_or_create(user=self.request.user, user_roles=user_role)
-        context['user_profile'] = user_profile
+        context['user_profile'] = get_user_profile(self.request.user)
         return context
 
 
-class ProfileView(LoginRequiredMixin, TemplateView):
+class ProfileView(LoginRequiredMixin, ReplicaReadMixin, TemplateView):
     template_name = 'forum/profile.html'
     slug_field = 'user_name'
 
     def get_context_data(self, **kwargs):
         context = super(ProfileView, self).get_context_data(**kwargs)
         user_profile = get_object_or_404(
-            UserProfile, user__username=self.kwargs['user_name'])
+            UserProfile.objects.select_related('user'), user__username=self.kwargs['user_name'])
         context['user_profile'] = user_profile
         return context
 
 
+class ProfileTopicsView(LoginRequiredMixin, ReplicaReadMixin, ListView):
+    """One page of a profile tab, loaded by forum/profile.html when the tab is opened."""
+    template_name = 'forum/profile_topics.html'
+    context_object_name = 'topics'
+    paginate_by = 20
+    tabs = {
+        'created': 'get_topics',
+        'followed': 'get_followed_topics',
+        'liked': 'get_liked_topics',
+        'suggested': 'get_user_suggested_topics',
+    }
+
+    def get_queryset(self):
+        user_profile = get_object_or_404(UserProfile, user__username=self.kwargs['user_name'])
+        topics = getattr(user_profile, self.tabs[self.kwargs['tab']])()
+        return topics.select_related('category').order_by('-id')
+
+    def get_context_data(self, **kwargs):
+        context = super(ProfileTopicsView, self).get_context_data(**kwargs)
+        participants = get_topic_participants([topic.id for topic in context['topics']])
+        author_cards = get_author_cards(set().union(*participants.values()))
+        for topic in context['topics']:
+            topic.participants = [author_cards[user_id] for user_id in sorted(participants[topic.id])
+                                  if user_id in author_cards]
+        return context
+
+
 class UserSettingsView(LoginRequiredMixin, View):
     model = UserProfile
 
@@ -971,12 +1383,27 @@ class UserSettingsView(LoginRequiredMixin, View):
                              "send_mailnotifications": user_profile.send_mailnotifications})
 
 
-class UserDetailView(LoginRequiredMixin, TemplateView):
+class UserProfilePicView(LoginRequiredMixin, View):
+
+    def post(self, request, *args, **kwargs):
+        form = ProfilePicForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return JsonResponse({'error': True, 'response': 'Please upload an image'})
+        user_profile = get_user_profile(request.user)
+        user_profile.profile_pic = form.cleaned_data['profile_pic']
+        user_profile.avatar_url = ''
+        user_profile.save()
+        invalidate_author_card(request.user.id)
+        schedule_avatar(user_profile.id)
+        return JsonResponse({'error': False, 'response': 'You have successfully uploaded the profile picture'})
+
+
+class UserDetailView(LoginRequiredMixin, ReplicaReadMixin, TemplateView):
     template_name = 'forum/profile.html'
     slug_field = 'user_name'
 
     def get_object(self):
-        return get_object_or_404(UserProfile, user__username=self.kwargs['user_name'])
+        return get_object_or_404(UserProfile.objects.select_related('user'), user__username=self.kwargs['user_name'])
 
     def get_context_data(self, **kwargs):
         context = super(UserDetailView, self).get_context_data(**kwargs)
@@ -985,14 +1412,13 @@ class UserDetailView(LoginRequiredMixin, TemplateView):
 
 
 def get_mentioned_user(request, topic_id):
-    topic = get_object_or_404(Topic, id=topic_id)
+    topic = get_object_or_404(Topic.objects.only('id', 'created_by'), id=topic_id)
     list_data = []
     if request.method == 'GET':
-        topic_users = topic.get_topic_users()
-        for user in topic_users:
+        emails = topic.get_topic_users().values_list('user__email', flat=True)
+        for email in emails:
             data = {}
-            data['username'] = user.user.email.split('@')[0]
-            # data['avatar'] = user.profile_pic.url if user.profile_pic else ''
-            data['fullname'] = user.user.email
+            data['username'] = email.split('@')[0]
+            data['fullname'] = email
             list_data.append(data)
     return JsonResponse({'data': list_data})
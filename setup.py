@@ -47,5 +47,6 @@ setup(
     install_requires=[
         "Django>=1.11.21",
         'django-simple-pagination',
+        'Pillow',
     ],
 )
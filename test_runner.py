@@ -13,7 +13,10 @@ if __name__ == "__main__":
         DATABASES={
             'default': {
                 'ENGINE': 'django.db.backends.sqlite3',
-            }
+            },
+            'replica': {
+                'ENGINE': 'django.db.backends.sqlite3',
+            },
         },
         INSTALLED_APPS=(
             'django.contrib.auth',